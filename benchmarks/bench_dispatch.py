@@ -0,0 +1,120 @@
+"""Стоимость маршрутизации одного сообщения через все восемь роутеров бота.
+
+Прогоняет через диспетчер текстовые сообщения, которые не подходят ни
+одному хендлеру (обычный случай для «болтовни» в чате), и считает время
+на сообщение, число проверок фильтров хендлеров и переходов в пул потоков. Режим «до» добавляет
+в конец прежний перехватчик ``@router.message()`` без фильтра, который
+читал данные FSM и делал ленивые импорты на каждое сообщение; режим
+«после» — текущие роутеры, где исправление голосового — состояние FSM.
+
+    python -m benchmarks.bench_dispatch [сообщений] [чатов]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, Update
+
+from database.db import Database
+from database.fsm_storage import SQLiteStorage
+from handlers import admin_panel, ai_lawyer, common, funeral, memory, registration, shop, voice
+
+checks = 0
+hops = 0
+_check = HandlerObject.check
+_run_in_executor = asyncio.BaseEventLoop.run_in_executor
+
+
+async def counting_check(self, *args, **kwargs):
+    global checks
+    checks += 1
+    return await _check(self, *args, **kwargs)
+
+
+def counting_run_in_executor(self, *args, **kwargs):
+    # aiogram выполняет синхронные фильтры (F.text == ...) в пуле потоков
+    global hops
+    hops += 1
+    return _run_in_executor(self, *args, **kwargs)
+
+
+HandlerObject.check = counting_check
+asyncio.BaseEventLoop.run_in_executor = counting_run_in_executor
+
+
+def legacy_router() -> Router:
+    router = Router(name="legacy_voice_edit")
+
+    @router.message()
+    async def handle_voice_edit_text(message: Message, state: FSMContext):
+        data = await state.get_data()
+        if not data.get("voice_edit_state"):
+            return
+        from handlers.ai_lawyer import process_ai_question  # noqa: F401
+        from handlers.registration import process_full_name  # noqa: F401
+        from handlers.funeral import handle_address  # noqa: F401
+        from handlers.memory import process_memory_name  # noqa: F401
+
+    return router
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+            "text": "Спасибо, всё понятно",
+        },
+    }, context={"bot": None})
+
+
+async def measure(dp: Dispatcher, bot: Bot, messages: int, chats: int) -> tuple:
+    global checks, hops
+    updates = [make_update(i, 1000 + i % chats) for i in range(messages)]
+    # Прогрев: кэш состояний FSM и ленивые импорты
+    for update in updates[:chats]:
+        await dp.feed_update(bot, update)
+    checks = hops = 0
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+    return elapsed / messages * 1e6, checks / messages, hops / messages
+
+
+async def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        bot = Bot(token="42:TEST")
+        dp = Dispatcher(storage=SQLiteStorage(db, flush_interval=60))
+        for module in (common, funeral, ai_lawyer, shop, memory, registration, admin_panel, voice):
+            dp.include_router(module.router)
+
+        print(f"Сообщений: {messages}, чатов: {chats}")
+        after = await measure(dp, bot, messages, chats)
+        dp.include_router(legacy_router())
+        before = await measure(dp, bot, messages, chats)
+
+        for title, (us, per_message, per_hops) in (("до (перехватчик без фильтра)", before),
+                                                   ("после (состояние FSM)", after)):
+            print(f"{title:<29} {us:7.1f} мкс/сообщение, проверок хендлеров: {per_message:.1f}, "
+                  f"переходов в пул потоков: {per_hops:.1f}")
+
+        await dp.storage.close()
+        await bot.session.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
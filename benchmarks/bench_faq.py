@@ -0,0 +1,68 @@
+"""Локальная база FAQ: задержка поиска и доля вопросов, отвеченных без GPT-4.
+
+Прогоняет через FAQIndex поток вопросов, похожий на реальный: типовые
+вопросы в разных формулировках (в том числе с опечатками в пунктуации и
+регистре) вперемешку с редкими, на которые должен отвечать GPT-4.
+
+    python -m benchmarks.bench_faq [вопросов]
+"""
+import random
+import statistics
+import sys
+import time
+
+from config import FAQ_PATH, FAQ_MIN_CONFIDENCE
+from services.faq_index import FAQIndex
+
+# (вопрос, вес в потоке)
+TRAFFIC = [
+    ("Как оформить свидетельство о смерти?", 12),
+    ("где взять свидетельство о смерти", 8),
+    ("Подскажите, где получить гербовое свидетельство о смерти?", 4),
+    ("Какие документы нужны для кремации?", 8),
+    ("как оформить кремацию", 4),
+    ("как получить пособие на похороны", 6),
+    ("Социальное пособие на погребение", 3),
+    ("Какие документы нужны для похорон", 5),
+    ("место на кладбище", 3),
+    ("Сколько дней хранят тело в морге", 3),
+    ("Как вступить в наследство?", 3),
+    ("Пенсия после смерти пенсионера", 2),
+    ("Бесплатные похороны", 2),
+    ("Что делать если человек умер дома", 3),
+    ("как оформить наследство на квартиру", 2),
+    ("можно ли похоронить без свидетельства о смерти", 2),
+    ("сколько стоит гроб", 2),
+    ("можно ли развеять прах над морем", 1),
+    ("Как получить выплату на погребение от работодателя", 2),
+    ("Нужно ли платить налог с наследства от бабушки", 1),
+    ("документы для кремации собаки", 1),
+    ("Как перенести захоронение на другое кладбище", 1),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(1)
+    questions = rng.choices([q for q, _ in TRAFFIC], weights=[w for _, w in TRAFFIC], k=count)
+
+    started = time.perf_counter()
+    faq = FAQIndex(FAQ_PATH, min_confidence=FAQ_MIN_CONFIDENCE)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        faq.match(question)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    stats = faq.stats()
+    print(f"Ответов в базе: {stats['answers']}, построение индекса: {build_ms:.1f} мс")
+    print(f"Вопросов: {count}, отвечено из базы: {stats['answered']} ({stats['share']:.1%})")
+    print(f"Поиск: p50 {statistics.median(latencies) * 1e6:.0f} мкс, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
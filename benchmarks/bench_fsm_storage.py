@@ -0,0 +1,68 @@
+"""Задержка get/set состояний FSM: SQLiteStorage против MemoryStorage.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.bench_fsm_storage [количество_пользователей] [операций_на_пользователя]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database.db import Database
+from database.fsm_storage import SQLiteStorage
+
+
+async def run(storage, users: int, ops: int):
+    set_times, get_times = [], []
+    keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(users)]
+    for step in range(ops):
+        for key in keys:
+            started = time.perf_counter()
+            await storage.set_state(key, f"ClientRegistration:step_{step}")
+            await storage.update_data(key, {"step": step, "full_name": "Иванов Иван Иванович"})
+            set_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await storage.get_state(key)
+            await storage.get_data(key)
+            get_times.append(time.perf_counter() - started)
+    return set_times, get_times
+
+
+def report(name, set_times, get_times):
+    def us(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] * 1e6
+
+    print(
+        f"{name:<16} set p50 {us(set_times, 50):7.1f} мкс  p99 {us(set_times, 99):7.1f} мкс | "
+        f"get p50 {us(get_times, 50):7.1f} мкс  p99 {us(get_times, 99):7.1f} мкс"
+    )
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    print(f"Пользователей: {users}, шагов сценария: {ops}")
+
+    report("MemoryStorage", *await run(MemoryStorage(), users, ops))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        storage = SQLiteStorage(db, max_cached=users)
+        report("SQLiteStorage", *await run(storage, users, ops))
+
+        cold = SQLiteStorage(db, max_cached=users // 10 or 1)
+        await storage.close()
+        report("SQLite (10% кэш)", *await run(cold, users, ops))
+        await cold.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
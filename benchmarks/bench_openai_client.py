@@ -0,0 +1,65 @@
+"""Общий клиент OpenAI против нового клиента на каждый запрос.
+
+Поднимает мок OpenAI API на localhost (benchmarks/mock_openai.py) и
+сравнивает задержку и число TCP-соединений при создании OpenAIService
+на каждый вопрос (как было раньше) и при одном общем сервисе.
+
+    python -m benchmarks.bench_openai_client [запросов] [параллельно]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from services.openai_service import OpenAIService
+from tests.conftest import MockOpenAIServer
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def per_request(server: MockOpenAIServer, question: str):
+    service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+    try:
+        await service.get_legal_advice(question)
+    finally:
+        await service.close()
+
+
+async def run(mode: str, requests: int, concurrency: int):
+    server = await MockOpenAIServer().start()
+    shared = OpenAIService(api_key="sk-test", base_url=server.base_url)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        question = f"Вопрос {i}"
+        async with limit:
+            if mode == "shared":
+                return await timed(shared.get_legal_advice(question))
+            return await timed(per_request(server, question))
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(requests))))
+    elapsed = time.perf_counter() - started
+
+    await shared.close()
+    await server.stop()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return requests / elapsed, p50, p99, server.connections
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(f"Запросов: {requests}, параллельно: {concurrency}")
+    for mode in ("per-request", "shared"):
+        rate, p50, p99, connections = await run(mode, requests, concurrency)
+        print(f"{mode:>12}: {rate:7.0f} запр/с, p50 {p50:6.2f} мс, p99 {p99:6.2f} мс, соединений {connections}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
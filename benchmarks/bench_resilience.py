@@ -0,0 +1,54 @@
+"""Хвост задержек AI-запросов с дублированием и без.
+
+Запросы идут потоком, как у помощника юриста в боте. Мок OpenAI
+открывает поток за ``latency`` мс, но каждый ``slow_every``-й
+«зависает» на ``slow`` мс. Сравниваются p50/p95/p99 с выключенным и
+включённым дублирующим запросом после p95.
+
+    python -m benchmarks.bench_resilience [запросов] [latency_мс] [slow_мс] [slow_every]
+"""
+import asyncio
+import random
+import sys
+
+from services.ai_queue import AIJobQueue
+from services.openai_service import OpenAIService
+from services.resilience import ResilientCaller
+from tests.conftest import MockOpenAIServer
+
+
+async def run(requests: int, latency: float, slow: float, slow_every: int, hedge_percentile: float):
+    server = await MockOpenAIServer().start()
+    rng = random.Random(1)
+    server.script = [
+        (200, slow if rng.randrange(slow_every) == 0 else latency * rng.uniform(0.8, 1.2))
+        for _ in range(requests * 2)
+    ]
+    resilience = ResilientCaller(deadline=30, hedge_percentile=hedge_percentile)
+    service = OpenAIService(
+        api_key="sk-test", base_url=server.base_url,
+        queue=AIJobQueue(concurrency=8), resilience=resilience,
+    )
+    for i in range(requests):
+        async for _ in service.stream_legal_advice(f"Вопрос номер {i}"):
+            pass
+    await service.close()
+    await server.stop()
+    return resilience.stats(), server.requests
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    slow = (int(sys.argv[3]) if len(sys.argv) > 3 else 500) / 1000
+    slow_every = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    print(f"Запросов: {requests}, обычный ответ {latency * 1000:.0f} мс, "
+          f"каждый ~{slow_every}-й — {slow * 1000:.0f} мс")
+    for name, percentile in (("без дублирования", 0), ("дублирование p95", 95)):
+        stats, upstream = await run(requests, latency, slow, slow_every, percentile)
+        print(f"{name:>17}: p50 {stats['p50_ms']} мс, p95 {stats['p95_ms']} мс, p99 {stats['p99_ms']} мс, "
+              f"запросов к API {upstream}, выиграл дубль {stats['hedge_wins']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
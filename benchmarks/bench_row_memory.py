@@ -0,0 +1,85 @@
+"""Сравнение памяти на строку: словари против Row-объектов со __slots__.
+
+Имитирует выгрузку всех клиентов для админки (get_all_clients) на 100 000
+строк. Запуск из корня проекта:
+
+    python -m benchmarks.bench_row_memory [количество_строк]
+"""
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+from database.models import Client
+
+CLIENT_COLUMNS = [name for name in Client.fields() if name not in Client.joined_fields]
+
+
+def make_connection(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE clients ({', '.join(CLIENT_COLUMNS)})")
+    conn.execute("CREATE TABLE users (telegram_id, username, first_name, last_name)")
+    conn.executemany(
+        f"INSERT INTO clients VALUES ({', '.join('?' * len(CLIENT_COLUMNS))})",
+        (
+            (i, 1000 + i, f"Иванов Иван {i}", "+79990000000", f"user{i}@mail.ru", "01.01.1970",
+             "1234", "567890", "ОВД района", "01.01.2000", "г. Москва, ул. Ленина, 1",
+             "+79991111111", "сын", i % 2, "2024-01-01 00:00:00", "2024-01-01 00:00:00")
+            for i in range(rows)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?)",
+        ((1000 + i, f"user{i}", "Иван", "Иванов") for i in range(rows)),
+    )
+    return conn
+
+
+QUERY = f"""
+    SELECT {Client.columns('c')}, u.username, u.first_name, u.last_name
+    FROM clients c LEFT JOIN users u ON c.telegram_id = u.telegram_id
+"""
+
+
+def as_dicts(conn):
+    # Прежняя реализация get_all_clients: словарь на каждую строку
+    keys = Client.fields()
+    result = []
+    for row in conn.execute(QUERY):
+        item = dict(zip(keys, row))
+        item['is_verified'] = bool(item['is_verified'])
+        result.append(item)
+    return result
+
+
+def as_rows(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = Client.factory
+    return cursor.execute(QUERY).fetchall()
+
+
+def measure(name, fn, conn, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(conn)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    container = sys.getsizeof(result[0]) if result else 0
+    print(
+        f"{name:<8} {current / rows:8.0f} байт/строка (контейнер {container} байт)  "
+        f"пик {peak / 2 ** 20:7.1f} МиБ  {elapsed * 1000:7.0f} мс"
+    )
+    del result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    conn = make_connection(rows)
+    print(f"Строк: {rows}")
+    measure("dict", as_dicts, conn, rows)
+    measure("Row", as_rows, conn, rows)
+
+
+if __name__ == "__main__":
+    main()
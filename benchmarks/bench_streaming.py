@@ -0,0 +1,53 @@
+"""Время до появления текста: полный ответ против потокового.
+
+Мок OpenAI отдаёт ответ из N слов с задержкой между словами (как модель,
+генерирующая токены). Измеряется момент первой правки сообщения
+«Обрабатываю...» и число правок.
+
+    python -m benchmarks.bench_streaming [слов] [задержка_мс] [интервал_правок_мс]
+"""
+import asyncio
+import sys
+import time
+
+from services.openai_service import OpenAIService
+from services.progressive_message import ProgressiveMessage
+from tests.conftest import MockOpenAIServer
+
+
+class FakeMessage:
+    def __init__(self, started: float):
+        self.started = started
+        self.edit_times = []
+
+    async def edit_text(self, text, reply_markup=None):
+        self.edit_times.append(time.monotonic() - self.started)
+
+
+async def main():
+    words = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    token_delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 30) / 1000
+    interval = (int(sys.argv[3]) if len(sys.argv) > 3 else 1000) / 1000
+    answer = " ".join(f"слово{i}" for i in range(words))
+    server = await MockOpenAIServer(answer=answer, token_delay=token_delay).start()
+    service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+    print(f"Слов: {words}, задержка между словами: {token_delay * 1000:.0f} мс")
+
+    message = FakeMessage(time.monotonic())
+    await message.edit_text(await service.get_legal_advice("вопрос"))
+    print(f"  полный ответ: первый текст через {message.edit_times[0]:.2f} с, правок 1")
+
+    message = FakeMessage(time.monotonic())
+    progressive = ProgressiveMessage(message, min_interval=interval)
+    async for chunk in service.stream_legal_advice("вопрос"):
+        await progressive.feed(chunk)
+    await progressive.finish()
+    print(f"  поток:        первый текст через {message.edit_times[0]:.2f} с, "
+          f"готово через {message.edit_times[-1]:.2f} с, правок {len(message.edit_times)}")
+
+    await service.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Рендер страниц памяти: прежний str.replace против скомпилированного Jinja2.
+
+Прежний способ — по одному проходу ``str.replace`` по всему шаблону на
+каждое поле (без экранирования и без обработки ``{% if %}``); новый —
+шаблон, скомпилированный один раз на процесс.
+
+    python -m benchmarks.bench_templates [страниц]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from services.memory_service import DEFAULT_TEMPLATE
+from services.page_renderer import TemplateRenderer
+
+
+def legacy_render(template: str, data: dict) -> str:
+    html_content = template
+    for key, value in data.items():
+        html_content = html_content.replace(f'{{{{{key}}}}}', '' if value is None else str(value))
+    return html_content
+
+
+def page(i: int) -> dict:
+    return {
+        'name': f"Иванов Иван Иванович {i}",
+        'birth_date': "01.01.1940",
+        'death_date': "01.01.2024",
+        'memory_text': "Любящий отец и дед, всю жизнь проработал учителем. " * 20,
+        'photo_path': f"memory_photos/{i}.jpg" if i % 2 else None,
+        'candles_count': i % 50,
+        'created_at': "18.10.2026 12:00",
+    }
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = [page(i) for i in range(pages)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "memory_template.html"), "w", encoding="utf-8") as f:
+            f.write(DEFAULT_TEMPLATE)
+
+        started = time.perf_counter()
+        for item in data:
+            # Как раньше: шаблон читается с диска при создании MemoryService
+            with open(os.path.join(tmp, "memory_template.html"), encoding="utf-8") as f:
+                legacy_render(f.read(), item)
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        renderer = TemplateRenderer(tmp, "memory_template.html", bytecode_dir=tmp)
+        for item in data:
+            renderer.render(**item)
+        jinja = time.perf_counter() - started
+
+    print(f"Страниц: {pages}")
+    print(f"str.replace + чтение файла: {legacy / pages * 1e6:7.1f} мкс/страница ({pages / legacy:8.0f} страниц/с)")
+    print(f"Jinja2 (скомпилирован):     {jinja / pages * 1e6:7.1f} мкс/страница ({pages / jinja:8.0f} страниц/с), "
+          f"загрузок шаблона: {renderer.loads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Пропускная способность webhook-режима на синтетических апдейтах.
+
+Поднимает приложение из webhook.py на localhost с тестовым роутером,
+хендлер которого имитирует медленную операцию (запрос к OpenAI, загрузку
+файла), и отправляет на него POST-запросы от множества чатов.
+
+    python -m benchmarks.bench_webhook [апдейтов] [чатов] [задержка_мс]
+"""
+import asyncio
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from services.update_queue import UpdateWorkerPool
+from webhook import create_webhook_app
+
+
+def make_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+            "text": "Как оформить свидетельство о смерти?",
+        },
+    }
+
+
+async def run(workers: int, updates: int, chats: int, delay: float) -> float:
+    router = Router()
+
+    @router.message()
+    async def slow_handler(message: Message):
+        await asyncio.sleep(delay)
+
+    bot = Bot(token="42:TEST")
+    dp = Dispatcher()
+    dp.include_router(router)
+    pool = UpdateWorkerPool(lambda update: dp.feed_update(bot, update), workers=workers, max_pending=1000)
+    app = create_webhook_app(bot, dp, pool, path="/webhook")
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/webhook"
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=100)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def post(i):
+            async with session.post(url, json=make_update(i, i % chats)) as response:
+                assert response.status == 200
+
+        await asyncio.gather(*(post(i) for i in range(1, updates + 1)))
+    await pool.join()
+    elapsed = time.perf_counter() - started
+
+    await runner.cleanup()
+    await bot.session.close()
+    return updates / elapsed
+
+
+async def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    delay = (int(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+    print(f"Апдейтов: {updates}, чатов: {chats}, задержка хендлера: {delay * 1000:.0f} мс")
+    for workers in (1, 4, 16, 64):
+        rate = await run(workers, updates, chats, delay)
+        print(f"воркеров {workers:>3}: {rate:8.0f} апдейтов/с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,8 +6,63 @@ load_dotenv()
 # Telegram Bot Token
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-# OpenAI API Key
+# OpenAI API Key. Без него бот запускается, но AI-помощник, распознавание
+# голосовых и текст страниц памяти отключены (в логе — ошибка при запуске)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Адрес API (для локального мок-сервера); по умолчанию — api.openai.com
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Таймауты (секунды) и пул keep-alive соединений общего клиента
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+# Повторы на 429/5xx/таймаут и общий срок ответа (секунды) с учётом повторов
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+AI_DEADLINE = float(os.getenv("AI_DEADLINE", "30"))
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+# Срок подготовки текста страницы памяти (фоновая задача, пользователь её не ждёт)
+AI_MEMORY_DEADLINE = float(os.getenv("AI_MEMORY_DEADLINE", "180"))
+# Дублирующий запрос, если ответа нет дольше этого перцентиля задержки (0 — выключено)
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+# Предохранитель: сбоев подряд до открытия и пауза до пробного запроса (секунды)
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))
+AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))
+# Очередь запросов к OpenAI: одновременных запросов и бюджет в минуту (0 — без ограничения)
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "4"))
+AI_REQUESTS_PER_MINUTE = int(os.getenv("AI_REQUESTS_PER_MINUTE", "500"))
+AI_TOKENS_PER_MINUTE = int(os.getenv("AI_TOKENS_PER_MINUTE", "40000"))
+
+# Дневные лимиты на пользователя (0 — без ограничения) и цена GPT-4 за 1000 токенов, $
+AI_DAILY_REQUESTS = int(os.getenv("AI_DAILY_REQUESTS", "50"))
+AI_DAILY_TOKENS = int(os.getenv("AI_DAILY_TOKENS", "50000"))
+AI_USAGE_FLUSH_INTERVAL = float(os.getenv("AI_USAGE_FLUSH_INTERVAL", "5"))
+AI_PRICE_PROMPT_1K = float(os.getenv("AI_PRICE_PROMPT_1K", "0.03"))
+AI_PRICE_COMPLETION_1K = float(os.getenv("AI_PRICE_COMPLETION_1K", "0.06"))
+# Цена расшифровки голосовых (whisper-1) за минуту, $
+AI_PRICE_TRANSCRIPTION_MIN = float(os.getenv("AI_PRICE_TRANSCRIPTION_MIN", "0.006"))
+
+# Голосовые сообщения длиннее или больше этого отклоняются до скачивания
+VOICE_MAX_DURATION = int(os.getenv("VOICE_MAX_DURATION", "120"))
+VOICE_MAX_FILE_SIZE = int(os.getenv("VOICE_MAX_FILE_SIZE", str(5 * 1024 * 1024)))
+# Очередь расшифровки: обработчиков, ожидающих всего и от одного пользователя
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "2"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "100"))
+TRANSCRIPTION_PER_USER = int(os.getenv("TRANSCRIPTION_PER_USER", "3"))
+# Сколько последних расшифровок держать в памяти (все хранятся в базе)
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1000"))
+
+# Фоновая подготовка страниц памяти: одновременно, попыток и пауза между ними (с)
+MEMORY_PAGE_WORKERS = int(os.getenv("MEMORY_PAGE_WORKERS", "2"))
+MEMORY_PAGE_ATTEMPTS = int(os.getenv("MEMORY_PAGE_ATTEMPTS", "3"))
+MEMORY_PAGE_RETRY_DELAY = float(os.getenv("MEMORY_PAGE_RETRY_DELAY", "30"))
+
+# Кэш ответов AI-помощника: время жизни (секунды), размер и порог сходства вопросов
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 60 * 60)))
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1000"))
+AI_CACHE_SIMILARITY = float(os.getenv("AI_CACHE_SIMILARITY", "0.8"))
+# Минимальный интервал (секунды) между правками сообщения при потоковом ответе
+AI_STREAM_EDIT_INTERVAL = float(os.getenv("AI_STREAM_EDIT_INTERVAL", "1.0"))
 
 # Admin Telegram IDs (comma separated list)
 ADMIN_IDS = [
@@ -16,10 +71,45 @@ ADMIN_IDS = [
 
 # Database
 DATABASE_PATH = "bot_database.db"
+# Количество потоков-читателей SQLite (писатель всегда один)
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+# Размер кэша подготовленных выражений на каждое соединение
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+# Отложенная запись логов: сброс каждые N мс или по M строк
+AUDIT_LOG_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_LOG_FLUSH_INTERVAL_MS", "200"))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "100"))
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+
+# Хранилище состояний FSM: "sqlite" (переживает перезапуск) или "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+# Через сколько секунд простоя незавершённый сценарий удаляется
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 60 * 60)))
+# Максимум ключей в кэше и период сброса изменений в базу
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1.0"))
+
+# Webhook-режим (webhook.py): публичный адрес, путь и секрет для заголовка Telegram
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+# Параллельная обработка апдейтов и лимит принятых, но не обработанных апдейтов
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "16"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+# Сколько хендлеров разных чатов может выполняться одновременно (в чате — по одному)
+HANDLER_CONCURRENCY = int(os.getenv("HANDLER_CONCURRENCY", "64"))
+
+# Локальная база типовых вопросов AI-помощнику и минимальная уверенность ответа из неё
+FAQ_PATH = os.getenv("FAQ_PATH", "data/faq.json")
+FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", "0.7"))
 
 # File paths
 MEMORY_PAGES_DIR = "memory_pages"
 TEMPLATES_DIR = "templates"
+# Каталог кэша скомпилированных шаблонов Jinja2 (пусто — временный каталог системы)
+TEMPLATE_BYTECODE_DIR = os.getenv("TEMPLATE_BYTECODE_DIR", "")
 
 # Create directories if they don't exist
 os.makedirs(MEMORY_PAGES_DIR, exist_ok=True)
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+# SQL для таблиц, запись в которые идёт через отложенный журнал
+AUDIT_INSERTS: Dict[str, str] = {
+    "chat_logs": '''
+        INSERT INTO chat_logs (telegram_id, message_type, message_text, handler_name, is_user_message)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    "request_logs": '''
+        INSERT INTO request_logs (telegram_id, request_type, request_data, response_data)
+        VALUES (?, ?, ?, ?)
+    ''',
+}
+
+_STOP = None
+
+
+class AuditLogWriter:
+    """Отложенная пакетная запись логов (chat_logs, request_logs).
+
+    Хендлеры только кладут строку в ограниченную очередь; фоновая задача
+    сбрасывает накопленное одной транзакцией каждые ``flush_interval``
+    секунд или по достижении ``batch_size`` строк. Если очередь заполнена,
+    ``put`` ждёт освобождения места (backpressure), а не теряет записи.
+    """
+
+    def __init__(self, db, batch_size: int = 100, flush_interval: float = 0.2, queue_size: int = 10000):
+        self._db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="audit-log-writer")
+
+    async def put(self, table: str, row: Tuple):
+        """Постановка строки в очередь на запись"""
+        await self._queue.put((table, row))
+
+    async def stop(self):
+        """Сброс оставшихся строк и остановка фоновой задачи"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: List[Tuple[str, Tuple]]):
+        grouped: Dict[str, List[Tuple]] = {}
+        for table, row in batch:
+            grouped.setdefault(table, []).append(row)
+
+        def write(conn: sqlite3.Connection):
+            for table, rows in grouped.items():
+                conn.executemany(AUDIT_INSERTS[table], rows)
+
+        try:
+            await self._db._write(write)
+            self.flushed_rows += len(batch)
+            self.flushed_batches += 1
+        except Exception as e:
+            logging.error(f"[DB] Ошибка записи журнала ({len(batch)} строк): {e}", exc_info=True)
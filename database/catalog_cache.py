@@ -0,0 +1,78 @@
+import asyncio
+from typing import Dict, List, Optional
+
+
+class _CatalogSnapshot:
+    __slots__ = ('products', 'by_id', 'by_category', 'categories')
+
+    def __init__(self, products: List[Dict]):
+        self.products = products
+        self.by_id = {product['id']: product for product in products}
+        self.by_category: Dict[str, List[Dict]] = {}
+        for product in products:
+            if product['category'] is not None:
+                self.by_category.setdefault(product['category'], []).append(product)
+        self.categories = list(self.by_category)
+
+
+class CatalogCache:
+    """Кэш каталога товаров в памяти процесса.
+
+    Каталог меняется только через админ-панель (``add_product`` /
+    ``delete_product``), поэтому он целиком загружается одним запросом
+    и хранится вместе с индексом по категориям. Операции записи вызывают
+    ``invalidate()``, увеличивая номер версии; следующее чтение
+    перезагружает снимок.
+    """
+
+    def __init__(self, loader):
+        # loader — корутина без аргументов, возвращающая все товары, отсортированные по id
+        self._loader = loader
+        self._lock = asyncio.Lock()
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """Сброс снимка после изменения каталога"""
+        self.version += 1
+        self._snapshot = None
+
+    def stats(self) -> Dict[str, int]:
+        return {'version': self.version, 'hits': self.hits, 'misses': self.misses}
+
+    async def _get_snapshot(self) -> _CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог загрузить другой запрос
+            if self._snapshot is not None:
+                self.hits += 1
+                return self._snapshot
+
+            self.misses += 1
+            version = self.version
+            snapshot = _CatalogSnapshot(await self._loader())
+
+            # Каталог изменили во время загрузки — отдаём результат, но не кэшируем
+            if version == self.version:
+                self._snapshot = snapshot
+            return snapshot
+
+    async def get_products(self, category: str = None) -> List[Dict]:
+        snapshot = await self._get_snapshot()
+        if category:
+            return list(snapshot.by_category.get(category, []))
+        return list(snapshot.products)
+
+    async def get_product(self, product_id: int) -> Optional[Dict]:
+        snapshot = await self._get_snapshot()
+        return snapshot.by_id.get(product_id)
+
+    async def get_categories(self) -> List[str]:
+        snapshot = await self._get_snapshot()
+        return list(snapshot.categories)
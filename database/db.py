@@ -1,148 +1,158 @@
 import sqlite3
 import asyncio
-from typing import List, Dict, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Optional, Tuple, Type
 from datetime import datetime
 import json
+import time
+
+from config import (
+    DB_READERS,
+    DB_STATEMENT_CACHE,
+    AUDIT_LOG_BATCH_SIZE,
+    AUDIT_LOG_FLUSH_INTERVAL_MS,
+    AUDIT_LOG_QUEUE_SIZE,
+)
+from database.audit_log import AuditLogWriter, AUDIT_INSERTS
+from database.catalog_cache import CatalogCache
+from database.migrations import apply_migrations
+from database.models import Row, Product, MemoryRecord, ChatLog, Client
+
+PRODUCT_COLUMNS = Product.columns()
+MEMORY_RECORD_COLUMNS = MemoryRecord.columns()
+
 
 class Database:
-    def __init__(self, db_path: str):
+    """Асинхронная обёртка над SQLite.
+
+    Все запросы выполняются в выделенных потоках: один поток-писатель
+    (SQLite допускает только одну пишущую транзакцию) и пул читателей.
+    Каждый поток держит своё постоянное соединение, настроенное один раз,
+    поэтому event loop никогда не блокируется на дисковом I/O.
+    """
+
+    def __init__(self, db_path: str, readers: int = DB_READERS):
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="db-writer",
+            initializer=self._open_connection,
+        )
+        self._readers = ThreadPoolExecutor(
+            max_workers=max(1, readers),
+            thread_name_prefix="db-reader",
+            initializer=self._open_connection,
+        )
+        self._audit: Optional[AuditLogWriter] = None
+        self.catalog = CatalogCache(self._load_products)
         self.init_db()
-    
-    def init_db(self):
-        """Инициализация базы данных"""
-        conn = sqlite3.connect(self.db_path)
+
+    # ===== Соединения и потоки =====
+
+    def _open_connection(self):
+        """Открытие постоянного соединения для текущего рабочего потока"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        with self._connections_lock:
+            self._connections.append(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        return self._local.conn
+
+    def _run_write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполнение функции в транзакции (в потоке-писателе)"""
+        conn = self._conn()
+        with conn:
+            return fn(conn)
+
+    def _run_read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return fn(self._conn())
+
+    async def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_write, fn)
+
+    async def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn)
+
+    async def _execute(self, query: str, params: Tuple = ()) -> sqlite3.Cursor:
+        return await self._write(lambda conn: conn.execute(query, params))
+
+    async def _fetchall(self, query: str, params: Tuple = (), row_type: Type[Row] = None) -> List[Any]:
+        return await self._read(lambda conn: self._cursor(conn, query, params, row_type).fetchall())
+
+    async def _fetchone(self, query: str, params: Tuple = (), row_type: Type[Row] = None) -> Optional[Any]:
+        return await self._read(lambda conn: self._cursor(conn, query, params, row_type).fetchone())
+
+    @staticmethod
+    def _cursor(conn: sqlite3.Connection, query: str, params: Tuple, row_type: Optional[Type[Row]]) -> sqlite3.Cursor:
         cursor = conn.cursor()
-        
-        # Таблица пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                telegram_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица анкет похорон
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS funeral_forms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER,
-                body_location TEXT,
-                funeral_type TEXT,
-                services TEXT,
-                budget TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
-            )
-        ''')
-        
-        # Таблица товаров
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                price REAL,
-                category TEXT,
-                photo_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица записей памяти
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS memory_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER,
-                name TEXT NOT NULL,
-                birth_date TEXT,
-                death_date TEXT,
-                memory_text TEXT,
-                photo_path TEXT,
-                html_path TEXT,
-                candles_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
-            )
-        ''')
-        
-        # Таблица свечей памяти
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS memory_candles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                memory_record_id INTEGER,
-                telegram_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (memory_record_id) REFERENCES memory_records (id),
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
-            )
-        ''')
-        
-        # Таблица логов запросов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS request_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER,
-                request_type TEXT,
-                request_data TEXT,
-                response_data TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
-            )
-        ''')
-        
-        # Таблица логов диалогов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER,
-                message_type TEXT,
-                message_text TEXT,
-                handler_name TEXT,
-                is_user_message BOOLEAN,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
-            )
-        ''')
-        
-        # Таблица клиентов с полными реквизитами
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE,
-                full_name TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                email TEXT,
-                birth_date TEXT,
-                passport_series TEXT,
-                passport_number TEXT,
-                passport_issued_by TEXT,
-                passport_issue_date TEXT,
-                address TEXT,
-                emergency_contact TEXT,
-                relationship TEXT,
-                is_verified BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        if row_type is not None:
+            cursor.row_factory = row_type.factory
+        return cursor.execute(query, params)
+
+    async def start_audit_log(self):
+        """Включение отложенной пакетной записи chat_logs и request_logs"""
+        if self._audit is None:
+            self._audit = AuditLogWriter(
+                self,
+                batch_size=AUDIT_LOG_BATCH_SIZE,
+                flush_interval=AUDIT_LOG_FLUSH_INTERVAL_MS / 1000,
+                queue_size=AUDIT_LOG_QUEUE_SIZE,
             )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        
+        self._audit.start()
+
+    async def _log(self, table: str, row: Tuple):
+        if self._audit is not None and self._audit.running:
+            await self._audit.put(table, row)
+        else:
+            await self._execute(AUDIT_INSERTS[table], row)
+
+    async def close(self):
+        """Остановка рабочих потоков и закрытие соединений"""
+        if self._audit is not None:
+            await self._audit.stop()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    # ===== Схема =====
+
+    def init_db(self):
+        """Инициализация базы данных (применение миграций схемы)"""
+        self.schema_version = self._writer.submit(self._run_write, apply_migrations).result()
+
         # Инициализация товаров
         self.init_products()
-    
+
     def init_products(self):
         """Инициализация товаров в базе данных"""
-        conn = sqlite3.connect(self.db_path)
+        self._writer.submit(self._run_write, self._seed_products).result()
+
+    def _seed_products(self, conn: sqlite3.Connection):
         cursor = conn.cursor()
-        
+
         # Проверяем, есть ли уже товары
         cursor.execute("SELECT COUNT(*) FROM products")
         if cursor.fetchone()[0] == 0:
@@ -152,12 +162,12 @@ class Database:
                 ("Гроб деревянный премиум", "Гроб из дуба с резными элементами", 25000, "coffin", "photos/coffin2.jpg"),
                 ("Гроб металлический", "Металлический гроб с отделкой", 35000, "coffin", "photos/coffin3.jpg"),
                 ("Гроб детский", "Детский гроб из дерева", 8000, "coffin", "photos/coffin4.jpg"),
-                
+
                 # Венки
                 ("Венок траурный стандартный", "Классический траурный венок", 3000, "wreath", "photos/wreath1.jpg"),
                 ("Венок премиум", "Венок из живых цветов", 8000, "wreath", "photos/wreath2.jpg"),
                 ("Венок детский", "Небольшой венок для детей", 2000, "wreath", "photos/wreath3.jpg"),
-                
+
                 # Кресты
                 ("Крест деревянный", "Деревянный крест для могилы", 5000, "cross", "photos/cross1.jpg"),
                 ("Крест металлический", "Металлический крест с покрытием", 12000, "cross", "photos/cross2.jpg"),
@@ -173,299 +183,303 @@ class Database:
                 # Ограды
                 ("Ограда металлическая", "Металлическая ограда", 15000, "fence", "photos/fence1.jpg"),
             ]
-            
+
             cursor.executemany(
                 "INSERT INTO products (name, description, price, category, photo_path) VALUES (?, ?, ?, ?, ?)",
                 products
             )
-            
-            conn.commit()
-        
-        conn.close()
-    
+
+    # ===== Пользователи и анкеты =====
+
     async def add_user(self, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Добавление пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self._execute('''
             INSERT OR REPLACE INTO users (telegram_id, username, first_name, last_name, last_activity)
             VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
         ''', (telegram_id, username, first_name, last_name))
-        
-        conn.commit()
-        conn.close()
-    
+
     async def save_funeral_form(self, telegram_id: int, body_location: str, funeral_type: str, services: List[str], budget: str):
         """Сохранение анкеты похорон"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         services_json = json.dumps(services)
-        
-        cursor.execute('''
+
+        await self._execute('''
             INSERT INTO funeral_forms (telegram_id, body_location, funeral_type, services, budget)
             VALUES (?, ?, ?, ?, ?)
         ''', (telegram_id, body_location, funeral_type, services_json, budget))
-        
-        conn.commit()
-        conn.close()
-    
-    async def get_products_by_category(self, category: str = None) -> List[Dict]:
-        """Получение товаров по категории"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if category:
-            cursor.execute("SELECT * FROM products WHERE category = ?", (category,))
-        else:
-            cursor.execute("SELECT * FROM products")
-        
-        products = []
-        for row in cursor.fetchall():
-            products.append({
-                'id': row[0],
-                'name': row[1],
-                'description': row[2],
-                'price': row[3],
-                'category': row[4],
-                'photo_path': row[5]
-            })
-        
-        conn.close()
-        return products
+
+    # ===== Товары =====
+
+    async def get_products_by_category(self, category: str = None) -> List[Product]:
+        """Получение товаров по категории (из кэша каталога)"""
+        return await self.catalog.get_products(category)
+
+    async def get_product(self, product_id: int) -> Optional[Product]:
+        """Получение одного товара по ID (из кэша каталога)"""
+        return await self.catalog.get_product(product_id)
+
+    async def _load_products(self) -> List[Product]:
+        """Загрузка всего каталога для CatalogCache"""
+        return await self._fetchall(f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY id", row_type=Product)
+
+    async def get_products(self, product_ids: List[int]) -> List[Product]:
+        """Получение нескольких товаров по ID одним запросом (в порядке ids)"""
+        if not product_ids:
+            return []
+        placeholders = ", ".join("?" * len(product_ids))
+        rows = await self._fetchall(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id IN ({placeholders})",
+            tuple(product_ids),
+            row_type=Product
+        )
+        by_id = {row.id: row for row in rows}
+        return [by_id[pid] for pid in product_ids if pid in by_id]
 
     async def add_product(self, name: str, price: float, category: str = None,
                            description: str = None, photo_path: str = "photos/placeholder.jpg"):
         """Добавление нового товара"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
+        await self._execute(
             """
             INSERT INTO products (name, description, price, category, photo_path)
             VALUES (?, ?, ?, ?, ?)
             """,
             (name, description, price, category, photo_path)
         )
-
-        conn.commit()
-        conn.close()
+        self.catalog.invalidate()
 
     async def delete_product(self, product_id: int) -> bool:
         """Удаление товара по ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        cursor = await self._execute("DELETE FROM products WHERE id = ?", (product_id,))
         deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        if deleted:
+            self.catalog.invalidate()
         return deleted
 
     async def get_categories(self) -> List[str]:
-        """Получить список категорий товаров"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL")
-        categories = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return categories
-    
+        """Получить список категорий товаров (из кэша каталога)"""
+        return await self.catalog.get_categories()
+
+    # ===== Уголок памяти =====
+
     async def create_memory_record(self, telegram_id: int, name: str, birth_date: str, death_date: str, memory_text: str, photo_path: str, html_path: str):
         """Создание записи памяти"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        cursor = await self._execute('''
             INSERT INTO memory_records (telegram_id, name, birth_date, death_date, memory_text, photo_path, html_path)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (telegram_id, name, birth_date, death_date, memory_text, photo_path, html_path))
-        
-        record_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return record_id
-    
-    async def add_candle(self, memory_record_id: int, telegram_id: int):
-        """Добавление свечи к записи памяти"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Проверяем, не зажигал ли уже этот пользователь свечу
-        cursor.execute('''
-            SELECT id FROM memory_candles 
-            WHERE memory_record_id = ? AND telegram_id = ?
+
+        return cursor.lastrowid
+
+    async def create_memory_record_with_page_job(self, telegram_id: int, chat_id: int, name: str, birth_date: str,
+                                                 death_date: str, memory_text: str, photo_path: str) -> int:
+        """Запись памяти и задача подготовки её страницы одной транзакцией.
+
+        Если бот упадёт сразу после создания, задача продолжится при
+        перезапуске — записи без страницы и без задачи не остаётся.
+        """
+        def create(conn):
+            cursor = conn.execute('''
+                INSERT INTO memory_records (telegram_id, name, birth_date, death_date, memory_text, photo_path, html_path)
+                VALUES (?, ?, ?, ?, ?, ?, '')
+            ''', (telegram_id, name, birth_date, death_date, memory_text, photo_path))
+            conn.execute(
+                "INSERT INTO memory_page_jobs (record_id, chat_id, attempts, created_at) VALUES (?, ?, 0, ?)",
+                (cursor.lastrowid, chat_id, time.time()),
+            )
+            return cursor.lastrowid
+
+        return await self._write(create)
+
+    async def add_memory_page_job(self, record_id: int, chat_id: int):
+        """Задача фоновой подготовки страницы памяти (переживает перезапуск)"""
+        await self._execute(
+            "INSERT OR IGNORE INTO memory_page_jobs (record_id, chat_id, attempts, created_at) VALUES (?, ?, 0, ?)",
+            (record_id, chat_id, time.time()),
+        )
+
+    async def get_memory_page_jobs(self) -> List[Tuple[int, int, int]]:
+        """Незавершённые задачи: (record_id, chat_id, attempts)"""
+        return await self._fetchall(
+            "SELECT record_id, chat_id, attempts FROM memory_page_jobs ORDER BY created_at"
+        )
+
+    async def retry_memory_page_job(self, record_id: int):
+        await self._execute(
+            "UPDATE memory_page_jobs SET attempts = attempts + 1 WHERE record_id = ?", (record_id,)
+        )
+
+    async def finish_memory_page_job(self, record_id: int, html_path: Optional[str] = None):
+        """Запись пути к готовой странице и удаление задачи одной транзакцией"""
+        def finish(conn):
+            if html_path is not None:
+                conn.execute("UPDATE memory_records SET html_path = ? WHERE id = ?", (html_path, record_id))
+            conn.execute("DELETE FROM memory_page_jobs WHERE record_id = ?", (record_id,))
+
+        await self._write(finish)
+
+    async def add_candle(self, memory_record_id: int, telegram_id: int) -> bool:
+        """Добавление свечи к записи памяти.
+
+        Одна свеча на пользователя гарантируется уникальным индексом,
+        счётчик candles_count увеличивает триггер. Возвращает True,
+        если свеча зажжена впервые.
+        """
+        cursor = await self._execute('''
+            INSERT OR IGNORE INTO memory_candles (memory_record_id, telegram_id)
+            VALUES (?, ?)
         ''', (memory_record_id, telegram_id))
-        
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO memory_candles (memory_record_id, telegram_id)
-                VALUES (?, ?)
-            ''', (memory_record_id, telegram_id))
-            
-            # Увеличиваем счетчик свечей
-            cursor.execute('''
-                UPDATE memory_records 
-                SET candles_count = candles_count + 1 
-                WHERE id = ?
-            ''', (memory_record_id,))
-            
-            conn.commit()
-            conn.close()
-            return True
-        
-        conn.close()
-        return False
-    
-    async def get_memory_records(self, telegram_id: int = None) -> List[Dict]:
+        return cursor.rowcount == 1
+
+    async def get_memory_records(self, telegram_id: int = None) -> List[MemoryRecord]:
         """Получение записей памяти"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         if telegram_id:
-            cursor.execute('''
-                SELECT mr.*, COUNT(mc.id) as candles_count 
-                FROM memory_records mr 
-                LEFT JOIN memory_candles mc ON mr.id = mc.memory_record_id 
-                WHERE mr.telegram_id = ? 
-                GROUP BY mr.id
-            ''', (telegram_id,))
+            return await self._fetchall(f'''
+                SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records
+                WHERE telegram_id = ?
+                ORDER BY id
+            ''', (telegram_id,), row_type=MemoryRecord)
+
+        return await self._fetchall(f'''
+            SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records
+            ORDER BY id
+        ''', row_type=MemoryRecord)
+
+    async def get_memory_record(self, record_id: int) -> Optional[MemoryRecord]:
+        """Получение одной записи памяти по ID"""
+        return await self._fetchone(
+            f"SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records WHERE id = ?", (record_id,),
+            row_type=MemoryRecord
+        )
+
+    async def get_memory_records_page(self, telegram_id: int = None, after_id: int = None,
+                                      before_id: int = None, limit: int = 10) -> List[MemoryRecord]:
+        """Keyset-пагинация записей памяти по id.
+
+        ``after_id`` — записи с id больше курсора, ``before_id`` — записи
+        с id меньше курсора (ближайшие к нему). Без курсоров возвращается
+        первая страница. Результат всегда упорядочен по возрастанию id.
+        """
+        conditions = []
+        params: List[Any] = []
+        if telegram_id:
+            conditions.append("telegram_id = ?")
+            params.append(telegram_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if before_id is not None else "ASC"
+        params.append(limit)
+
+        rows = await self._fetchall(f'''
+            SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records
+            {where}
+            ORDER BY id {order}
+            LIMIT ?
+        ''', tuple(params), row_type=MemoryRecord)
+
+        if before_id is not None:
+            rows.reverse()
+        return rows
+
+    async def get_last_memory_record(self, telegram_id: int = None) -> Optional[MemoryRecord]:
+        """Последняя (с наибольшим id) запись памяти"""
+        if telegram_id:
+            return await self._fetchone(f'''
+                SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records
+                WHERE telegram_id = ? ORDER BY id DESC LIMIT 1
+            ''', (telegram_id,), row_type=MemoryRecord)
+
+        return await self._fetchone(f'''
+            SELECT {MEMORY_RECORD_COLUMNS} FROM memory_records
+            ORDER BY id DESC LIMIT 1
+        ''', row_type=MemoryRecord)
+
+    async def count_memory_records(self, telegram_id: int = None) -> int:
+        """Количество записей памяти (всех или одного пользователя)"""
+        if telegram_id:
+            row = await self._fetchone("SELECT COUNT(*) FROM memory_records WHERE telegram_id = ?", (telegram_id,))
         else:
-            cursor.execute('''
-                SELECT mr.*, COUNT(mc.id) as candles_count 
-                FROM memory_records mr 
-                LEFT JOIN memory_candles mc ON mr.id = mc.memory_record_id 
-                GROUP BY mr.id
-            ''')
-        
-        records = []
-        for row in cursor.fetchall():
-            records.append({
-                'id': row[0],
-                'telegram_id': row[1],
-                'name': row[2],
-                'birth_date': row[3],
-                'death_date': row[4],
-                'memory_text': row[5],
-                'photo_path': row[6],
-                'html_path': row[7],
-                'candles_count': row[8],
-                'created_at': row[9]
-            })
-        
-        conn.close()
-        return records
-    
+            row = await self._fetchone("SELECT COUNT(*) FROM memory_records")
+        return row[0]
+
+    # ===== Логи и статистика =====
+
     async def log_request(self, telegram_id: int, request_type: str, request_data: str, response_data: str = None):
         """Логирование запросов"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO request_logs (telegram_id, request_type, request_data, response_data)
-            VALUES (?, ?, ?, ?)
-        ''', (telegram_id, request_type, request_data, response_data))
-        
-        conn.commit()
-        conn.close()
-    
+        await self._log("request_logs", (telegram_id, request_type, request_data, response_data))
+
     async def get_user_stats(self) -> Dict:
         """Получение статистики пользователей"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Общее количество пользователей
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        # Активные пользователи за последние 7 дней
-        cursor.execute("""
-            SELECT COUNT(*) FROM users 
-            WHERE last_activity > datetime('now', '-7 days')
-        """)
-        active_users = cursor.fetchone()[0]
-        
-        # Количество анкет
-        cursor.execute("SELECT COUNT(*) FROM funeral_forms")
-        total_forms = cursor.fetchone()[0]
-        
-        # Количество записей памяти
-        cursor.execute("SELECT COUNT(*) FROM memory_records")
-        total_memories = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        return {
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_forms': total_forms,
-            'total_memories': total_memories
-        }
-    
+        def collect(conn: sqlite3.Connection) -> Dict:
+            cursor = conn.cursor()
+
+            # Общее количество пользователей
+            cursor.execute("SELECT COUNT(*) FROM users")
+            total_users = cursor.fetchone()[0]
+
+            # Активные пользователи за последние 7 дней
+            cursor.execute("""
+                SELECT COUNT(*) FROM users
+                WHERE last_activity > datetime('now', '-7 days')
+            """)
+            active_users = cursor.fetchone()[0]
+
+            # Количество анкет
+            cursor.execute("SELECT COUNT(*) FROM funeral_forms")
+            total_forms = cursor.fetchone()[0]
+
+            # Количество записей памяти
+            cursor.execute("SELECT COUNT(*) FROM memory_records")
+            total_memories = cursor.fetchone()[0]
+
+            return {
+                'total_users': total_users,
+                'active_users': active_users,
+                'total_forms': total_forms,
+                'total_memories': total_memories
+            }
+
+        return await self._read(collect)
+
     async def log_chat_message(self, telegram_id: int, message_type: str, message_text: str, handler_name: str, is_user_message: bool):
         """Логирование сообщений диалога"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO chat_logs (telegram_id, message_type, message_text, handler_name, is_user_message)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (telegram_id, message_type, message_text, handler_name, is_user_message))
-        
-        conn.commit()
-        conn.close()
-    
-    async def get_chat_logs(self, telegram_id: int = None, limit: int = 100) -> List[Dict]:
+        await self._log("chat_logs", (telegram_id, message_type, message_text, handler_name, is_user_message))
+
+    async def get_chat_logs(self, telegram_id: int = None, limit: int = 100) -> List[ChatLog]:
         """Получение логов диалогов"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        columns = ChatLog.columns("cl")
         if telegram_id:
-            cursor.execute('''
-                SELECT cl.*, u.username, u.first_name 
-                FROM chat_logs cl 
+            return await self._fetchall(f'''
+                SELECT {columns}, u.username, u.first_name
+                FROM chat_logs cl
                 LEFT JOIN users u ON cl.telegram_id = u.telegram_id
-                WHERE cl.telegram_id = ? 
-                ORDER BY cl.created_at DESC 
+                WHERE cl.telegram_id = ?
+                ORDER BY cl.created_at DESC
                 LIMIT ?
-            ''', (telegram_id, limit))
-        else:
-            cursor.execute('''
-                SELECT cl.*, u.username, u.first_name 
-                FROM chat_logs cl 
-                LEFT JOIN users u ON cl.telegram_id = u.telegram_id
-                ORDER BY cl.created_at DESC 
-                LIMIT ?
-            ''', (limit,))
-        
-        logs = []
-        for row in cursor.fetchall():
-            logs.append({
-                'id': row[0],
-                'telegram_id': row[1],
-                'message_type': row[2],
-                'message_text': row[3],
-                'handler_name': row[4],
-                'is_user_message': bool(row[5]),
-                'created_at': row[6],
-                'username': row[7],
-                'first_name': row[8]
-            })
-        
-        conn.close()
-        return logs
-    
+            ''', (telegram_id, limit), row_type=ChatLog)
+
+        return await self._fetchall(f'''
+            SELECT {columns}, u.username, u.first_name
+            FROM chat_logs cl
+            LEFT JOIN users u ON cl.telegram_id = u.telegram_id
+            ORDER BY cl.created_at DESC
+            LIMIT ?
+        ''', (limit,), row_type=ChatLog)
+
     # Методы для работы с клиентами
     async def save_client_data(self, telegram_id: int, **kwargs) -> bool:
         """Сохранение данных клиента"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        def save(conn: sqlite3.Connection):
+            cursor = conn.cursor()
+
             # Проверяем, существует ли уже клиент
             cursor.execute("SELECT id FROM clients WHERE telegram_id = ?", (telegram_id,))
             existing_client = cursor.fetchone()
-            
+
             if existing_client:
                 # Обновляем существующего клиента
                 update_fields = []
@@ -474,11 +488,11 @@ class Database:
                     if value is not None:
                         update_fields.append(f"{key} = ?")
                         values.append(value)
-                
+
                 if update_fields:
                     update_fields.append("updated_at = CURRENT_TIMESTAMP")
                     values.append(telegram_id)
-                    
+
                     query = f"UPDATE clients SET {', '.join(update_fields)} WHERE telegram_id = ?"
                     cursor.execute(query, values)
             else:
@@ -486,112 +500,163 @@ class Database:
                 fields = ['telegram_id'] + list(kwargs.keys())
                 placeholders = ['?'] * len(fields)
                 values = [telegram_id] + list(kwargs.values())
-                
+
                 query = f"INSERT INTO clients ({', '.join(fields)}) VALUES ({', '.join(placeholders)})"
                 cursor.execute(query, values)
-            
-            conn.commit()
-            conn.close()
+
+        try:
+            await self._write(save)
             return True
-            
         except Exception as e:
-            conn.close()
             print(f"Ошибка при сохранении данных клиента: {e}")
             return False
-    
-    async def get_client_data(self, telegram_id: int) -> Optional[Dict]:
+
+    async def get_client_data(self, telegram_id: int) -> Optional[Client]:
         """Получение данных клиента"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM clients WHERE telegram_id = ?
-        ''', (telegram_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'id': row[0],
-                'telegram_id': row[1],
-                'full_name': row[2],
-                'phone': row[3],
-                'email': row[4],
-                'birth_date': row[5],
-                'passport_series': row[6],
-                'passport_number': row[7],
-                'passport_issued_by': row[8],
-                'passport_issue_date': row[9],
-                'address': row[10],
-                'emergency_contact': row[11],
-                'relationship': row[12],
-                'is_verified': bool(row[13]),
-                'created_at': row[14],
-                'updated_at': row[15]
-            }
-        return None
-    
+        return await self._fetchone(f'''
+            SELECT {Client.columns()} FROM clients WHERE telegram_id = ?
+        ''', (telegram_id,), row_type=Client)
+
     async def is_client_registered(self, telegram_id: int) -> bool:
         """Проверка, зарегистрирован ли клиент"""
-        client_data = await self.get_client_data(telegram_id)
-        return client_data is not None
-    
-    async def get_all_clients(self) -> List[Dict]:
+        row = await self._fetchone("SELECT 1 FROM clients WHERE telegram_id = ?", (telegram_id,))
+        return row is not None
+
+    async def get_all_clients(self) -> List[Client]:
         """Получение всех клиентов"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT c.*, u.username, u.first_name, u.last_name 
-            FROM clients c 
+        return await self._fetchall(f'''
+            SELECT {Client.columns("c")}, u.username, u.first_name, u.last_name
+            FROM clients c
             LEFT JOIN users u ON c.telegram_id = u.telegram_id
             ORDER BY c.created_at DESC
-        ''')
-        
-        clients = []
-        for row in cursor.fetchall():
-            clients.append({
-                'id': row[0],
-                'telegram_id': row[1],
-                'full_name': row[2],
-                'phone': row[3],
-                'email': row[4],
-                'birth_date': row[5],
-                'passport_series': row[6],
-                'passport_number': row[7],
-                'passport_issued_by': row[8],
-                'passport_issue_date': row[9],
-                'address': row[10],
-                'emergency_contact': row[11],
-                'relationship': row[12],
-                'is_verified': bool(row[13]),
-                'created_at': row[14],
-                'updated_at': row[15],
-                'username': row[16],
-                'first_name': row[17],
-                'last_name': row[18]
-            })
-        
-        conn.close()
-        return clients
-    
+        ''', row_type=Client)
+
     async def verify_client(self, telegram_id: int) -> bool:
         """Верификация клиента"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                UPDATE clients SET is_verified = TRUE, updated_at = CURRENT_TIMESTAMP 
+            await self._execute('''
+                UPDATE clients SET is_verified = TRUE, updated_at = CURRENT_TIMESTAMP
                 WHERE telegram_id = ?
             ''', (telegram_id,))
-            
-            conn.commit()
-            conn.close()
             return True
-            
+
         except Exception as e:
-            conn.close()
             print(f"Ошибка при верификации клиента: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+    # ===== Кэш ответов AI =====
+
+    async def get_cached_answers(self, limit: int) -> List[Tuple]:
+        """Последние по использованию ответы: (key, question, answer, created_at, hits)"""
+        return await self._fetchall(
+            "SELECT key, question, answer, created_at, hits FROM ai_answer_cache "
+            "ORDER BY last_hit DESC LIMIT ?",
+            (limit,),
+        )
+
+    async def save_cached_answer(self, key: str, question: str, answer: str, created_at: float,
+                                 evicted: List[str] = ()):
+        """Сохранение ответа и удаление вытесненных одной транзакцией"""
+        def save(conn):
+            conn.execute('''
+                INSERT INTO ai_answer_cache (key, question, answer, created_at, last_hit, hits)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT(key) DO UPDATE SET
+                    answer = excluded.answer, created_at = excluded.created_at,
+                    last_hit = excluded.last_hit, hits = 0
+            ''', (key, question, answer, created_at, created_at))
+            if evicted:
+                conn.executemany("DELETE FROM ai_answer_cache WHERE key = ?", [(k,) for k in evicted])
+
+        await self._write(save)
+
+    async def add_cached_answer_hits(self, hits: List[Tuple[float, int, str]]):
+        """Накопленные попадания: (время последнего, число, key)"""
+        await self._write(lambda conn: conn.executemany(
+            "UPDATE ai_answer_cache SET last_hit = ?, hits = hits + ? WHERE key = ?", hits
+        ))
+
+    async def delete_cached_answers(self, keys: Optional[List[str]] = None):
+        """Удаление ответов по ключам; без ключей — очистка всего кэша"""
+        if keys is None:
+            await self._execute("DELETE FROM ai_answer_cache")
+        elif keys:
+            await self._write(
+                lambda conn: conn.executemany("DELETE FROM ai_answer_cache WHERE key = ?", [(k,) for k in keys])
+            )
+
+    # ===== Расход OpenAI =====
+
+    async def get_ai_usage_by_user(self, day: str) -> List[Tuple]:
+        """Расход за день по пользователям: (telegram_id, requests, prompt_tokens, completion_tokens, cost)"""
+        return await self._fetchall(
+            "SELECT telegram_id, SUM(requests), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+            "FROM ai_usage WHERE day = ? GROUP BY telegram_id",
+            (day,),
+        )
+
+    async def add_ai_usage(self, rows: List[Tuple]):
+        """Прибавление расхода: (telegram_id, day, feature, requests, prompt_tokens, completion_tokens, cost)"""
+        await self._write(lambda conn: conn.executemany('''
+            INSERT INTO ai_usage (telegram_id, day, feature, requests, prompt_tokens, completion_tokens, cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(telegram_id, day, feature) DO UPDATE SET
+                requests = requests + excluded.requests,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                cost = cost + excluded.cost
+        ''', rows))
+
+    async def get_ai_usage_by_feature(self, day: str) -> List[Tuple]:
+        return await self._fetchall('''
+            SELECT feature, SUM(requests), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost)
+            FROM ai_usage WHERE day = ? GROUP BY feature ORDER BY feature
+        ''', (day,))
+
+    async def get_ai_usage_top_users(self, day: str, limit: int) -> List[Tuple]:
+        """Пользователи с наибольшим расходом токенов за день"""
+        return await self._fetchall('''
+            SELECT au.telegram_id, u.username, SUM(au.requests),
+                   SUM(au.prompt_tokens + au.completion_tokens) AS tokens, SUM(au.cost)
+            FROM ai_usage au LEFT JOIN users u ON u.telegram_id = au.telegram_id
+            WHERE au.day = ? GROUP BY au.telegram_id ORDER BY tokens DESC LIMIT ?
+        ''', (day, limit))
+
+    # ===== Голосовые сообщения =====
+
+    async def get_voice_transcript(self, file_unique_id: str) -> Optional[str]:
+        row = await self._fetchone(
+            "SELECT transcript FROM voice_transcripts WHERE file_unique_id = ?", (file_unique_id,)
+        )
+        return row[0] if row is not None else None
+
+    async def save_voice_transcript(self, file_unique_id: str, transcript: str):
+        await self._execute(
+            "INSERT OR REPLACE INTO voice_transcripts (file_unique_id, transcript, created_at) VALUES (?, ?, ?)",
+            (file_unique_id, transcript, time.time()),
+        )
+
+    # ===== Состояния FSM =====
+
+    async def get_fsm_state(self, key: str) -> Optional[Tuple[Optional[str], Optional[str], float]]:
+        """Сохранённое состояние: (state, data в JSON, updated_at)"""
+        return await self._fetchone("SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,))
+
+    async def save_fsm_states(self, upserts: List[Tuple[str, Optional[str], str, float]], deletes: List[str]):
+        """Запись изменённых состояний (key, state, data, updated_at) и удаление пустых одной транзакцией"""
+        def save(conn):
+            if upserts:
+                conn.executemany('''
+                    INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+                ''', upserts)
+            if deletes:
+                conn.executemany("DELETE FROM fsm_states WHERE key = ?", [(key,) for key in deletes])
+
+        await self._write(save)
+
+    async def delete_fsm_states_before(self, updated_before: float) -> int:
+        """Удаление состояний, не менявшихся с ``updated_before``; возвращает число удалённых"""
+        cursor = await self._execute("DELETE FROM fsm_states WHERE updated_at < ?", (updated_before,))
+        return cursor.rowcount
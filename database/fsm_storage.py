@@ -0,0 +1,150 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database.write_behind import WriteBehind
+
+
+class _Entry:
+    __slots__ = ('state', 'data', 'touched')
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None, touched: float = 0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.touched = touched
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх SQLite, переживающее перезапуск бота.
+
+    Горячие ключи держатся в LRU-кэше ограниченного размера, изменения
+    копятся в памяти и сбрасываются одной транзакцией раз в
+    ``flush_interval`` секунд (несколько правок одного ключа — одна запись).
+    Состояния, которые не трогали дольше ``ttl`` секунд, удаляются и из
+    кэша, и из базы.
+    """
+
+    def __init__(self, db, ttl: float = 86400, max_cached: int = 10000, flush_interval: float = 1.0):
+        self._db = db
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self.flush_interval = flush_interval
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._dirty: Dict[str, _Entry] = {}
+        self._writer = WriteBehind(self._write_dirty, lambda: bool(self._dirty), flush_interval, "FSM",
+                                   periodic=self._maybe_evict)
+        self._last_eviction = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        thread_id = key.thread_id if key.thread_id is not None else ""
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{thread_id}:{key.destiny}"
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl > 0 and now - entry.touched > self.ttl
+
+    # ===== Кэш =====
+
+    async def _get_entry(self, key: StorageKey) -> _Entry:
+        storage_key = self._key(key)
+        now = time.time()
+
+        entry = self._cache.get(storage_key) or self._dirty.get(storage_key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            row = await self._db.get_fsm_state(storage_key)
+            # Пока шёл запрос, ключ мог быть записан конкурентным обновлением
+            entry = self._cache.get(storage_key) or self._dirty.get(storage_key)
+            if entry is None:
+                entry = _Entry(touched=now)
+                if row is not None:
+                    state, data, updated_at = row
+                    entry = _Entry(state, json.loads(data) if data else {}, updated_at)
+
+        if self._expired(entry, now):
+            entry = _Entry(touched=now)
+            self._mark_dirty(storage_key, entry)
+
+        self._remember(storage_key, entry)
+        return entry
+
+    def _remember(self, storage_key: str, entry: _Entry):
+        self._cache[storage_key] = entry
+        self._cache.move_to_end(storage_key)
+        # Вытесненные грязные записи остаются в _dirty до ближайшего сброса
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def _mark_dirty(self, storage_key: str, entry: _Entry):
+        entry.touched = time.time()
+        self._dirty[storage_key] = entry
+        self._writer.schedule()
+
+    # ===== BaseStorage =====
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._get_entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(self._key(key), entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get_entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._get_entry(key)
+        entry.data = data.copy()
+        self._mark_dirty(self._key(key), entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get_entry(key)).data.copy()
+
+    async def close(self) -> None:
+        await self._writer.close()
+
+    # ===== Фоновая запись и очистка =====
+
+    async def _maybe_evict(self):
+        if time.time() - self._last_eviction >= min(self.ttl, 60) > 0:
+            await self.evict_expired()
+            self._last_eviction = time.time()
+
+    async def flush(self):
+        """Запись накопленных изменений одной транзакцией"""
+        await self._writer.flush()
+
+    async def _write_dirty(self):
+        dirty, self._dirty = self._dirty, {}
+
+        upserts = []
+        deletes = []
+        for storage_key, entry in dirty.items():
+            if entry.state is None and not entry.data:
+                deletes.append(storage_key)
+            else:
+                data = json.dumps(entry.data, ensure_ascii=False)
+                upserts.append((storage_key, entry.state, data, entry.touched))
+
+        try:
+            await self._db.save_fsm_states(upserts, deletes)
+        except Exception:
+            # Не теряем изменения: вернём их, если ключи не были переписаны заново
+            for storage_key, entry in dirty.items():
+                self._dirty.setdefault(storage_key, entry)
+            raise
+
+    async def evict_expired(self) -> int:
+        """Удаление состояний, простаивающих дольше TTL; возвращает число удалённых строк"""
+        if self.ttl <= 0:
+            return 0
+        now = time.time()
+        for storage_key in [k for k, e in self._cache.items() if self._expired(e, now)]:
+            del self._cache[storage_key]
+        return await self._db.delete_fsm_states_before(now - self.ttl)
@@ -0,0 +1,263 @@
+import logging
+import sqlite3
+from typing import List, Tuple
+
+# Упорядоченный список миграций: (версия, описание, SQL-выражения).
+# Новые миграции добавляются только в конец списка с возрастающей версией.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Базовая схема", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            telegram_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS funeral_forms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER,
+            body_location TEXT,
+            funeral_type TEXT,
+            services TEXT,
+            budget TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL,
+            category TEXT,
+            photo_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS memory_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER,
+            name TEXT NOT NULL,
+            birth_date TEXT,
+            death_date TEXT,
+            memory_text TEXT,
+            photo_path TEXT,
+            html_path TEXT,
+            candles_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS memory_candles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            memory_record_id INTEGER,
+            telegram_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (memory_record_id) REFERENCES memory_records (id),
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS request_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER,
+            request_type TEXT,
+            request_data TEXT,
+            response_data TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER,
+            message_type TEXT,
+            message_text TEXT,
+            handler_name TEXT,
+            is_user_message BOOLEAN,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER UNIQUE,
+            full_name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT,
+            birth_date TEXT,
+            passport_series TEXT,
+            passport_number TEXT,
+            passport_issued_by TEXT,
+            passport_issue_date TEXT,
+            address TEXT,
+            emergency_contact TEXT,
+            relationship TEXT,
+            is_verified BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
+        )
+        ''',
+    ]),
+    (2, "Индексы для горячих запросов", [
+        # Повторные свечи от одного пользователя удаляем до создания уникального индекса
+        '''
+        DELETE FROM memory_candles WHERE id NOT IN (
+            SELECT MIN(id) FROM memory_candles GROUP BY memory_record_id, telegram_id
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_candles_record_user
+        ON memory_candles (memory_record_id, telegram_id)
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_memory_records_user ON memory_records (telegram_id)",
+        "CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_logs_user_created ON chat_logs (telegram_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_logs_created ON chat_logs (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_request_logs_user_created ON request_logs (telegram_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_clients_created ON clients (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)",
+    ]),
+    (3, "Денормализованный счётчик свечей через триггеры", [
+        # Счётчик мог разойтись с таблицей свечей — пересчитываем один раз
+        '''
+        UPDATE memory_records SET candles_count = (
+            SELECT COUNT(*) FROM memory_candles mc WHERE mc.memory_record_id = memory_records.id
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_memory_candles_insert
+        AFTER INSERT ON memory_candles
+        BEGIN
+            UPDATE memory_records SET candles_count = candles_count + 1
+            WHERE id = NEW.memory_record_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_memory_candles_delete
+        AFTER DELETE ON memory_candles
+        BEGIN
+            UPDATE memory_records SET candles_count = candles_count - 1
+            WHERE id = OLD.memory_record_id;
+        END
+        ''',
+    ]),
+    (4, "Хранилище состояний FSM", [
+        '''
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)",
+    ]),
+    (5, "Кэш ответов AI-помощника", [
+        '''
+        CREATE TABLE IF NOT EXISTS ai_answer_cache (
+            key TEXT PRIMARY KEY,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_hit REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_ai_answer_cache_last_hit ON ai_answer_cache (last_hit)",
+    ]),
+    (6, "Расход OpenAI по пользователям", [
+        '''
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            telegram_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            feature TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (telegram_id, day, feature)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_ai_usage_day ON ai_usage (day)",
+    ]),
+    (7, "Кэш расшифровок голосовых сообщений", [
+        '''
+        CREATE TABLE IF NOT EXISTS voice_transcripts (
+            file_unique_id TEXT PRIMARY KEY,
+            transcript TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        ''',
+    ]),
+    (8, "Фоновая подготовка страниц памяти", [
+        '''
+        CREATE TABLE IF NOT EXISTS memory_page_jobs (
+            record_id INTEGER PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (record_id) REFERENCES memory_records (id)
+        )
+        ''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 — база ещё не создана)"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Применение недостающих миграций; возвращает итоговую версию схемы.
+
+    Если версия уже актуальна, никакие DDL-выражения не выполняются.
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        return current
+
+    # Все шаги выполняются в одной транзакции: либо схема обновлена целиком, либо никак
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"[DB] Применяется миграция {version}: {description}")
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(
+            "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+            (version, description)
+        )
+        current = version
+
+    return current
@@ -0,0 +1,101 @@
+from itertools import zip_longest
+from typing import Any, Dict, Tuple
+
+
+class Row:
+    """Компактная строка результата запроса.
+
+    Поля хранятся в ``__slots__`` (без словаря на каждый объект), а порядок
+    слотов совпадает с порядком колонок в SELECT — список колонок строится
+    из ``fields()``, поэтому добавление колонки в таблицу ничего не ломает.
+    Для совместимости с кодом, работающим со словарями, поддерживаются
+    ``row['name']``, ``row.get('name')`` и ``dict(row)``.
+    """
+
+    __slots__ = ()
+    # Поля, которые не хранятся в самой таблице (приходят из JOIN)
+    joined_fields: Tuple[str, ...] = ()
+    # Поля SQLite BOOLEAN, которые нужно привести к bool
+    bool_fields: Tuple[str, ...] = ()
+
+    def __init__(self, *values):
+        for name, value in zip_longest(self.__slots__, values):
+            setattr(self, name, value)
+        for name in self.bool_fields:
+            setattr(self, name, bool(getattr(self, name)))
+
+    @classmethod
+    def fields(cls) -> Tuple[str, ...]:
+        return cls.__slots__
+
+    @classmethod
+    def columns(cls, alias: str = None) -> str:
+        """Список колонок таблицы для SELECT (без полей из JOIN)"""
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(f"{prefix}{name}" for name in cls.__slots__ if name not in cls.joined_fields)
+
+    @classmethod
+    def factory(cls, cursor, row: Tuple) -> "Row":
+        """row_factory для sqlite3.Cursor"""
+        return cls(*row)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь (например, для шаблонов)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Row):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class Product(Row):
+    __slots__ = ('id', 'name', 'description', 'price', 'category', 'photo_path')
+
+
+class MemoryRecord(Row):
+    __slots__ = (
+        'id', 'telegram_id', 'name', 'birth_date', 'death_date', 'memory_text',
+        'photo_path', 'html_path', 'candles_count', 'created_at',
+    )
+
+
+class ChatLog(Row):
+    __slots__ = (
+        'id', 'telegram_id', 'message_type', 'message_text', 'handler_name',
+        'is_user_message', 'created_at', 'username', 'first_name',
+    )
+    joined_fields = ('username', 'first_name')
+    bool_fields = ('is_user_message',)
+
+
+class Client(Row):
+    __slots__ = (
+        'id', 'telegram_id', 'full_name', 'phone', 'email', 'birth_date',
+        'passport_series', 'passport_number', 'passport_issued_by', 'passport_issue_date',
+        'address', 'emergency_contact', 'relationship', 'is_verified',
+        'created_at', 'updated_at', 'username', 'first_name', 'last_name',
+    )
+    joined_fields = ('username', 'first_name', 'last_name')
+    bool_fields = ('is_verified',)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+
+class WriteBehind:
+    """Фоновый сброс накопленных в памяти изменений в базу.
+
+    Владелец копит изменения сам и после каждого вызывает ``schedule()``.
+    Раз в ``interval`` секунд, пока ``has_pending()`` истинно, вызывается
+    ``write()`` — она забирает накопленное и записывает его одной
+    транзакцией (при ошибке возвращает несохранённое обратно). Если
+    передан ``periodic``, он выполняется после каждого сброса, и задача
+    работает постоянно. ``close()`` останавливает задачу и сбрасывает остаток.
+    """
+
+    def __init__(self, write: Callable[[], Awaitable[None]], has_pending: Callable[[], bool],
+                 interval: float, name: str, periodic: Optional[Callable[[], Awaitable[None]]] = None):
+        self._write = write
+        self._has_pending = has_pending
+        self.interval = interval
+        self.name = name
+        self._periodic = periodic
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def schedule(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"write-behind {self.name}")
+
+    async def _run(self):
+        while self._periodic is not None or self._has_pending():
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+                if self._periodic is not None:
+                    await self._periodic()
+            except Exception as e:
+                logging.error(f"[{self.name}] Ошибка фоновой записи в базу: {e}", exc_info=True)
+
+    async def flush(self):
+        async with self._lock:
+            if self._has_pending():
+                await self._write()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -1,6 +1,6 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -14,6 +14,9 @@ from keyboards.main_keyboard import (
 )
 from states.states import AddProduct, RemoveProduct
 from database.db import Database
+from services.faq_index import FAQIndex
+from services.openai_service import OpenAIService
+from services.transcription_queue import TranscriptionQueue
 
 router = Router()
 
@@ -270,6 +273,99 @@ async def process_remove_product(message: Message, state: FSMContext, db: Databa
         )
 
 
+@router.message(Command("ai_cache"))
+async def ai_cache_stats(message: Message, openai_service: OpenAIService):
+    if not is_admin(message.from_user.id):
+        return
+    cache = openai_service.answer_cache
+    if cache is None:
+        await message.answer("Кэш ответов AI-помощника отключён.")
+        return
+    stats = cache.stats()
+    inflight = openai_service.inflight.stats()
+    await message.answer(
+        "🤖 <b>Кэш ответов AI-помощника</b>\n\n"
+        f"Записей: {stats['entries']}\n"
+        f"Точных попаданий: {stats['hits']}\n"
+        f"Похожих вопросов: {stats['near_hits']}\n"
+        f"Промахов: {stats['misses']}\n"
+        f"Доля попаданий: {stats['hit_ratio']:.1%}\n"
+        f"Объединено одновременных одинаковых вопросов: {inflight['shared']}\n\n"
+        "Очистить: /ai_cache_clear [вопрос]"
+    )
+
+
+@router.message(Command("ai_stats"))
+async def ai_stats(message: Message, openai_service: OpenAIService, faq: FAQIndex = None,
+                   transcriptions: TranscriptionQueue = None):
+    if not is_admin(message.from_user.id):
+        return
+    queue = openai_service.queue.stats()
+    calls = openai_service.resilience.stats()
+
+    def ms(value):
+        return "—" if value is None else f"{value} мс"
+
+    await message.answer(
+        "📊 <b>Запросы к OpenAI</b>\n\n"
+        f"Выполняется: {queue['active']}, ждут в очереди: {queue['waiting']}\n"
+        f"Вызовов: {calls['calls']}, повторов: {calls['retries']}, ошибок: {calls['failures']}\n"
+        f"Превышений срока: {calls['timeouts']}\n"
+        f"Дублирующих запросов: {calls['hedges']} (быстрее первого: {calls['hedge_wins']})\n"
+        f"Предохранитель: {calls['breaker']}, отказов без запроса: {calls['short_circuits']}\n"
+        f"Время ответа p50/p95/p99: {ms(calls['p50_ms'])} / {ms(calls['p95_ms'])} / {ms(calls['p99_ms'])}"
+        + (f"\nОтвечено из базы FAQ: {faq.answered} из {faq.lookups}" if faq is not None else "")
+        + (_transcription_stats(transcriptions.stats()) if transcriptions is not None else "")
+    )
+
+
+def _transcription_stats(stats) -> str:
+    return (
+        f"\n\n🎙 <b>Голосовые</b>\n"
+        f"Расшифровывается: {stats['active']}, ждут: {stats['pending']}\n"
+        f"Готово: {stats['completed']}, ошибок: {stats['failed']}\n"
+        f"Из кэша: {stats['cache_hits']}, объединено повторов: {stats['coalesced']}"
+    )
+
+
+@router.message(Command("ai_usage"))
+async def ai_usage_report(message: Message, command: CommandObject, openai_service: OpenAIService):
+    if not is_admin(message.from_user.id):
+        return
+    if openai_service.usage is None:
+        await message.answer("Учёт расхода OpenAI отключён.")
+        return
+    # Без аргумента — отчёт за сегодня, иначе за день в формате ГГГГ-ММ-ДД
+    report = await openai_service.usage.report(command.args.strip() if command.args else None)
+    lines = [f"💰 <b>Расход OpenAI за {report['day']}</b>", ""]
+    if not report['features']:
+        lines.append("Запросов не было.")
+    for feature, requests, prompt_tokens, completion_tokens, cost in report['features']:
+        lines.append(
+            f"{feature}: запросов {requests}, токенов {prompt_tokens} + {completion_tokens}, ${cost:.2f}"
+        )
+    if report['users']:
+        lines += ["", "<b>Пользователи:</b>"]
+        for telegram_id, username, requests, tokens, cost in report['users']:
+            name = f"@{username}" if username else str(telegram_id)
+            lines.append(f"{name}: запросов {requests}, токенов {tokens}, ${cost:.2f}")
+    lines += ["", f"Отказано по лимиту: {openai_service.usage.rejected}"]
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("ai_cache_clear"))
+async def ai_cache_clear(message: Message, command: CommandObject, openai_service: OpenAIService):
+    if not is_admin(message.from_user.id):
+        return
+    cache = openai_service.answer_cache
+    if cache is None:
+        await message.answer("Кэш ответов AI-помощника отключён.")
+        return
+    # Без аргумента очищается весь кэш, с вопросом — только ответы на него
+    removed = await cache.invalidate(command.args)
+    await message.answer(f"✅ Удалено ответов из кэша: {removed}")
+
+
 @router.message(F.text == "⬅️ Назад")
 async def back_to_main_from_admin(message: Message):
     if not is_admin(message.from_user.id):
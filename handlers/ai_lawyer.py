@@ -2,6 +2,7 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+import html
 import logging
 
 from keyboards.main_keyboard import (
@@ -9,10 +10,13 @@ from keyboards.main_keyboard import (
     get_cancel_keyboard,
     get_ai_lawyer_actions_keyboard  # Новый импорт!
 )
-from config import ADMIN_IDS
+from config import ADMIN_IDS, AI_STREAM_EDIT_INTERVAL
+from services.faq_index import FAQIndex
 from services.openai_service import OpenAIService
+from services.progressive_message import ProgressiveMessage
 from database.db import Database
 from states.states import AIHelper
+from handlers.text_input import text_input
 
 router = Router()
 
@@ -39,7 +43,9 @@ async def start_ai_lawyer(message: Message, state: FSMContext):
     await message.answer(help_text, reply_markup=get_cancel_keyboard())
 
 @router.message(AIHelper.waiting_for_question, F.text)
-async def process_ai_question(message: Message, state: FSMContext, db: Database):
+@text_input(AIHelper.waiting_for_question)
+async def process_ai_question(message: Message, state: FSMContext, db: Database, openai_service: OpenAIService,
+                              faq: FAQIndex = None):
     """Обработка вопроса для AI-помощника"""
     if message.text.lower() == "❌ отмена":
         await state.clear()
@@ -74,13 +80,46 @@ async def process_ai_question(message: Message, state: FSMContext, db: Database)
         request_data=question
     )
 
+    # Типовые вопросы отвечаются сразу из локальной базы, без GPT-4
+    match = faq.match(question) if faq is not None else None
+    if match is not None:
+        logging.info(f"AI-помощник: ответ из базы FAQ ({match.question}, уверенность {match.confidence:.2f})")
+        await db.log_request(
+            telegram_id=message.from_user.id,
+            request_type="ai_lawyer_response",
+            request_data=question,
+            response_data=match.answer
+        )
+        await message.answer(
+            f"🤖 **Ответ на ваш вопрос:**\n\n{html.escape(match.answer, quote=False)}\n\n"
+            "Выберите действие ниже:",
+            reply_markup=get_ai_lawyer_actions_keyboard()
+        )
+        return
+
     # Отправляем сообщение о обработке
     processing_msg = await message.answer("🤖 Обрабатываю ваш вопрос...")
 
     try:
-        # Получаем ответ от AI
-        openai_service = OpenAIService()
-        response = await openai_service.get_legal_advice(question)
+        # Получаем ответ от AI потоком и показываем его по мере генерации
+        answer_msg = ProgressiveMessage(
+            processing_msg,
+            header="🤖 **Ответ на ваш вопрос:**\n\n",
+            min_interval=AI_STREAM_EDIT_INTERVAL,
+        )
+
+        async def show_position(position: int):
+            await processing_msg.edit_text(
+                "🤖 Обрабатываю ваш вопрос...\n"
+                f"⏳ Сейчас много обращений, ваше место в очереди: {position}"
+            )
+
+        parts = []
+        async for chunk in openai_service.stream_legal_advice(
+                question, on_position=show_position, user_id=message.from_user.id):
+            parts.append(chunk)
+            await answer_msg.feed(html.escape(chunk, quote=False))
+        response = "".join(parts).strip()
 
         # Логируем ответ
         await db.log_request(
@@ -90,10 +129,9 @@ async def process_ai_question(message: Message, state: FSMContext, db: Database)
             response_data=response
         )
 
-        # Отправляем ответ с инлайн-клавиатурой
-        await processing_msg.edit_text(
-            f"🤖 **Ответ на ваш вопрос:**\n\n{response}\n\n"
-            "Выберите действие ниже:",
+        # Итоговый ответ с инлайн-клавиатурой
+        await answer_msg.finish(
+            footer="\n\nВыберите действие ниже:",
             reply_markup=get_ai_lawyer_actions_keyboard()
         )
 
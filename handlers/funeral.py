@@ -2,6 +2,7 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from handlers.text_input import text_input
 from keyboards.main_keyboard import (
     get_funeral_services_keyboard,
     get_funeral_budget_keyboard,
@@ -71,6 +72,7 @@ async def funeral_service_callback(call: CallbackQuery, state: FSMContext):
 
 # Получение адреса для перевозки
 @router.message(FuneralForm.waiting_for_address)
+@text_input(FuneralForm.waiting_for_address)
 async def handle_address(message: Message, state: FSMContext):
     await state.update_data(address=message.text)
     data = await state.get_data()
@@ -85,6 +87,7 @@ async def handle_address(message: Message, state: FSMContext):
 
 # Получение количества венков
 @router.message(FuneralForm.waiting_for_wreaths)
+@text_input(FuneralForm.waiting_for_wreaths)
 async def handle_wreaths(message: Message, state: FSMContext):
     await state.update_data(wreaths=message.text)
     data = await state.get_data()
@@ -5,12 +5,13 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 from states.states import MemoryRecord
+from handlers.text_input import text_input
 from keyboards.main_keyboard import (
     get_memory_keyboard, get_memory_record_keyboard, get_cancel_keyboard, get_main_keyboard
 )
 from config import ADMIN_IDS
 from database.db import Database
-from services.memory_service import MemoryService
+from services.memory_pages import MemoryPageQueue
 
 router = Router()
 
@@ -47,6 +48,7 @@ async def start_create_memory(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(MemoryRecord.waiting_for_photo)
+@text_input(MemoryRecord.waiting_for_photo)
 async def process_memory_photo(message: Message, state: FSMContext):
     """Обработка фото для записи памяти"""
     if message.text and message.text.lower() == "❌ отмена":
@@ -88,6 +90,7 @@ async def process_memory_photo(message: Message, state: FSMContext):
     )
 
 @router.message(MemoryRecord.waiting_for_name)
+@text_input(MemoryRecord.waiting_for_name)
 async def process_memory_name(message: Message, state: FSMContext):
     """Обработка имени для записи памяти"""
     if message.text.lower() == "❌ отмена":
@@ -112,6 +115,7 @@ async def process_memory_name(message: Message, state: FSMContext):
     )
 
 @router.message(MemoryRecord.waiting_for_birth_date)
+@text_input(MemoryRecord.waiting_for_birth_date)
 async def process_birth_date(message: Message, state: FSMContext):
     """Обработка даты рождения"""
     if message.text.lower() == "❌ отмена":
@@ -137,6 +141,7 @@ async def process_birth_date(message: Message, state: FSMContext):
     )
 
 @router.message(MemoryRecord.waiting_for_death_date)
+@text_input(MemoryRecord.waiting_for_death_date)
 async def process_death_date(message: Message, state: FSMContext):
     """Обработка даты смерти"""
     if message.text.lower() == "❌ отмена":
@@ -162,7 +167,8 @@ async def process_death_date(message: Message, state: FSMContext):
     )
 
 @router.message(MemoryRecord.waiting_for_memory_text)
-async def process_memory_text(message: Message, state: FSMContext, db: Database):
+@text_input(MemoryRecord.waiting_for_memory_text)
+async def process_memory_text(message: Message, state: FSMContext, db: Database, memory_pages: MemoryPageQueue):
     """Обработка текста памяти и создание записи"""
     if message.text.lower() == "❌ отмена":
         await state.clear()
@@ -179,31 +185,19 @@ async def process_memory_text(message: Message, state: FSMContext, db: Database)
     # Получаем все данные
     data = await state.get_data()
     
-    # Создаем запись в базе
-    record_id = await db.create_memory_record(
+    # Создаем запись в базе вместе с задачей подготовки страницы
+    record_id = await db.create_memory_record_with_page_job(
         telegram_id=message.from_user.id,
+        chat_id=message.chat.id,
         name=data["name"],
         birth_date=data["birth_date"],
         death_date=data["death_date"],
         memory_text=message.text.strip(),
         photo_path=data.get("photo_path"),
-        html_path=""  # Будет заполнено позже
     )
     
-    # Создаем HTML-страницу
-    memory_service = MemoryService()
-    html_path = await memory_service.create_memory_page(
-        record_id=record_id,
-        name=data["name"],
-        birth_date=data["birth_date"],
-        death_date=data["death_date"],
-        memory_text=message.text.strip(),
-        photo_path=data.get("photo_path"),
-        candles_count=0
-    )
-    
-    # Обновляем путь к HTML в базе
-    # (в реальном проекте здесь будет UPDATE запрос)
+    # Текст и HTML-страницу готовим в фоне, пользователь не ждёт ответа GPT-4
+    memory_pages.run_saved(record_id, message.chat.id)
     
     await state.clear()
     
@@ -213,7 +207,7 @@ async def process_memory_text(message: Message, state: FSMContext, db: Database)
 📝 **{data['name']}**
 📅 {data['birth_date']} — {data['death_date']}
 
-🕯️ Страница памяти готова.
+🕯️ Страница памяти готовится — пришлём её, как только будет готова.
 Другие пользователи смогут зажечь свечу в память.
 
 💡 Используйте кнопки ниже для управления:
@@ -227,9 +221,9 @@ async def process_memory_text(message: Message, state: FSMContext, db: Database)
 @router.callback_query(F.data == "memory:my_records")
 async def show_my_records(callback: CallbackQuery, db: Database):
     """Показать записи пользователя"""
-    records = await db.get_memory_records(callback.from_user.id)
+    total = await db.count_memory_records(callback.from_user.id)
     
-    if not records:
+    if not total:
         await callback.message.edit_text(
             "📖 У вас пока нет записей памяти.\n"
             "Создайте первую запись!",
@@ -238,14 +232,15 @@ async def show_my_records(callback: CallbackQuery, db: Database):
         return
     
     # Показываем первую запись
-    await show_memory_record(callback, records, 0)
+    records = await db.get_memory_records_page(callback.from_user.id, limit=1)
+    await show_memory_record(callback, records[0], scope="my", position=1, total=total)
 
 @router.callback_query(F.data == "memory:all_records")
 async def show_all_records(callback: CallbackQuery, db: Database):
     """Показать все записи памяти"""
-    records = await db.get_memory_records()
+    total = await db.count_memory_records()
     
-    if not records:
+    if not total:
         await callback.message.edit_text(
             "🕯️ Пока нет записей памяти.\n"
             "Будьте первым, кто создаст запись!",
@@ -254,12 +249,18 @@ async def show_all_records(callback: CallbackQuery, db: Database):
         return
     
     # Показываем первую запись
-    await show_memory_record(callback, records, 0)
+    records = await db.get_memory_records_page(limit=1)
+    await show_memory_record(callback, records[0], scope="all", position=1, total=total)
 
 @router.callback_query(F.data.startswith("memory:candle:"))
 async def add_candle(callback: CallbackQuery, db: Database):
-    """Добавить свечу к записи памяти"""
-    record_id = int(callback.data.split(":")[2])
+    """Добавить свечу к записи памяти (memory:candle:<id>[:<scope>:<позиция>:<всего>])"""
+    parts = callback.data.split(":")
+    record_id = int(parts[2])
+    # Место записи в списке, чтобы после свечи остались кнопки навигации
+    scope, position, total = None, 1, 1
+    if len(parts) == 6:
+        scope, position, total = parts[3], int(parts[4]), int(parts[5])
     
     success = await db.add_candle(record_id, callback.from_user.id)
     
@@ -267,11 +268,11 @@ async def add_candle(callback: CallbackQuery, db: Database):
         await callback.answer("🕯️ Свеча зажжена в память", show_alert=True)
         
         # Обновляем отображение записи
-        records = await db.get_memory_records()
-        record = next((r for r in records if r['id'] == record_id), None)
+        record = await db.get_memory_record(record_id)
         
         if record:
-            await show_memory_record(callback, [record], 0, can_add_candle=False)
+            await show_memory_record(callback, record, scope=scope, position=position, total=total,
+                                     can_add_candle=False)
     else:
         await callback.answer("🕯️ Вы уже зажигали свечу для этой записи", show_alert=True)
 
@@ -280,15 +281,13 @@ async def back_to_memory_menu(callback: CallbackQuery):
     """Возврат в меню памяти"""
     await start_memory(callback.message)
 
-async def show_memory_record(callback: CallbackQuery, records: list, index: int, can_add_candle: bool = True):
-    """Показать запись памяти"""
-    if index >= len(records):
-        index = 0
-    elif index < 0:
-        index = len(records) - 1
-    
-    record = records[index]
-    
+async def show_memory_record(callback: CallbackQuery, record: dict, scope: str = None,
+                             position: int = 1, total: int = 1, can_add_candle: bool = True):
+    """Показать запись памяти.
+
+    ``scope`` («my» или «all») и позиция записи передаются в callback-данных
+    кнопок навигации, поэтому следующий шаг загружает ровно одну запись.
+    """
     # Формируем текст записи
     record_text = f"""
 🕯️ **Памяти {record['name']}**
@@ -308,17 +307,19 @@ async def show_memory_record(callback: CallbackQuery, records: list, index: int,
     builder = InlineKeyboardBuilder()
     
     # Кнопки навигации
-    if len(records) > 1:
-        builder.add(InlineKeyboardButton(text="⬅️", callback_data=f"memory:nav:{index-1}"))
-        builder.add(InlineKeyboardButton(text=f"{index+1}/{len(records)}", callback_data="memory:info"))
-        builder.add(InlineKeyboardButton(text="➡️", callback_data=f"memory:nav:{index+1}"))
+    if scope and total > 1:
+        nav = f"memory:nav:{scope}:{{}}:{record['id']}:{position}:{total}"
+        builder.add(InlineKeyboardButton(text="⬅️", callback_data=nav.format("prev")))
+        builder.add(InlineKeyboardButton(text=f"{position}/{total}", callback_data="memory:info"))
+        builder.add(InlineKeyboardButton(text="➡️", callback_data=nav.format("next")))
         builder.adjust(3)
     
     # Кнопка свечи
     if can_add_candle:
         builder.add(InlineKeyboardButton(
             text="🕯️ Зажечь свечу", 
-            callback_data=f"memory:candle:{record['id']}"
+            callback_data=f"memory:candle:{record['id']}:{scope}:{position}:{total}" if scope
+            else f"memory:candle:{record['id']}"
         ))
     
     # Кнопка возврата
@@ -331,17 +332,38 @@ async def show_memory_record(callback: CallbackQuery, records: list, index: int,
 
 @router.callback_query(F.data.startswith("memory:nav:"))
 async def navigate_memory_records(callback: CallbackQuery, db: Database):
-    """Навигация по записям памяти"""
-    index = int(callback.data.split(":")[2])
-    
-    # Получаем все записи
-    records = await db.get_memory_records()
+    """Навигация по записям памяти (memory:nav:<scope>:<next|prev>:<id>:<позиция>:<всего>)"""
+    parts = callback.data.split(":")
+    if len(parts) != 7:
+        # Кнопки прежнего формата (memory:nav:<индекс>) ещё остались в чатах —
+        # они листали все записи, открываем список заново
+        await show_all_records(callback, db)
+        return
+    _, _, scope, direction, record_id, position, total = parts
+    record_id, position, total = int(record_id), int(position), int(total)
+    owner_id = callback.from_user.id if scope == "my" else None
+    
+    # Загружаем только соседнюю запись; на краях списка переходим на другой конец
+    if direction == "next":
+        records = await db.get_memory_records_page(owner_id, after_id=record_id, limit=1)
+        position += 1
+        if not records:
+            records = await db.get_memory_records_page(owner_id, limit=1)
+            position = 1
+    else:
+        records = await db.get_memory_records_page(owner_id, before_id=record_id, limit=1)
+        position -= 1
+        if not records:
+            last = await db.get_last_memory_record(owner_id)
+            records = [last] if last else []
+            position = total
     
     if not records:
         await callback.answer("❌ Записи не найдены", show_alert=True)
         return
     
-    await show_memory_record(callback, records, index)
+    position = min(max(position, 1), total)
+    await show_memory_record(callback, records[0], scope=scope, position=position, total=total)
 
 @router.callback_query(F.data == "memory:info")
 async def memory_info(callback: CallbackQuery):
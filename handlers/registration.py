@@ -7,6 +7,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 
 from states.states import ClientRegistration
+from handlers.text_input import text_input
 from keyboards.main_keyboard import (
     get_registration_keyboard, 
     get_registration_confirm_keyboard,
@@ -268,6 +269,7 @@ async def verify_client(callback: CallbackQuery, db: Database):
 
 # Обработчики ввода данных
 @router.message(ClientRegistration.waiting_for_full_name)
+@text_input(ClientRegistration.waiting_for_full_name)
 async def process_full_name(message: Message, state: FSMContext):
     """Обработка ввода ФИО"""
     full_name = message.text.strip()
@@ -285,6 +287,7 @@ async def process_full_name(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_phone)
 
 @router.message(ClientRegistration.waiting_for_phone)
+@text_input(ClientRegistration.waiting_for_phone)
 async def process_phone(message: Message, state: FSMContext):
     """Обработка ввода телефона"""
     phone = message.text.strip()
@@ -306,6 +309,7 @@ async def process_phone(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_email)
 
 @router.message(ClientRegistration.waiting_for_email)
+@text_input(ClientRegistration.waiting_for_email)
 async def process_email(message: Message, state: FSMContext):
     """Обработка ввода email"""
     if message.text == "⏭️ Пропустить":
@@ -326,6 +330,7 @@ async def process_email(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_birth_date)
 
 @router.message(ClientRegistration.waiting_for_birth_date)
+@text_input(ClientRegistration.waiting_for_birth_date)
 async def process_birth_date(message: Message, state: FSMContext):
     """Обработка ввода даты рождения"""
     birth_date = message.text.strip()
@@ -343,6 +348,7 @@ async def process_birth_date(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_passport_series)
 
 @router.message(ClientRegistration.waiting_for_passport_series)
+@text_input(ClientRegistration.waiting_for_passport_series)
 async def process_passport_series(message: Message, state: FSMContext):
     """Обработка ввода серии паспорта"""
     series = message.text.strip()
@@ -360,6 +366,7 @@ async def process_passport_series(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_passport_number)
 
 @router.message(ClientRegistration.waiting_for_passport_number)
+@text_input(ClientRegistration.waiting_for_passport_number)
 async def process_passport_number(message: Message, state: FSMContext):
     """Обработка ввода номера паспорта"""
     number = message.text.strip()
@@ -377,6 +384,7 @@ async def process_passport_number(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_passport_issued_by)
 
 @router.message(ClientRegistration.waiting_for_passport_issued_by)
+@text_input(ClientRegistration.waiting_for_passport_issued_by)
 async def process_passport_issued_by(message: Message, state: FSMContext):
     """Обработка ввода кем выдан паспорт"""
     issued_by = message.text.strip()
@@ -395,6 +403,7 @@ async def process_passport_issued_by(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_passport_issue_date)
 
 @router.message(ClientRegistration.waiting_for_passport_issue_date)
+@text_input(ClientRegistration.waiting_for_passport_issue_date)
 async def process_passport_issue_date(message: Message, state: FSMContext):
     """Обработка ввода даты выдачи паспорта"""
     issue_date = message.text.strip()
@@ -412,6 +421,7 @@ async def process_passport_issue_date(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_address)
 
 @router.message(ClientRegistration.waiting_for_address)
+@text_input(ClientRegistration.waiting_for_address)
 async def process_address(message: Message, state: FSMContext):
     """Обработка ввода адреса"""
     address = message.text.strip()
@@ -430,6 +440,7 @@ async def process_address(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_emergency_contact)
 
 @router.message(ClientRegistration.waiting_for_emergency_contact)
+@text_input(ClientRegistration.waiting_for_emergency_contact)
 async def process_emergency_contact(message: Message, state: FSMContext):
     """Обработка ввода контакта для экстренной связи"""
     emergency_contact = message.text.strip()
@@ -447,6 +458,7 @@ async def process_emergency_contact(message: Message, state: FSMContext):
     await state.set_state(ClientRegistration.waiting_for_relationship)
 
 @router.message(ClientRegistration.waiting_for_relationship)
+@text_input(ClientRegistration.waiting_for_relationship)
 async def process_relationship(message: Message, state: FSMContext):
     """Обработка ввода отношения к усопшему"""
     relationship = message.text.strip()
@@ -483,7 +495,7 @@ async def cancel_input(message: Message, state: FSMContext):
     """Отмена ввода данных"""
     current_state = await state.get_state()
     if current_state and not current_state.startswith(
-        ("ClientRegistration", "FuneralForm", "MemoryRecord", "AIHelper")
+        ("ClientRegistration", "FuneralForm", "MemoryRecord", "AIHelper", "VoiceInput")
     ):
         return
     await state.clear()
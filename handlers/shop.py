@@ -51,8 +51,7 @@ async def select_product(callback: CallbackQuery, db: Database):
     product_id = int(callback.data.split(":")[2])
     
     # Получаем информацию о товаре
-    products = await db.get_products_by_category()
-    product = next((p for p in products if p['id'] == product_id), None)
+    product = await db.get_product(product_id)
     
     if not product:
         await callback.answer("❌ Товар не найден", show_alert=True)
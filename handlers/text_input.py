@@ -0,0 +1,58 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.fsm.state import State
+from aiogram.types import Message, User
+
+# Текстовые хендлеры состояний FSM, которые принимают и расшифрованное голосовое:
+# имя состояния -> хендлер. Заполняется декоратором ``text_input`` при импорте
+# модулей с хендлерами, то есть один раз при регистрации роутеров.
+_handlers: Dict[str, CallableObject] = {}
+
+
+def text_input(*states: State) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Объявление хендлера обработчиком текста для состояний ``states``.
+
+    Ставится рядом с ``@router.message(...)``::
+
+        @router.message(ClientRegistration.waiting_for_phone)
+        @text_input(ClientRegistration.waiting_for_phone)
+        async def process_phone(message, state): ...
+    """
+    def decorator(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        # CallableObject один раз разбирает сигнатуру и при вызове передаёт
+        # хендлеру только нужные ему зависимости (state, db, openai_service...)
+        callable_object = CallableObject(handler)
+        for state in states:
+            _handlers[state.state] = callable_object
+        return handler
+    return decorator
+
+
+async def dispatch_text(state_name: Optional[str], message: Any, **data: Any) -> bool:
+    """Передача текста хендлеру состояния; False — для состояния хендлера нет"""
+    handler = _handlers.get(state_name)
+    if handler is None:
+        return False
+    await handler.call(message, **data)
+    return True
+
+
+class MessageProxy:
+    """Сообщение с подменённым текстом (и автором) без копирования оригинала.
+
+    Объекты aiogram неизменяемы, поэтому для передачи расшифровки в
+    хендлер вместо копии сообщения используется обёртка: ``text`` и
+    ``from_user`` свои, остальное (``answer``, ``chat``, ``bot``...) —
+    от исходного сообщения.
+    """
+
+    __slots__ = ('_message', 'text', 'from_user')
+
+    def __init__(self, message: Message, text: str, from_user: Optional[User] = None):
+        self._message = message
+        self.text = text
+        self.from_user = from_user or message.from_user
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._message, name)
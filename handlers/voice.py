@@ -1,13 +1,16 @@
-import os
+import html
 import logging
-import asyncio
+from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, Voice, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from services.openai_service import OpenAIService
+from services.openai_service import TRANSCRIPTION_QUOTA, OpenAIService
+from services.transcription_queue import QueueFullError, TranscriptionQueue
+from services.usage_ledger import QuotaExceededError
 from keyboards.main_keyboard import get_main_keyboard
-from config import ADMIN_IDS
-from states.states import AIHelper, ClientRegistration, FuneralForm, MemoryRecord
+from config import ADMIN_IDS, VOICE_MAX_DURATION, VOICE_MAX_FILE_SIZE
+from handlers.text_input import MessageProxy, dispatch_text
+from states.states import VoiceInput
 
 router = Router()
 
@@ -19,117 +22,103 @@ def get_voice_confirm_keyboard() -> InlineKeyboardMarkup:
     ])
     return builder
 
+async def show_transcript(send, db, state: FSMContext, user_id: int, transcript: Optional[str], voice_state: Optional[str]):
+    """Показ расшифровки с кнопками подтверждения; ``send`` — answer или edit_text"""
+    if not transcript or len(transcript.strip()) < 2:
+        await send("❌ Не удалось распознать голосовое сообщение. Попробуйте еще раз или говорите чётче.")
+        logging.warning(f"[VOICE] Не удалось распознать голосовое сообщение от {user_id}")
+        return
+    # Логируем голосовое сообщение
+    await db.log_chat_message(user_id, "voice", transcript, "voice_transcription", True)
+    # Сохраняем транскрипцию и состояние, в котором было голосовое
+    await state.update_data(voice_transcript=transcript, voice_state=voice_state)
+    await send(
+        f"📝 Распознанный текст:\n<code>{html.escape(transcript)}</code>\n\nПодтвердите или отредактируйте текст.",
+        reply_markup=get_voice_confirm_keyboard(),
+        parse_mode="HTML"
+    )
+    logging.info(f"[VOICE] Транскрибация завершена для {user_id}")
+
+
 @router.message(F.voice)
-async def process_voice_message(message: Message, db, state: FSMContext):
-    logging.info(f"[VOICE] Получено голосовое сообщение от {message.from_user.id}")
+async def process_voice_message(message: Message, db, state: FSMContext, openai_service: OpenAIService,
+                                transcriptions: TranscriptionQueue):
+    user_id = message.from_user.id
+    logging.info(f"[VOICE] Получено голосовое сообщение от {user_id}")
     voice: Voice = message.voice
-    file = await message.bot.get_file(voice.file_id)
-    file_path = file.file_path
-    local_path = f"voice_{message.from_user.id}_{voice.file_id}.ogg"
-    await message.bot.download_file(file_path, local_path)
-
-    try:
-        openai_service = OpenAIService()
-        loop = asyncio.get_running_loop()
-        transcript = await loop.run_in_executor(
-            None,
-            lambda: openai_service.transcribe_voice_sync(local_path)
-        )
-        os.remove(local_path)
-        if not transcript or len(transcript.strip()) < 2:
-            await message.answer("❌ Не удалось распознать голосовое сообщение. Попробуйте еще раз или говорите чётче.")
-            logging.warning(f"[VOICE] Не удалось распознать голосовое сообщение от {message.from_user.id}")
-            return
-        # Логируем голосовое сообщение
-        await db.log_chat_message(message.from_user.id, "voice", transcript, "voice_transcription", True)
-        # Сохраняем транскрипцию и состояние
-        current_state = await state.get_state()
-        await state.update_data(voice_transcript=transcript, voice_state=current_state)
+    # Слишком длинные голосовые отклоняем до скачивания и обращения к API
+    if voice.duration > VOICE_MAX_DURATION or (voice.file_size or 0) > VOICE_MAX_FILE_SIZE:
+        logging.info(f"[VOICE] Слишком длинное голосовое от {user_id}: {voice.duration} с")
         await message.answer(
-            f"📝 Распознанный текст:\n<code>{transcript}</code>\n\nПодтвердите или отредактируйте текст.",
-            reply_markup=get_voice_confirm_keyboard(),
-            parse_mode="HTML"
+            f"❌ Голосовое сообщение слишком длинное. Запишите, пожалуйста, до {VOICE_MAX_DURATION // 60} мин "
+            f"или напишите текстом."
         )
-        logging.info(f"[VOICE] Транскрибация завершена для {message.from_user.id}")
-    except Exception as e:
-        logging.error(f"Ошибка транскрибации голосового сообщения: {e}", exc_info=True)
-        await message.answer("❌ Произошла ошибка при распознавании голосового сообщения. Попробуйте позже.")
-        if os.path.exists(local_path):
-            os.remove(local_path)
+        return
+
+    voice_state = await state.get_state()
+    if voice_state == VoiceInput.editing.state:
+        # Голосовое вместо исправленного текста — относится к тому же шагу
+        voice_state = (await state.get_data()).get("voice_edit_state")
+        await state.set_state(voice_state)
+    # Пересланное или повторно отправленное голосовое уже расшифровано
+    transcript = await transcriptions.cache.get(voice.file_unique_id)
+    if transcript is not None:
+        await show_transcript(message.answer, db, state, user_id, transcript, voice_state)
+        return
+
+    if not openai_service.enabled:
+        await message.answer("🎙 Распознавание голосовых сообщений сейчас недоступно. Напишите, пожалуйста, текстом.")
+        return
+    # Лимит проверяется до постановки в очередь и скачивания файла
+    if openai_service.usage is not None and not openai_service.usage.allowed(user_id):
+        await message.answer(TRANSCRIPTION_QUOTA)
+        return
+
+    async def transcribe() -> str:
+        # Файл скачивается в память и сразу уходит на расшифровку — без временных файлов
+        audio = await message.bot.download(voice)
+        return await openai_service.transcribe_voice(audio, voice.duration, user_id)
+
+    async def on_done(transcript: Optional[str], error: Optional[BaseException]):
+        if isinstance(error, QuotaExceededError):
+            await status.edit_text(TRANSCRIPTION_QUOTA)
+        elif error is not None:
+            logging.error(f"Ошибка транскрибации голосового сообщения: {error}", exc_info=error)
+            await status.edit_text("❌ Произошла ошибка при распознавании голосового сообщения. Попробуйте позже.")
+        elif await state.get_state() != voice_state:
+            # Пока голосовое ждало очереди, пользователь отменил шаг или перешёл к другому
+            logging.info(f"[VOICE] Расшифровка для {user_id} устарела: шаг уже сменился")
+            await status.edit_text(
+                "📝 Голосовое сообщение распознано, но вы уже перешли к другому шагу. "
+                "Отправьте его ещё раз, если оно нужно."
+            )
+        else:
+            await show_transcript(status.edit_text, db, state, user_id, transcript, voice_state)
+
+    status = await message.answer("⏳ Голосовое сообщение в очереди на распознавание…")
+    try:
+        position = transcriptions.submit(user_id, voice.file_unique_id, transcribe, on_done)
+    except QueueFullError:
+        logging.warning(f"[VOICE] Очередь расшифровки переполнена, голосовое от {user_id} отклонено")
+        await status.edit_text("⏳ Сейчас много голосовых сообщений. Отправьте, пожалуйста, чуть позже или напишите текстом.")
+        return
+    if position > 1:
+        await status.edit_text(f"⏳ Голосовое сообщение в очереди на распознавание, место: {position}…")
 
 @router.callback_query(F.data == "voice:confirm")
-async def confirm_voice(callback: CallbackQuery, state: FSMContext, db):
+async def confirm_voice(callback: CallbackQuery, state: FSMContext, **data):
     logging.info(f"[VOICE] Подтверждение голосового сообщения от {callback.from_user.id}")
-    from handlers.ai_lawyer import process_ai_question
-    from handlers.registration import (
-        process_full_name, process_phone, process_email, process_birth_date, process_passport_series, process_passport_number, process_passport_issued_by, process_passport_issue_date, process_address, process_emergency_contact, process_relationship
-    )
-    from handlers.funeral import (
-        process_body_location, process_funeral_type, process_services, process_budget
-    )
-    from handlers.memory import (
-        process_memory_photo, process_memory_name, process_birth_date as process_memory_birth_date, process_death_date as process_memory_death_date, process_memory_text
-    )
-    data = await state.get_data()
-    transcript = data.get("voice_transcript")
-    voice_state = data.get("voice_state")
+    fsm_data = await state.get_data()
+    transcript = fsm_data.get("voice_transcript")
+    voice_state = fsm_data.get("voice_state")
     if not transcript or not voice_state:
         await callback.answer("Нет текста для отправки", show_alert=True)
         return
-    class MessageWithText:
-        def __init__(self, orig_message, text):
-            self.__dict__.update(orig_message.__dict__)
-            self.text = text
-        async def answer(self, *args, **kwargs):
-            return await callback.message.answer(*args, **kwargs)
-        async def reply(self, *args, **kwargs):
-            return await callback.message.reply(*args, **kwargs)
-    fake_message = MessageWithText(callback.message, transcript)
+    # Ответы идут в чат с кнопками, автор — нажавший пользователь, а не бот
+    text_message = MessageProxy(callback.message, transcript, from_user=callback.from_user)
     logging.info(f"[VOICE] Передаю текст в обработчик состояния: {voice_state}")
-    if voice_state == AIHelper.waiting_for_question.state:
-        await process_ai_question(fake_message, state, db)
-    elif voice_state == ClientRegistration.waiting_for_full_name.state:
-        await process_full_name(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_phone.state:
-        await process_phone(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_email.state:
-        await process_email(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_birth_date.state:
-        await process_birth_date(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_passport_series.state:
-        await process_passport_series(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_passport_number.state:
-        await process_passport_number(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_passport_issued_by.state:
-        await process_passport_issued_by(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_passport_issue_date.state:
-        await process_passport_issue_date(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_address.state:
-        await process_address(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_emergency_contact.state:
-        await process_emergency_contact(fake_message, state)
-    elif voice_state == ClientRegistration.waiting_for_relationship.state:
-        await process_relationship(fake_message, state)
-    elif voice_state == FuneralForm.waiting_for_body_location.state:
-        await process_body_location(fake_message, state, db)
-    elif voice_state == FuneralForm.waiting_for_funeral_type.state:
-        await process_funeral_type(fake_message, state, db)
-    elif voice_state == FuneralForm.waiting_for_services.state:
-        await process_services(fake_message, state, db)
-    elif voice_state == FuneralForm.waiting_for_budget.state:
-        await process_budget(fake_message, state, db)
-    elif voice_state == MemoryRecord.waiting_for_photo.state:
-        await process_memory_photo(fake_message, state)
-    elif voice_state == MemoryRecord.waiting_for_name.state:
-        await process_memory_name(fake_message, state)
-    elif voice_state == MemoryRecord.waiting_for_birth_date.state:
-        await process_memory_birth_date(fake_message, state)
-    elif voice_state == MemoryRecord.waiting_for_death_date.state:
-        await process_memory_death_date(fake_message, state)
-    elif voice_state == MemoryRecord.waiting_for_memory_text.state:
-        await process_memory_text(fake_message, state, db)
-    else:
-        await callback.message.answer(f"📝 Распознанный текст:\n<code>{transcript}</code>", parse_mode="HTML")
+    if not await dispatch_text(voice_state, text_message, state=state, **data):
+        await callback.message.answer(f"📝 Распознанный текст:\n<code>{html.escape(transcript)}</code>", parse_mode="HTML")
         await callback.message.answer(
             "Выберите действие из меню.",
             reply_markup=get_main_keyboard(is_admin=callback.from_user.id in ADMIN_IDS)
@@ -146,75 +135,20 @@ async def edit_voice_text(callback: CallbackQuery, state: FSMContext):
     )
     data = await state.get_data()
     await state.update_data(voice_edit_state=data.get("voice_state"))
+    await state.set_state(VoiceInput.editing)
 
-@router.message()
-async def handle_voice_edit_text(message: Message, state: FSMContext, db):
-    data = await state.get_data()
-    voice_edit_state = data.get("voice_edit_state")
-    if not voice_edit_state:
-        return  # Не обрабатываем, чтобы другие роутеры могли обработать
-    from handlers.ai_lawyer import process_ai_question
-    from handlers.registration import (
-        process_full_name, process_phone, process_email, process_birth_date, process_passport_series, process_passport_number, process_passport_issued_by, process_passport_issue_date, process_address, process_emergency_contact, process_relationship
-    )
-    from handlers.funeral import (
-        process_body_location, process_funeral_type, process_services, process_budget
-    )
-    from handlers.memory import (
-        process_memory_photo, process_memory_name, process_birth_date as process_memory_birth_date, process_death_date as process_memory_death_date, process_memory_text
-    )
-    class MessageWithText:
-        def __init__(self, orig_message, text):
-            self.__dict__.update(orig_message.__dict__)
-            self.text = text
-        async def answer(self, *args, **kwargs):
-            return await message.answer(*args, **kwargs)
-        async def reply(self, *args, **kwargs):
-            return await message.reply(*args, **kwargs)
-    fake_message = MessageWithText(message, message.text)
-    if voice_edit_state == AIHelper.waiting_for_question.state:
-        await process_ai_question(fake_message, state, db)
-    elif voice_edit_state == ClientRegistration.waiting_for_full_name.state:
-        await process_full_name(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_phone.state:
-        await process_phone(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_email.state:
-        await process_email(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_birth_date.state:
-        await process_birth_date(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_passport_series.state:
-        await process_passport_series(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_passport_number.state:
-        await process_passport_number(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_passport_issued_by.state:
-        await process_passport_issued_by(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_passport_issue_date.state:
-        await process_passport_issue_date(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_address.state:
-        await process_address(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_emergency_contact.state:
-        await process_emergency_contact(fake_message, state)
-    elif voice_edit_state == ClientRegistration.waiting_for_relationship.state:
-        await process_relationship(fake_message, state)
-    elif voice_edit_state == FuneralForm.waiting_for_body_location.state:
-        await process_body_location(fake_message, state)
-    elif voice_edit_state == FuneralForm.waiting_for_funeral_type.state:
-        await process_funeral_type(fake_message, state)
-    elif voice_edit_state == FuneralForm.waiting_for_services.state:
-        await process_services(fake_message, state)
-    elif voice_edit_state == FuneralForm.waiting_for_budget.state:
-        await process_budget(fake_message, state)
-    elif voice_edit_state == MemoryRecord.waiting_for_photo.state:
-        await process_memory_photo(fake_message, state)
-    elif voice_edit_state == MemoryRecord.waiting_for_name.state:
-        await process_memory_name(fake_message, state)
-    elif voice_edit_state == MemoryRecord.waiting_for_birth_date.state:
-        await process_memory_birth_date(fake_message, state)
-    elif voice_edit_state == MemoryRecord.waiting_for_death_date.state:
-        await process_memory_death_date(fake_message, state)
-    elif voice_edit_state == MemoryRecord.waiting_for_memory_text.state:
-        await process_memory_text(fake_message, state, db)
+@router.message(VoiceInput.editing, F.text)
+async def handle_voice_edit_text(message: Message, state: FSMContext, **data):
+    fsm_data = await state.get_data()
+    voice_edit_state = fsm_data.get("voice_edit_state")
+    # Возвращаем состояние, в котором было голосовое: дальше его переведёт хендлер шага
+    await state.set_state(voice_edit_state)
     await state.update_data(voice_edit_state=None)
+    if not await dispatch_text(voice_edit_state, message, state=state, **data):
+        await message.answer(
+            "Выберите действие из меню.",
+            reply_markup=get_main_keyboard(is_admin=message.from_user.id in ADMIN_IDS)
+        )
 
 @router.callback_query(F.data == "voice:cancel")
 async def cancel_voice(callback: CallbackQuery, state: FSMContext):
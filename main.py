@@ -6,8 +6,40 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from aiogram.client.default import DefaultBotProperties
 
-from config import BOT_TOKEN, DATABASE_PATH
+from config import (
+    BOT_TOKEN,
+    DATABASE_PATH,
+    FSM_STORAGE,
+    FSM_STATE_TTL,
+    FSM_CACHE_SIZE,
+    FSM_FLUSH_INTERVAL,
+    HANDLER_CONCURRENCY,
+    AI_CACHE_TTL,
+    AI_CACHE_SIZE,
+    AI_CACHE_SIMILARITY,
+    FAQ_PATH,
+    FAQ_MIN_CONFIDENCE,
+    ADMIN_IDS,
+    AI_DAILY_REQUESTS,
+    AI_DAILY_TOKENS,
+    AI_USAGE_FLUSH_INTERVAL,
+    TRANSCRIPTION_WORKERS,
+    TRANSCRIPTION_QUEUE_SIZE,
+    TRANSCRIPTION_PER_USER,
+    TRANSCRIPT_CACHE_SIZE,
+    MEMORY_PAGE_WORKERS,
+    MEMORY_PAGE_ATTEMPTS,
+    MEMORY_PAGE_RETRY_DELAY,
+)
 from database.db import Database
+from database.fsm_storage import SQLiteStorage
+from services.answer_cache import AnswerCache
+from services.faq_index import FAQIndex
+from services.memory_pages import MemoryPageQueue
+from services.openai_service import OpenAIService
+from services.transcription_queue import TranscriptCache, TranscriptionQueue
+from services.usage_ledger import UsageLedger
+from middleware.scheduler import ChatSchedulerMiddleware
 
 # Импортируем роутеры
 from handlers import common, funeral, ai_lawyer, shop, memory
@@ -16,27 +48,61 @@ from handlers import voice
 from handlers import admin_panel
 
 
-async def main():
+def setup_logging():
     # Настройка логирования
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s | %(levelname)s | %(name)s | %(message)s'
     )
+
+
+def create_dispatcher(db: Database, openai_service: OpenAIService) -> Dispatcher:
+    """Создание диспетчера: хранилище состояний, middleware и роутеры"""
     logger = logging.getLogger(__name__)
-    logger.info('=== Запуск Telegram-бота ===')
 
-    # Инициализация бота и хранилища состояний
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-    storage = MemoryStorage()
+    if FSM_STORAGE == "memory":
+        storage = MemoryStorage()
+    else:
+        storage = SQLiteStorage(
+            db,
+            ttl=FSM_STATE_TTL,
+            max_cached=FSM_CACHE_SIZE,
+            flush_interval=FSM_FLUSH_INTERVAL,
+        )
+    logger.info(f'Хранилище состояний FSM: {type(storage).__name__}')
     dp = Dispatcher(storage=storage)
 
-    # Инициализация базы данных
-    db = Database(DATABASE_PATH)
-    logger.info('База данных инициализирована')
+    # Планировщик: параллельно по чатам, последовательно внутри чата
+    dp["scheduler"] = ChatSchedulerMiddleware(max_concurrency=HANDLER_CONCURRENCY)
+    dp.update.outer_middleware(dp["scheduler"])
+
+    # База типовых вопросов AI-помощнику (передаётся в хендлеры как ``faq``)
+    dp["faq"] = FAQIndex(FAQ_PATH, min_confidence=FAQ_MIN_CONFIDENCE)
 
-    # Middleware для передачи базы данных в хендлеры
+    # Очередь расшифровки голосовых (передаётся в хендлеры как ``transcriptions``)
+    dp["transcriptions"] = TranscriptionQueue(
+        TranscriptCache(db, max_cached=TRANSCRIPT_CACHE_SIZE),
+        workers=TRANSCRIPTION_WORKERS,
+        max_pending=TRANSCRIPTION_QUEUE_SIZE,
+        max_per_user=TRANSCRIPTION_PER_USER,
+    )
+    dp.shutdown.register(dp["transcriptions"].close)
+
+    # Фоновая подготовка страниц памяти; незавершённые задачи продолжаются при запуске
+    dp["memory_pages"] = MemoryPageQueue(
+        db,
+        openai_service,
+        workers=MEMORY_PAGE_WORKERS,
+        max_attempts=MEMORY_PAGE_ATTEMPTS,
+        retry_delay=MEMORY_PAGE_RETRY_DELAY,
+    )
+    dp.startup.register(dp["memory_pages"].start)
+    dp.shutdown.register(dp["memory_pages"].close)
+
+    # Middleware для передачи базы данных и общего клиента OpenAI в хендлеры
     async def db_middleware(handler, event, data):
         data["db"] = db
+        data["openai_service"] = openai_service
         return await handler(event, data)
 
     dp.message.middleware(db_middleware)
@@ -53,7 +119,33 @@ async def main():
     dp.include_router(admin_panel.router)
     dp.include_router(voice.router)
     logger.info('Роутеры успешно зарегистрированы')
+    return dp
+
+
+def create_openai_service(db: Database) -> OpenAIService:
+    """Общий клиент OpenAI с кэшем ответов AI-помощника и учётом расхода.
+
+    Без OPENAI_API_KEY клиент создаётся выключенным: остальной бот работает,
+    AI-функции отвечают, что временно недоступны.
+    """
+    answer_cache = AnswerCache(db, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_SIZE, similarity=AI_CACHE_SIMILARITY)
+    usage = UsageLedger(
+        db,
+        daily_requests=AI_DAILY_REQUESTS,
+        daily_tokens=AI_DAILY_TOKENS,
+        flush_interval=AI_USAGE_FLUSH_INTERVAL,
+        exempt=ADMIN_IDS,
+    )
+    return OpenAIService(answer_cache=answer_cache, usage=usage)
+
 
+async def load_openai_state(openai_service: OpenAIService):
+    """Загрузка кэша ответов и сегодняшнего расхода из базы"""
+    await openai_service.answer_cache.load()
+    await openai_service.usage.load()
+
+
+async def set_commands(bot: Bot):
     # Установка команд бота
     await bot.set_my_commands([
         BotCommand(command="start", description="Главное меню"),
@@ -63,11 +155,36 @@ async def main():
         BotCommand(command="ask_lawyer", description="AI-помощник по документам"),
         BotCommand(command="help", description="Помощь")
     ])
-    logger.info('Команды Telegram-бота установлены')
+    logging.getLogger(__name__).info('Команды Telegram-бота установлены')
+
+
+async def main():
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    logger.info('=== Запуск Telegram-бота ===')
+
+    # Инициализация базы данных
+    db = Database(DATABASE_PATH)
+    await db.start_audit_log()
+    logger.info('База данных инициализирована')
+
+    # Общий клиент OpenAI на весь процесс
+    openai_service = create_openai_service(db)
+    await load_openai_state(openai_service)
+
+    # Инициализация бота и диспетчера
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
+    dp = create_dispatcher(db, openai_service)
+    await set_commands(bot)
 
     print("✅ Бот запущен!")
     logger.info('=== Бот запущен и ожидает сообщений ===')
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await openai_service.close()
+        await db.close()
+        logger.info('Соединения с базой данных закрыты')
 
 
 if __name__ == "__main__":
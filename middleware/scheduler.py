@@ -0,0 +1,72 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from services.update_queue import update_chat_key
+
+
+class ChatSchedulerMiddleware(BaseMiddleware):
+    """Планировщик апдейтов на уровне диспетчера.
+
+    Регистрируется как outer-middleware для ``dp.update``. Апдейты одного
+    чата выполняются строго по очереди (два быстрых нажатия не гоняются
+    за одни и те же данные FSM), апдейты разных чатов — параллельно, но
+    не больше ``max_concurrency`` хендлеров одновременно.
+    """
+
+    def __init__(self, max_concurrency: int = 64):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._depth: Dict[Hashable, int] = {}
+        self.pending = 0
+        self.running = 0
+        self.processed = 0
+
+    def depth(self, key: Optional[Hashable] = None) -> int:
+        """Число апдейтов в работе и в ожидании: всего или для одного чата"""
+        if key is None:
+            return self.pending
+        return self._depth.get(key, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.pending,
+            'running': self.running,
+            'processed': self.processed,
+            'chats': len(self._depth),
+            'max_chat_depth': max(self._depth.values(), default=0),
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = update_chat_key(event)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._depth[key] = self._depth.get(key, 0) + 1
+        self.pending += 1
+        try:
+            # asyncio.Lock будит ожидающих в порядке очереди — порядок апдейтов чата сохраняется
+            async with lock:
+                async with self._semaphore:
+                    self.running += 1
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+        finally:
+            self.pending -= 1
+            self._depth[key] -= 1
+            # Блокировки простаивающих чатов не копим
+            if not self._depth[key]:
+                del self._depth[key]
+                del self._locks[key]
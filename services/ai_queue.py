@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Приоритеты видов запросов к OpenAI: чем меньше число, тем раньше.
+# Пользователь ждёт ответа юриста и расшифровки голосового прямо в чате,
+# а текст страницы памяти готовится в фоне.
+PRIORITIES: Dict[str, int] = {
+    "legal": 0,
+    "transcription": 1,
+    "memory": 2,
+}
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class TokenBucket:
+    """Ведро токенов с пополнением ``per_minute`` в минуту (0 — без ограничения)"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.available = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def _clamp(self, amount: float) -> float:
+        # Запрос больше всего ведра иначе не прошёл бы никогда
+        return min(amount, self.capacity)
+
+    def delay(self, amount: float) -> float:
+        """Сколько секунд ждать, пока в ведре наберётся ``amount``"""
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill()
+        missing = self._clamp(amount) - self.available
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def consume(self, amount: float):
+        if self.per_minute > 0:
+            self._refill()
+            self.available -= self._clamp(amount)
+
+    def refund(self, amount: float):
+        """Поправка после запроса: отрицательное значение — потрачено больше оценки"""
+        if self.per_minute > 0:
+            self._refill()
+            self.available = min(self.capacity, self.available + amount)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'kind', 'tokens', 'future')
+
+    def __init__(self, priority: int, seq: int, kind: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AIJobQueue:
+    """Общая очередь исходящих запросов к OpenAI.
+
+    Одновременно выполняется не больше ``concurrency`` запросов, а темп
+    ограничен двумя вёдрами токенов: запросов в минуту и токенов в минуту.
+    Ожидающие запросы выдаются по приоритету вида (``PRIORITIES``), внутри
+    одного приоритета — по порядку поступления. Ожидающий может получать
+    своё место в очереди через ``on_position``.
+    """
+
+    def __init__(self, concurrency: int = 4, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 position_interval: float = 1.0):
+        self.concurrency = concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.position_interval = position_interval
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.active = 0
+        self.completed: Dict[str, int] = {kind: 0 for kind in PRIORITIES}
+        self.total_wait = 0.0
+
+    # ===== Выдача очереди =====
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+        self._wakeup.set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch(), name="ai-queue-dispatcher")
+
+    async def _dispatch(self):
+        while self._waiting:
+            self._wakeup.clear()
+            # Отменённые ожидающие убираются из головы очереди
+            while self._waiting and self._waiting[0].future.done():
+                heapq.heappop(self._waiting)
+            if not self._waiting:
+                break
+
+            delay = None
+            if self.active < self.concurrency:
+                head = self._waiting[0]
+                delay = max(self.requests.delay(1), self.tokens.delay(head.tokens))
+                if delay == 0:
+                    heapq.heappop(self._waiting)
+                    self.requests.consume(1)
+                    self.tokens.consume(head.tokens)
+                    self.active += 1
+                    head.future.set_result(None)
+                    self._notify()
+                    continue
+
+            # Ждём освобождения слота, нового запроса или пополнения вёдер
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def position(self, waiter: _Waiter) -> int:
+        """Место в очереди, начиная с 1"""
+        return 1 + sum(1 for other in self._waiting if other < waiter and not other.future.done())
+
+    def depth(self) -> int:
+        return sum(1 for waiter in self._waiting if not waiter.future.done())
+
+    async def _wait_turn(self, waiter: _Waiter, on_position: Optional[PositionCallback]):
+        if on_position is None:
+            await waiter.future
+            return
+
+        last_position = None
+        last_reported = 0.0
+        while not waiter.future.done():
+            position = self.position(waiter)
+            now = time.monotonic()
+            if position != last_position and now - last_reported >= self.position_interval:
+                try:
+                    await on_position(position)
+                except Exception as e:
+                    logging.warning(f"[AI QUEUE] Не удалось показать место в очереди: {e}")
+                last_position, last_reported = position, now
+            changed = asyncio.ensure_future(self._changed.wait())
+            await asyncio.wait({waiter.future, changed}, return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+
+    @asynccontextmanager
+    async def slot(self, kind: str, tokens: int = 0,
+                   on_position: Optional[PositionCallback] = None) -> AsyncIterator[Callable[[int], None]]:
+        """Ожидание своей очереди и занятие слота на время запроса.
+
+        Внутри блока доступна функция ``report(tokens)`` — фактический расход
+        токенов (из ``usage`` ответа), чтобы поправить оценку в ведре.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(PRIORITIES.get(kind, max(PRIORITIES.values()) + 1), next(self._seq), kind, tokens,
+                         loop.create_future())
+        heapq.heappush(self._waiting, waiter)
+        self._ensure_dispatcher()
+        self._notify()
+
+        started = time.monotonic()
+        try:
+            await self._wait_turn(waiter, on_position)
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже выдан, но ждущий отменён — возвращаем его
+                self._release()
+            else:
+                waiter.future.cancel()
+                self._notify()
+            raise
+        self.total_wait += time.monotonic() - started
+
+        def report(actual_tokens: int):
+            self.tokens.refund(tokens - actual_tokens)
+
+        try:
+            yield report
+        finally:
+            self.completed[kind] = self.completed.get(kind, 0) + 1
+            self._release()
+
+    def _release(self):
+        self.active -= 1
+        self._notify()
+        if self._waiting:
+            self._ensure_dispatcher()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'active': self.active,
+            'waiting': self.depth(),
+            'completed': dict(self.completed),
+            'total_wait': round(self.total_wait, 3),
+        }
@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from database.write_behind import WriteBehind
+
+# Параметры MinHash: 64 хэш-функции, разбитые на 16 полос по 4 значения (LSH).
+# Кандидатами считаются вопросы, совпавшие хотя бы в одной полосе, затем
+# сходство уточняется по всей сигнатуре.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_HASH_PARAMS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Приведение вопроса к каноническому виду: регистр, ё, пунктуация, пробелы"""
+    text = text.lower().replace("ё", "е")
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def question_key(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def shingles(normalized: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Символьные n-граммы нормализованного вопроса (опечатки и окончания меняют лишь часть из них)"""
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signature(normalized: str) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(normalized)]
+    return tuple(
+        min((a * h + b) % _PRIME for h in hashes)
+        for a, b in _HASH_PARAMS
+    )
+
+
+def signature_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Оценка коэффициента Жаккара по доле совпавших значений MinHash"""
+    same = sum(1 for x, y in zip(first, second) if x == y)
+    return same / len(first)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = len(signature) // LSH_BANDS
+    return [(i, signature[i * rows:(i + 1) * rows]) for i in range(LSH_BANDS)]
+
+
+class _CachedAnswer:
+    __slots__ = ('key', 'question', 'answer', 'signature', 'created_at', 'hits')
+
+    def __init__(self, key: str, question: str, answer: str, signature: Tuple[int, ...],
+                 created_at: float, hits: int = 0):
+        self.key = key
+        self.question = question
+        self.answer = answer
+        self.signature = signature
+        self.created_at = created_at
+        self.hits = hits
+
+
+class AnswerCache:
+    """Кэш ответов AI-помощника по документам.
+
+    Ключ — нормализованный текст вопроса. Если точного совпадения нет,
+    ищется почти такой же вопрос (MinHash по символьным триграммам,
+    сходство не ниже ``similarity``). Записи живут ``ttl`` секунд,
+    при превышении ``max_entries`` вытесняются давно не использованные.
+    Все записи хранятся в таблице ``ai_answer_cache`` и загружаются
+    при запуске через ``load()``. Попадания (last_hit, hits) копятся в
+    памяти и записываются в базу раз в ``flush_interval`` секунд, чтобы
+    ответ из кэша не ждал очереди потока-писателя.
+    """
+
+    def __init__(self, db, ttl: float = 7 * 24 * 60 * 60, max_entries: int = 1000, similarity: float = 0.8,
+                 flush_interval: float = 5.0):
+        self._db = db
+        self.flush_interval = flush_interval
+        # Незаписанные попадания: ключ -> (время последнего, число)
+        self._pending_hits: Dict[str, Tuple[float, int]] = {}
+        self._writer = WriteBehind(self._write_hits, lambda: bool(self._pending_hits), flush_interval, "AI CACHE")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    # ===== Индекс в памяти =====
+
+    def _expired(self, entry: _CachedAnswer, now: float) -> bool:
+        return self.ttl > 0 and now - entry.created_at > self.ttl
+
+    def _index(self, entry: _CachedAnswer):
+        self._entries[entry.key] = entry
+        self._entries.move_to_end(entry.key)
+        for band in _bands(entry.signature):
+            self._buckets.setdefault(band, set()).add(entry.key)
+
+    def _unindex(self, key: str) -> Optional[_CachedAnswer]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for band in _bands(entry.signature):
+                bucket = self._buckets.get(band)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band]
+        return entry
+
+    def _find_similar(self, signature: Tuple[int, ...]) -> Optional[_CachedAnswer]:
+        candidates: Set[str] = set()
+        for band in _bands(signature):
+            candidates |= self._buckets.get(band, set())
+        best, best_score = None, self.similarity
+        for key in candidates:
+            entry = self._entries[key]
+            score = signature_similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    # ===== Публичный интерфейс =====
+
+    async def load(self) -> int:
+        """Загрузка сохранённых ответов из базы; возвращает число записей"""
+        rows = await self._db.get_cached_answers(self.max_entries)
+        now = time.time()
+        self._entries.clear()
+        self._buckets.clear()
+        # Самые свежие по использованию должны оказаться в конце LRU
+        for key, question, answer, created_at, hits in reversed(rows):
+            entry = _CachedAnswer(key, question, answer, minhash_signature(question), created_at, hits)
+            if not self._expired(entry, now):
+                self._index(entry)
+        logging.info(f"[AI CACHE] Загружено ответов из базы: {len(self._entries)}")
+        return len(self._entries)
+
+    async def get(self, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.time()
+
+        entry = self._entries.get(question_key(normalized))
+        exact = entry is not None
+        if entry is None:
+            entry = self._find_similar(minhash_signature(normalized))
+        if entry is not None and self._expired(entry, now):
+            await self._delete([self._unindex(entry.key).key])
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if exact:
+            self.hits += 1
+        else:
+            self.near_hits += 1
+        entry.hits += 1
+        self._entries.move_to_end(entry.key)
+        _, count = self._pending_hits.get(entry.key, (now, 0))
+        self._pending_hits[entry.key] = (now, count + 1)
+        self._writer.schedule()
+        return entry.answer
+
+    async def put(self, question: str, answer: str):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        now = time.time()
+        key = question_key(normalized)
+        self._unindex(key)
+        self._index(_CachedAnswer(key, normalized, answer, minhash_signature(normalized), now))
+
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._unindex(next(iter(self._entries))).key)
+
+        await self._db.save_cached_answer(key, normalized, answer, now, evicted)
+
+    async def invalidate(self, question: Optional[str] = None) -> int:
+        """Удаление ответа на вопрос (и почти таких же) или всего кэша; возвращает число удалённых"""
+        if question is None:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._buckets.clear()
+            await self._db.delete_cached_answers()
+            return len(keys)
+
+        normalized = normalize_question(question)
+        signature = minhash_signature(normalized)
+        keys = [
+            key for key, entry in self._entries.items()
+            if entry.question == normalized or signature_similarity(signature, entry.signature) >= self.similarity
+        ]
+        for key in keys:
+            self._unindex(key)
+        await self._delete(keys)
+        return len(keys)
+
+    # ===== Запись попаданий в базу =====
+
+    async def _write_hits(self):
+        pending, self._pending_hits = self._pending_hits, {}
+        rows = [(last_hit, count, key) for key, (last_hit, count) in pending.items()]
+        try:
+            await self._db.add_cached_answer_hits(rows)
+        except Exception:
+            # Вернём незаписанные попадания к новым
+            for key, (last_hit, count) in pending.items():
+                newer, added = self._pending_hits.get(key, (last_hit, 0))
+                self._pending_hits[key] = (max(last_hit, newer), count + added)
+            raise
+
+    async def flush(self):
+        await self._writer.flush()
+
+    async def close(self):
+        await self._writer.close()
+
+    async def _delete(self, keys: List[str]):
+        if keys:
+            await self._db.delete_cached_answers(keys)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.near_hits + self.misses
+        return (self.hits + self.near_hits) / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+        }
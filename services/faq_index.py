@@ -0,0 +1,197 @@
+import heapq
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from services.answer_cache import normalize_question
+
+# Служебные слова, которые есть почти в каждом вопросе и не влияют на смысл
+STOP_WORDS = {
+    "а", "в", "во", "и", "к", "ко", "на", "о", "об", "от", "по", "при", "с", "со", "у", "для", "до", "из",
+    "за", "же", "ли", "не", "что", "как", "какие", "какой", "где", "куда", "кто", "мне", "нам", "я", "мы",
+    "это", "или", "если", "после", "чтобы", "нужно", "нужны", "нужен", "нужна", "надо", "можно",
+    "подскажите", "пожалуйста", "скажите",
+    # Глаголы-намерения: «получить», «оформить», «взять» справку — об одном и том же
+    "получить", "оформить", "оформлять", "взять", "сделать", "делать", "узнать",
+}
+# Грубый стемминг: слово обрезается до основы, чтобы «кремации» и «кремацию» совпали
+STEM_LENGTH = 5
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        word[:STEM_LENGTH]
+        for word in normalize_question(text).split()
+        if word not in STOP_WORDS
+    ]
+
+
+class FAQMatch:
+    __slots__ = ('question', 'answer', 'score', 'confidence')
+
+    def __init__(self, question: str, answer: str, score: float, confidence: float):
+        self.question = question
+        self.answer = answer
+        self.score = score
+        self.confidence = confidence
+
+
+class FAQIndex:
+    """Локальная база типовых вопросов и ответов с поиском BM25.
+
+    Источник — JSON-файл со списком ``{"question", "alternatives", "answer"}``.
+    Каждая формулировка индексируется отдельно, у ответа берётся лучшая.
+    Уверенность совпадения — доля «веса» (IDF) общих слов и в вопросе,
+    и в найденной формулировке; ниже ``min_confidence`` вопрос уходит
+    в GPT-4. Файл перечитывается, если изменилось время его модификации.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    TOP_K = 10
+
+    def __init__(self, path: str, min_confidence: float = 0.7, check_interval: float = 5.0):
+        self.path = path
+        self.min_confidence = min_confidence
+        self.check_interval = check_interval
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._answers: List[Dict[str, str]] = []
+        self._docs: List[Counter] = []
+        self._doc_answer: List[int] = []
+        self._doc_len: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_len = 0.0
+        self.lookups = 0
+        self.answered = 0
+        self.reload()
+
+    # ===== Загрузка и индекс =====
+
+    def reload(self) -> bool:
+        """Перестроение индекса из файла; при ошибке остаётся прежний индекс"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            answers, docs, doc_answer = self._parse(entries)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.error(f"[FAQ] Не удалось загрузить {self.path}: {e}")
+            return False
+
+        postings: Dict[str, List[int]] = {}
+        for doc_id, doc in enumerate(docs):
+            for token in doc:
+                postings.setdefault(token, []).append(doc_id)
+        count = len(docs)
+
+        self._answers = answers
+        self._docs = docs
+        self._doc_answer = doc_answer
+        self._doc_len = [sum(doc.values()) for doc in docs]
+        self._avg_len = sum(self._doc_len) / count if count else 0.0
+        self._postings = postings
+        self._idf = {
+            token: math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for token, ids in postings.items()
+        }
+        self._unknown_idf = math.log(1 + (count + 0.5) / 0.5)
+        self._mtime = mtime
+        logging.info(f"[FAQ] Загружено ответов: {len(answers)}, формулировок: {count}")
+        return True
+
+    @staticmethod
+    def _parse(entries):
+        """Проверка записей и разбиение формулировок на слова"""
+        if not isinstance(entries, list):
+            raise TypeError("ожидается список записей")
+        answers, docs, doc_answer = [], [], []
+        for number, entry in enumerate(entries, 1):
+            if not isinstance(entry, dict):
+                raise TypeError(f"запись {number}: ожидается объект")
+            question, answer = entry['question'], entry['answer']
+            alternatives = entry.get('alternatives', [])
+            if not isinstance(question, str) or not isinstance(answer, str):
+                raise TypeError(f"запись {number}: question и answer должны быть строками")
+            if not isinstance(alternatives, list) or not all(isinstance(alt, str) for alt in alternatives):
+                raise TypeError(f"запись {number}: alternatives должен быть списком строк")
+            answers.append({'question': question, 'answer': answer})
+            for phrasing in [question, *alternatives]:
+                tokens = tokenize(phrasing)
+                if tokens:
+                    docs.append(Counter(tokens))
+                    doc_answer.append(len(answers) - 1)
+        return answers, docs, doc_answer
+
+    def maybe_reload(self):
+        """Проверка времени изменения файла (не чаще раза в ``check_interval`` секунд)"""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    # ===== Поиск =====
+
+    def search(self, question: str) -> Optional[FAQMatch]:
+        """Лучший ответ из базы независимо от уверенности"""
+        self.maybe_reload()
+        terms = set(tokenize(question))
+        if not terms or not self._docs:
+            return None
+
+        scores: Dict[int, float] = {}
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id in self._postings[term]:
+                tf = self._docs[doc_id][term]
+                norm = self.K1 * (1 - self.B + self.B * self._doc_len[doc_id] / self._avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        if not scores:
+            return None
+
+        # Из лучших по BM25 формулировок выбирается самая уверенная
+        query_weight = sum(self._idf.get(term, self._unknown_idf) for term in terms)
+        best, best_confidence = None, -1.0
+        for doc_id in heapq.nlargest(self.TOP_K, scores, key=scores.get):
+            confidence = self._confidence(terms, query_weight, self._docs[doc_id])
+            if confidence > best_confidence:
+                best, best_confidence = doc_id, confidence
+        entry = self._answers[self._doc_answer[best]]
+        return FAQMatch(entry['question'], entry['answer'], scores[best], best_confidence)
+
+    def _confidence(self, terms: Set[str], query_weight: float, doc: Counter) -> float:
+        # Вопрос должен быть покрыт формулировкой, а формулировка — вопросом:
+        # «пособие» одним словом не означает «пособие на погребение»
+        matched = sum(self._idf[term] for term in terms if term in doc)
+        doc_weight = sum(self._idf[term] for term in doc)
+        return min(matched / query_weight, matched / doc_weight)
+
+    def match(self, question: str) -> Optional[FAQMatch]:
+        """Ответ из базы, если уверенность достаточна, иначе None"""
+        self.lookups += 1
+        result = self.search(question)
+        if result is None or result.confidence < self.min_confidence:
+            return None
+        self.answered += 1
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'answers': len(self._answers),
+            'lookups': self.lookups,
+            'answered': self.answered,
+            'share': self.answered / self.lookups if self.lookups else 0.0,
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import html
+import logging
+from typing import Optional, Set
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from keyboards.main_keyboard import get_memory_record_keyboard
+from services.memory_service import MemoryService
+from services.openai_service import OpenAIService
+
+
+class MemoryPageQueue:
+    """Фоновая подготовка страниц памяти.
+
+    Хендлер создаёт запись и задачу (``submit``) и сразу отвечает
+    пользователю; текст страницы готовит GPT-4, затем страница рендерится,
+    путь к ней записывается в ``memory_records.html_path``, а пользователю
+    приходит уведомление с файлом. Задачи хранятся в таблице
+    ``memory_page_jobs`` и после перезапуска продолжаются в ``start``.
+    Неудачная попытка повторяется через ``retry_delay * попытка`` секунд,
+    не больше ``max_attempts`` раз.
+    """
+
+    def __init__(self, db, openai_service: OpenAIService, workers: int = 2,
+                 max_attempts: int = 3, retry_delay: float = 30):
+        self._db = db
+        self.memory_service = MemoryService(openai_service)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._semaphore = asyncio.Semaphore(workers)
+        self._tasks: Set[asyncio.Task] = set()
+        self._bot: Optional[Bot] = None
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self, bot: Bot):
+        """Продолжение незавершённых задач (при запуске бота)"""
+        self._bot = bot
+        jobs = await self._db.get_memory_page_jobs()
+        if jobs:
+            logging.info(f"[MEMORY] Продолжаем подготовку страниц памяти: {len(jobs)}")
+        for record_id, chat_id, attempts in jobs:
+            self._schedule(record_id, chat_id, attempts)
+
+    async def submit(self, record_id: int, chat_id: int):
+        await self._db.add_memory_page_job(record_id, chat_id)
+        self._schedule(record_id, chat_id, 0)
+
+    def run_saved(self, record_id: int, chat_id: int):
+        """Запуск задачи, уже сохранённой в базе (``create_memory_record_with_page_job``)"""
+        self._schedule(record_id, chat_id, 0)
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _schedule(self, record_id: int, chat_id: int, attempts: int):
+        task = asyncio.create_task(self._run(record_id, chat_id, attempts), name=f"memory-page-{record_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, record_id: int, chat_id: int, attempts: int):
+        while True:
+            try:
+                async with self._semaphore:
+                    await self._build(record_id, chat_id)
+                self.completed += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempts += 1
+                logging.error(f"[MEMORY] Ошибка подготовки страницы {record_id} (попытка {attempts}): {e}",
+                              exc_info=True)
+                if attempts >= self.max_attempts:
+                    self.failed += 1
+                    await self._db.finish_memory_page_job(record_id)
+                    await self._notify(chat_id, "⚠️ Не удалось подготовить страницу памяти. "
+                                                "Запись сохранена, попробуйте создать страницу позже.")
+                    return
+                await self._db.retry_memory_page_job(record_id)
+                await asyncio.sleep(self.retry_delay * attempts)
+
+    async def _build(self, record_id: int, chat_id: int):
+        record = await self._db.get_memory_record(record_id)
+        if record is None:
+            # Запись удалили, пока задача ждала
+            await self._db.finish_memory_page_job(record_id)
+            return
+        html_path = await self.memory_service.create_memory_page(
+            record_id=record_id,
+            name=record['name'],
+            birth_date=record['birth_date'],
+            death_date=record['death_date'],
+            memory_text=record['memory_text'],
+            photo_path=record['photo_path'],
+            candles_count=record['candles_count'] or 0,
+            user_id=record['telegram_id'],
+        )
+        await self._db.finish_memory_page_job(record_id, html_path)
+        logging.info(f"[MEMORY] Страница памяти {record_id} готова: {html_path}")
+        await self._notify(
+            chat_id,
+            # Подпись уходит с parse_mode=HTML: имя экранируется, иначе Telegram её отклонит
+            f"🕯️ Страница памяти «{html.escape(record['name'], quote=False)}» готова.",
+            document=html_path,
+            record_id=record_id,
+        )
+
+    async def _notify(self, chat_id: int, text: str, document: Optional[str] = None,
+                      record_id: Optional[int] = None):
+        if self._bot is None:
+            return
+        markup = get_memory_record_keyboard(record_id) if record_id is not None else None
+        try:
+            if document is not None:
+                await self._bot.send_document(chat_id, FSInputFile(document), caption=text, reply_markup=markup)
+            else:
+                await self._bot.send_message(chat_id, text, reply_markup=markup)
+        except Exception as e:
+            logging.warning(f"[MEMORY] Не удалось уведомить {chat_id}: {e}")
+
+    async def close(self):
+        """Остановка при выключении бота; задачи остаются в базе до следующего запуска"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
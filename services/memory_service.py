@@ -1,21 +1,15 @@
 import os
 import aiofiles
 from datetime import datetime
-from config import MEMORY_PAGES_DIR, TEMPLATES_DIR
+from typing import Optional
+from config import MEMORY_PAGES_DIR, TEMPLATES_DIR, TEMPLATE_BYTECODE_DIR
 from services.openai_service import OpenAIService
+from services.page_renderer import TemplateRenderer
 
-class MemoryService:
-    def __init__(self):
-        self.openai_service = OpenAIService()
-        self.html_template = self._load_html_template()
-    
-    def _load_html_template(self) -> str:
-        """Загрузка HTML-шаблона"""
-        template_path = os.path.join(TEMPLATES_DIR, "memory_template.html")
-        
-        if not os.path.exists(template_path):
-            # Создаем базовый шаблон
-            template = """
+MEMORY_TEMPLATE = "memory_template.html"
+
+# Базовый шаблон, если в TEMPLATES_DIR его нет
+DEFAULT_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="ru">
 <head>
@@ -130,22 +124,37 @@ class MemoryService:
     </div>
 </body>
 </html>
-            """
-            
+"""
+
+_renderer: Optional[TemplateRenderer] = None
+
+
+def get_page_renderer() -> TemplateRenderer:
+    """Общий на процесс шаблон страницы памяти"""
+    global _renderer
+    if _renderer is None:
+        template_path = os.path.join(TEMPLATES_DIR, MEMORY_TEMPLATE)
+        if not os.path.exists(template_path):
             os.makedirs(TEMPLATES_DIR, exist_ok=True)
             with open(template_path, 'w', encoding='utf-8') as f:
-                f.write(template)
-        
-        with open(template_path, 'r', encoding='utf-8') as f:
-            return f.read()
+                f.write(DEFAULT_TEMPLATE)
+        _renderer = TemplateRenderer(TEMPLATES_DIR, MEMORY_TEMPLATE, bytecode_dir=TEMPLATE_BYTECODE_DIR or None)
+    return _renderer
+
+
+class MemoryService:
+    def __init__(self, openai_service: OpenAIService):
+        self.openai_service = openai_service
+        self.renderer = get_page_renderer()
     
     async def create_memory_page(self, record_id: int, name: str, birth_date: str, death_date: str, 
-                                memory_text: str, photo_path: str = None, candles_count: int = 0) -> str:
+                                memory_text: str, photo_path: str = None, candles_count: int = 0,
+                                user_id: Optional[int] = None) -> str:
         """Создание HTML-страницы памяти"""
         
         # Генерируем улучшенный текст с помощью AI
         enhanced_text = await self.openai_service.generate_memory_page_content(
-            name, birth_date, death_date, memory_text
+            name, birth_date, death_date, memory_text, user_id=user_id
         )
         
         # Подготавливаем данные для шаблона
@@ -159,13 +168,8 @@ class MemoryService:
             'created_at': datetime.now().strftime("%d.%m.%Y %H:%M")
         }
         
-        # Заменяем плейсхолдеры в шаблоне
-        html_content = self.html_template
-        for key, value in template_data.items():
-            if value is not None:
-                html_content = html_content.replace(f'{{{{{key}}}}}', str(value))
-            else:
-                html_content = html_content.replace(f'{{{{{key}}}}}', '')
+        # Скомпилированный шаблон с экранированием пользовательского текста
+        html_content = self.renderer.render(**template_data)
         
         # Создаем файл
         filename = f"memory_{record_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
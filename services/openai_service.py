@@ -1,44 +1,361 @@
+import httpx
 from openai import AsyncOpenAI
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_TIMEOUT,
+    OPENAI_CONNECT_TIMEOUT,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_MAX_RETRIES,
+    AI_CONCURRENCY,
+    AI_REQUESTS_PER_MINUTE,
+    AI_TOKENS_PER_MINUTE,
+    AI_DEADLINE,
+    AI_MEMORY_DEADLINE,
+    AI_RETRY_BASE_DELAY,
+    AI_HEDGE_PERCENTILE,
+    AI_BREAKER_FAILURES,
+    AI_BREAKER_RESET,
+    AI_PRICE_PROMPT_1K,
+    AI_PRICE_COMPLETION_1K,
+    AI_PRICE_TRANSCRIPTION_MIN,
+)
 import logging
-import os
+import time
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional
+
+from services.ai_queue import AIJobQueue, PositionCallback
+from services.answer_cache import AnswerCache, normalize_question
+from services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+from services.single_flight import SingleFlight
+from services.usage_ledger import QuotaExceededError, UsageLedger
+
+class AIUnavailableError(Exception):
+    """AI-функции отключены: не задан OPENAI_API_KEY"""
+
+
+LEGAL_ADVICE_ERROR = "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
+# Ответ пользователю, исчерпавшему дневной лимит расходов на API
+LEGAL_ADVICE_QUOTA = (
+    "⚠️ Вы исчерпали дневной лимит вопросов AI-помощнику. "
+    "Попробуйте завтра или позвоните нам — поможем лично."
+)
+# То же для распознавания голосовых сообщений
+TRANSCRIPTION_QUOTA = (
+    "⚠️ Вы исчерпали дневной лимит распознавания голосовых сообщений. "
+    "Напишите вопрос текстом или позвоните нам — поможем лично."
+)
+# Ответ, пока API недоступен (открыт предохранитель): без ожидания и с самым нужным
+LEGAL_ADVICE_UNAVAILABLE = (
+    "⚠️ AI-помощник временно недоступен, попробуйте через несколько минут.\n\n"
+    "Самое важное в первые дни:\n"
+    "• медицинское свидетельство о смерти выдаёт врач или морг;\n"
+    "• гербовое свидетельство о смерти оформляет ЗАГС или МФЦ по паспорту заявителя;\n"
+    "• для захоронения нужны свидетельство о смерти и паспорт умершего."
+)
 
 
 class OpenAIService:
-    def __init__(self):
-        # Подробный дамп переменных среды с ключевым словом PROXY
-        proxy_vars = {k: v for k, v in os.environ.items() if "PROXY" in k.upper()}
-        logging.info(f"[DEBUG] Переменные окружения, связанные с PROXY: {proxy_vars}")
+    """Клиент OpenAI, общий для всего процесса.
 
-        # Логируем, какой ключ реально используется
-        logging.info(
-            f"[DEBUG] Используется OPENAI_API_KEY: {'*' * (len(OPENAI_API_KEY) - 4) + OPENAI_API_KEY[-4:] if OPENAI_API_KEY else 'None'}")
+    Создаётся один раз при запуске и передаётся в хендлеры через middleware
+    (``openai_service``), поэтому все запросы идут через один пул
+    keep-alive соединений и не платят за TLS-рукопожатие заново.
+    Если передан ``answer_cache``, повторные вопросы юристу отвечаются из кэша,
+    а одинаковые вопросы, заданные одновременно, объединяются в один запрос.
+    Все обращения к API проходят через общую очередь ``queue`` с приоритетами
+    и ограничением темпа, а затем через ``resilience`` (срок, повторы,
+    дублирующий запрос, предохранитель). Фоновые страницы памяти идут через
+    отдельный ``memory_resilience`` с долгим сроком, без дублирования и со
+    своим предохранителем, чтобы их сбои не отключали помощника юриста.
+    Если передан ``usage``, расход
+    токенов записывается на пользователя и проверяются дневные лимиты.
+    """
 
-        # Логируем тип клиента и параметры
+    def __init__(self, api_key: str = OPENAI_API_KEY, base_url: str = OPENAI_BASE_URL,
+                 timeout: float = OPENAI_TIMEOUT, max_connections: int = OPENAI_MAX_CONNECTIONS,
+                 answer_cache: Optional[AnswerCache] = None, queue: Optional[AIJobQueue] = None,
+                 resilience: Optional[ResilientCaller] = None, usage: Optional[UsageLedger] = None,
+                 memory_resilience: Optional[ResilientCaller] = None):
+        self.answer_cache = answer_cache
+        self.usage = usage
+        self.queue = queue or AIJobQueue(
+            concurrency=AI_CONCURRENCY,
+            requests_per_minute=AI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=AI_TOKENS_PER_MINUTE,
+        )
+        self.inflight = SingleFlight()
+        self.resilience = resilience or ResilientCaller(
+            deadline=AI_DEADLINE,
+            retries=OPENAI_MAX_RETRIES,
+            base_delay=AI_RETRY_BASE_DELAY,
+            hedge_percentile=AI_HEDGE_PERCENTILE,
+            breaker=CircuitBreaker(AI_BREAKER_FAILURES, AI_BREAKER_RESET),
+        )
+        self.memory_resilience = memory_resilience or ResilientCaller(
+            deadline=AI_MEMORY_DEADLINE,
+            retries=OPENAI_MAX_RETRIES,
+            base_delay=AI_RETRY_BASE_DELAY,
+            hedge_percentile=0,
+            breaker=CircuitBreaker(AI_BREAKER_FAILURES, AI_BREAKER_RESET),
+        )
+        logging.info(
+            f"[OPENAI] Инициализация клиента, ключ: "
+            f"{'*' * (len(api_key) - 4) + api_key[-4:] if api_key else 'None'}"
+        )
+        self._http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=OPENAI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(OPENAI_MAX_KEEPALIVE, max_connections),
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self.client: Optional[AsyncOpenAI] = None
+        if not api_key:
+            # Без ключа бот работает, недоступны только функции OpenAI
+            logging.error("[OPENAI] OPENAI_API_KEY не задан — AI-функции отключены")
+            return
         try:
-            logging.info("[DEBUG] Инициализация AsyncOpenAI без параметров прокси.")
-            self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                # Повторы выполняет ResilientCaller, в пределах общего срока
+                max_retries=0,
+                http_client=self._http_client,
+            )
         except Exception as e:
-            logging.error(f"[DEBUG] Ошибка инициализации OpenAI: {e}")
+            logging.error(f"[OPENAI] Ошибка инициализации OpenAI: {e}")
             raise
 
-    async def get_legal_advice(self, question: str):
+    async def close(self):
+        """Закрытие пула соединений и запись накопленного расхода (при остановке бота)"""
+        if self.usage is not None:
+            await self.usage.close()
+        if self.answer_cache is not None:
+            await self.answer_cache.close()
+        if self.client is not None:
+            await self.client.close()
+        await self._http_client.aclose()
+
+    @property
+    def enabled(self) -> bool:
+        """Настроен ли доступ к OpenAI (задан ли ключ API)"""
+        return self.client is not None
+
+    @staticmethod
+    def _legal_messages(question: str) -> List[Dict[str, str]]:
+        system_prompt = (
+            "Ты - опытный юрист, специализирующийся на похоронном законодательстве и оформлении документов РФ.\n"
+            "Отвечай кратко, четко и по существу. Давай практические советы.\n"
+            "Если вопрос не связан с юридическими аспектами похорон, вежливо перенаправь к соответствующему специалисту."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Грубая оценка расхода токенов до запроса (для русского текста ~2 символа на токен)"""
+        return sum(len(m["content"]) for m in messages) // 2 + max_tokens
+
+    def _over_quota(self, user_id: Optional[int]) -> bool:
+        return self.usage is not None and not self.usage.allowed(user_id)
+
+    def _record_usage(self, user_id: Optional[int], feature: str, prompt_tokens: int, completion_tokens: int):
+        if self.usage is not None:
+            cost = (prompt_tokens * AI_PRICE_PROMPT_1K + completion_tokens * AI_PRICE_COMPLETION_1K) / 1000
+            self.usage.record(user_id, feature, prompt_tokens, completion_tokens, cost)
+
+    async def get_legal_advice(self, question: str, on_position: Optional[PositionCallback] = None,
+                               user_id: Optional[int] = None):
+        # Ответ из кэша не тратит лимит: он проверяется только перед
+        # запросом к API, до очереди и до объединения с чужим запросом
+        if self.answer_cache is not None:
+            cached = await self.answer_cache.get(question)
+            if cached is not None:
+                return cached
+        if self._over_quota(user_id):
+            return LEGAL_ADVICE_QUOTA
+        # Одинаковые вопросы, заданные одновременно, — один запрос к API
+        key = ("legal", normalize_question(question))
+        return await self.inflight.do(key, lambda: self._get_legal_advice(question, on_position, user_id))
+
+    async def _get_legal_advice(self, question: str, on_position: Optional[PositionCallback] = None,
+                                user_id: Optional[int] = None):
+        if not self.enabled or self.resilience.rejecting():
+            return LEGAL_ADVICE_UNAVAILABLE
+        messages = self._legal_messages(question)
         try:
-            system_prompt = (
-                "Ты - опытный юрист, специализирующийся на похоронном законодательстве и оформлении документов РФ.\n"
-                "Отвечай кратко, четко и по существу. Давай практические советы.\n"
-                "Если вопрос не связан с юридическими аспектами похорон, вежливо перенаправь к соответствующему специалисту."
-            )
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question}
-                ],
-                max_tokens=500,
-                temperature=0.9
-            )
-            return response.choices[0].message.content.strip()
+            async with self.queue.slot("legal", self._estimate_tokens(messages, 500), on_position) as report:
+                response = await self.resilience.call(lambda: self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.9
+                ), kind="legal")
+                if response.usage is not None:
+                    report(response.usage.total_tokens)
+            answer = response.choices[0].message.content.strip()
+            if response.usage is not None:
+                self._record_usage(user_id, "legal", response.usage.prompt_tokens, response.usage.completion_tokens)
+            else:
+                self._record_usage(user_id, "legal", self._estimate_tokens(messages, 0), len(answer) // 2)
+        except CircuitOpenError:
+            return LEGAL_ADVICE_UNAVAILABLE
         except Exception as e:
             logging.error(f"[DEBUG] Ошибка OpenAI API: {e}")
-            return "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
+            return LEGAL_ADVICE_ERROR
+
+        # В кэш попадают только настоящие ответы модели, не сообщения об ошибке
+        if self.answer_cache is not None and answer:
+            await self.answer_cache.put(question, answer)
+        return answer
+
+    async def stream_legal_advice(self, question: str, on_position: Optional[PositionCallback] = None,
+                                  user_id: Optional[int] = None) -> AsyncIterator[str]:
+        """То же, что ``get_legal_advice``, но ответ отдаётся кусками по мере генерации.
+
+        Ответ из кэша отдаётся одним куском. Полный ответ сохраняется в кэш,
+        только если поток завершился без ошибок. Одновременные одинаковые
+        вопросы читают один общий поток. ``on_position`` получает место
+        в очереди к API, пока запрос ждёт (только у первого из одинаковых).
+        """
+        if self.answer_cache is not None:
+            cached = await self.answer_cache.get(question)
+            if cached is not None:
+                yield cached
+                return
+        if self._over_quota(user_id):
+            yield LEGAL_ADVICE_QUOTA
+            return
+        key = ("legal-stream", normalize_question(question))
+        async for chunk in self.inflight.stream(
+                key, lambda: self._stream_legal_advice(question, on_position, user_id)):
+            yield chunk
+
+    async def _stream_legal_advice(self, question: str, on_position: Optional[PositionCallback] = None,
+                                   user_id: Optional[int] = None) -> AsyncIterator[str]:
+        if not self.enabled or self.resilience.rejecting():
+            yield LEGAL_ADVICE_UNAVAILABLE
+            return
+
+        parts = []
+        messages = self._legal_messages(question)
+        started = False
+        stream = None
+        try:
+            # Слот очереди занят до конца потока. Если поток долго не
+            # открывается, открывается дублирующий и берётся первый; лишний
+            # закрывается. Срок AI_DEADLINE действует на весь ответ
+            async with self.queue.slot("legal", self._estimate_tokens(messages, 500), on_position):
+                opened_at = time.monotonic()
+                stream = await self.resilience.call(lambda: self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.9,
+                    stream=True
+                ), kind="legal-stream", discard=lambda extra: extra.close())
+                started = True
+                async for chunk in self.resilience.within_deadline(stream, opened_at):
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        # Начальные пробелы ответа не показываем, как и в get_legal_advice
+                        if not parts:
+                            delta = delta.lstrip()
+                            if not delta:
+                                continue
+                        parts.append(delta)
+                        yield delta
+        except CircuitOpenError:
+            yield LEGAL_ADVICE_UNAVAILABLE
+            return
+        except Exception as e:
+            logging.error(f"[DEBUG] Ошибка OpenAI API (поток): {e!r}")
+            yield LEGAL_ADVICE_ERROR if not parts else "\n\n⚠️ Ответ прерван, попробуйте спросить ещё раз."
+            return
+        finally:
+            if stream is not None:
+                await stream.close()
+            # Поток не сообщает usage — расход оценивается по длине текста
+            if started:
+                self._record_usage(user_id, "legal", self._estimate_tokens(messages, 0), len("".join(parts)) // 2)
+
+        answer = "".join(parts).strip()
+        if self.answer_cache is not None and answer:
+            await self.answer_cache.put(question, answer)
+
+    @staticmethod
+    def _memory_messages(name: str, birth_date: str, death_date: str, memory_text: str) -> List[Dict[str, str]]:
+        system_prompt = (
+            "Ты помогаешь близким написать текст для страницы памяти об умершем человеке.\n"
+            "Бережно отредактируй текст родственников: сохрани все факты, исправь ошибки, "
+            "сделай его тёплым и связным. Не выдумывай событий. Ответь только текстом страницы."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"{name} ({birth_date} — {death_date})\n\n{memory_text}"},
+        ]
+
+    async def generate_memory_page_content(self, name: str, birth_date: str, death_date: str, memory_text: str,
+                                           user_id: Optional[int] = None) -> str:
+        """Текст страницы памяти; при лимите или ошибке API — исходный текст близких.
+
+        Запрос идёт с самым низким приоритетом очереди: страница готовится
+        в фоне, пользователь его не ждёт.
+        """
+        if not self.enabled or self._over_quota(user_id) or self.memory_resilience.rejecting():
+            return memory_text
+        messages = self._memory_messages(name, birth_date, death_date, memory_text)
+        try:
+            async with self.queue.slot("memory", self._estimate_tokens(messages, 800)) as report:
+                # Полный ответ на 800 токенов может идти дольше общего таймаута клиента
+                response = await self.memory_resilience.call(lambda: self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    max_tokens=800,
+                    temperature=0.7,
+                    timeout=AI_MEMORY_DEADLINE,
+                ), hedge=False, kind="memory")
+                if response.usage is not None:
+                    report(response.usage.total_tokens)
+            text = response.choices[0].message.content.strip()
+            if response.usage is not None:
+                self._record_usage(user_id, "memory", response.usage.prompt_tokens, response.usage.completion_tokens)
+            else:
+                self._record_usage(user_id, "memory", self._estimate_tokens(messages, 0), len(text) // 2)
+        except Exception as e:
+            logging.error(f"[OPENAI] Ошибка подготовки текста страницы памяти: {e}")
+            return memory_text
+        return text or memory_text
+
+    async def transcribe_voice(self, audio: BinaryIO, duration: int = 0, user_id: Optional[int] = None) -> str:
+        """Расшифровка голосового сообщения из буфера в памяти (без временных файлов).
+
+        Вызывает QuotaExceededError, если дневной лимит пользователя исчерпан,
+        и AIUnavailableError, если ключ API не задан; ошибки API
+        пробрасываются вызывающему.
+        """
+        if not self.enabled:
+            raise AIUnavailableError()
+        if self._over_quota(user_id):
+            raise QuotaExceededError(user_id)
+        audio.seek(0)
+        data = audio.read()
+        async with self.queue.slot("transcription"):
+            # Дублирующий запрос для расшифровки не нужен — он удвоил бы стоимость
+            response = await self.resilience.call(lambda: self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=("voice.ogg", data, "audio/ogg"),
+                language="ru",
+            ), hedge=False, kind="transcription")
+        if self.usage is not None:
+            self.usage.record(user_id, "transcription", cost=duration / 60 * AI_PRICE_TRANSCRIPTION_MIN)
+        return response.text.strip()
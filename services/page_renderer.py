@@ -0,0 +1,51 @@
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+
+
+class TemplateRenderer:
+    """Шаблон Jinja2, скомпилированный один раз на процесс.
+
+    Окружение создаётся с автоэкранированием HTML и кэшем байткода
+    (скомпилированный шаблон переживает перезапуск). Файл шаблона
+    перечитывается, только если изменилось время его модификации;
+    проверка — не чаще раза в ``check_interval`` секунд.
+    """
+
+    def __init__(self, templates_dir: str, name: str, bytecode_dir: Optional[str] = None,
+                 check_interval: float = 5.0):
+        self.path = os.path.join(templates_dir, name)
+        self.name = name
+        self.check_interval = check_interval
+        self.env = Environment(
+            loader=FileSystemLoader(templates_dir),
+            autoescape=select_autoescape(["html"]),
+            bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+            # Свежесть файла проверяем сами, а не stat на каждый get_template
+            auto_reload=False,
+        )
+        self._template: Optional[Template] = None
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self.loads = 0
+
+    def template(self) -> Template:
+        now = time.monotonic()
+        if self._template is not None and now - self._checked < self.check_interval:
+            return self._template
+        self._checked = now
+        mtime = os.stat(self.path).st_mtime
+        if self._template is None or mtime != self._mtime:
+            if self._template is not None:
+                logging.info(f"[TEMPLATE] Шаблон {self.name} изменён, перечитываем")
+            # Загрузчик сверяет исходник с кэшем байткода: компиляция — только для нового текста
+            self._template = self.env.loader.load(self.env, self.name)
+            self._mtime = mtime
+            self.loads += 1
+        return self._template
+
+    def render(self, **context: Any) -> str:
+        return self.template().render(**context)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+# Предел длины текста сообщения в Telegram
+MESSAGE_LIMIT = 4096
+CURSOR = " ▌"
+
+
+class ProgressiveMessage:
+    """Постепенное обновление сообщения по мере поступления текста.
+
+    Куски копятся в буфере, а ``edit_text`` вызывается не чаще одного раза
+    в ``min_interval`` секунд: всё, что пришло между правками, попадает
+    в следующую. Правка без изменения текста не отправляется. Если
+    Telegram ответил RetryAfter, промежуточные правки пропускаются до
+    конца паузы, а итоговая в ``finish`` дожидается её.
+    """
+
+    def __init__(self, message: Message, header: str = "", min_interval: float = 1.0):
+        self.message = message
+        self.header = header
+        self.min_interval = min_interval
+        self.text = ""
+        self.edits = 0
+        self.first_edit_at: Optional[float] = None
+        self._shown: Optional[str] = None
+        self._next_edit = 0.0
+
+    def _render(self, text: str, footer: str = "") -> str:
+        room = MESSAGE_LIMIT - len(self.header) - len(footer)
+        if len(text) > room:
+            text = text[:room - 1]
+            # Не разрезаем HTML-сущность вроде &amp;
+            amp = text.rfind("&", -8)
+            if amp != -1 and ";" not in text[amp:]:
+                text = text[:amp]
+            text += "…"
+        return f"{self.header}{text}{footer}"
+
+    async def _edit(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None, wait: bool = False) -> bool:
+        if text == self._shown and reply_markup is None:
+            return False
+        while True:
+            delay = self._next_edit - time.monotonic()
+            if delay > 0:
+                if not wait:
+                    return False
+                await asyncio.sleep(delay)
+            try:
+                await self.message.edit_text(text, reply_markup=reply_markup)
+            except TelegramRetryAfter as e:
+                self._next_edit = time.monotonic() + e.retry_after
+                continue
+            except TelegramBadRequest as e:
+                # Текст совпал с уже показанным — правка не нужна
+                if "message is not modified" not in str(e):
+                    raise
+            self._shown = text
+            self._next_edit = time.monotonic() + self.min_interval
+            self.edits += 1
+            if self.first_edit_at is None:
+                self.first_edit_at = time.monotonic()
+            return True
+
+    async def feed(self, chunk: str):
+        """Добавление куска текста; сообщение обновляется, если пора"""
+        self.text += chunk
+        if self.text.strip() and time.monotonic() >= self._next_edit:
+            await self._edit(self._render(self.text, CURSOR))
+
+    async def finish(self, footer: str = "", reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Итоговая правка с полным текстом (и клавиатурой)"""
+        await self._edit(self._render(self.text, footer), reply_markup=reply_markup, wait=True)
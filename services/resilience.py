@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set
+
+import openai
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: API недавно много раз подряд не отвечал"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Имеет ли смысл повторять запрос: 429, 5xx, таймаут или обрыв соединения"""
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Пауза из заголовка Retry-After ответа 429, если API её прислал"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Предохранитель: после ``failure_threshold`` сбоев подряд запросы
+    сразу отклоняются ``reset_timeout`` секунд, затем один пробный запрос
+    решает, закрыть предохранитель или снова открыть.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe:
+            # Пропускаем ровно один пробный запрос
+            self._probe = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probe or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logging.warning("[AI] Предохранитель открыт: API не отвечает, включены запасные ответы")
+            self.opened_at = time.monotonic()
+        self._probe = False
+
+
+class LatencyWindow:
+    """Задержки последних ``size`` запросов для расчёта перцентилей"""
+
+    def __init__(self, size: int = 500):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class ResilientCaller:
+    """Обёртка над запросами к API: срок, повторы, дублирующий запрос, предохранитель.
+
+    - весь вызов (с повторами) укладывается в ``deadline`` секунд;
+    - на 429/5xx/таймаут выполняется до ``retries`` повторов с паузой
+      «полный джиттер» (случайная от 0 до ``base_delay * 2**попытка``)
+      либо по Retry-After;
+    - если ответа нет дольше p``hedge_percentile`` обычной задержки
+      запросов того же вида (``kind``), отправляется второй такой же
+      запрос, и берётся первый ответ;
+    - при открытом предохранителе вызов сразу завершается CircuitOpenError.
+
+    Результат проигравшего дублирующего запроса передаётся в ``discard``
+    (например, чтобы закрыть лишний открытый поток).
+    """
+
+    def __init__(self, deadline: float = 30, retries: int = 2, base_delay: float = 0.5,
+                 hedge_percentile: float = 95, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.deadline = deadline
+        self.retries = retries
+        self.base_delay = base_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        # Задержка одного ответа API по видам запросов (для порога дублирования):
+        # начало потока, распознавание и полный ответ несравнимы между собой
+        self.upstream: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+        # Полное время вызова, которое видит пользователь
+        self.latency = LatencyWindow()
+        # Закрытие лишних ответов проигравших дублей (ссылки держат задачи до конца)
+        self._releasing: Set[asyncio.Task] = set()
+        self.counters: Dict[str, int] = {
+            'calls': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+            'timeouts': 0, 'failures': 0, 'short_circuits': 0,
+        }
+
+    def rejecting(self) -> bool:
+        """Открыт ли предохранитель (проверка до постановки запроса в очередь)"""
+        if self.breaker.state == "open":
+            self.counters['short_circuits'] += 1
+            return True
+        return False
+
+    def hedge_delay(self, kind: str = "default") -> Optional[float]:
+        window = self.upstream.get(kind)
+        if self.hedge_percentile <= 0 or window is None or len(window) < self.hedge_min_samples:
+            return None
+        return window.percentile(self.hedge_percentile)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], hedge: bool = True, kind: str = "default",
+                   discard: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Any:
+        if not self.breaker.allow():
+            self.counters['short_circuits'] += 1
+            raise CircuitOpenError("API временно недоступен")
+
+        self.counters['calls'] += 1
+        started = time.monotonic()
+        deadline = started + self.deadline
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    result = await asyncio.wait_for(self._attempt(fn, hedge, kind, discard), timeout=remaining)
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError) and time.monotonic() >= deadline:
+                        self.counters['timeouts'] += 1
+                        raise
+                    if not is_retryable(e) or attempt >= self.retries:
+                        raise
+                    attempt += 1
+                    self.counters['retries'] += 1
+                    pause = retry_after(e)
+                    if pause is None:
+                        pause = random.uniform(0, self.base_delay * 2 ** attempt)
+                    logging.warning(f"[AI] Повтор запроса {attempt}/{self.retries} через {pause:.2f} с: {e}")
+                    if time.monotonic() + pause >= deadline:
+                        self.counters['timeouts'] += 1
+                        raise
+                    await asyncio.sleep(pause)
+                    continue
+                self.breaker.record_success()
+                return result
+        except Exception as e:
+            self.counters['failures'] += 1
+            # Ошибки запроса (400, 401) значат, что API отвечает, — это не деградация
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        finally:
+            self.latency.add(time.monotonic() - started)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]], hedge: bool, kind: str,
+                       discard: Optional[Callable[[Any], Awaitable[Any]]]) -> Any:
+        delay = self.hedge_delay(kind) if hedge else None
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.counters['hedges'] += 1
+                    tasks.add(asyncio.ensure_future(fn()))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters['hedge_wins'] += 1
+                        self.upstream[kind].add(time.monotonic() - started)
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+                if discard is not None:
+                    # Запрос мог успеть завершиться — его результат больше не нужен
+                    task.add_done_callback(lambda t: self._discard(t, discard))
+
+    def _discard(self, task: asyncio.Task, discard: Callable[[Any], Awaitable[Any]]):
+        if task.cancelled() or task.exception() is not None:
+            return
+        release = asyncio.ensure_future(self._release(discard, task.result()))
+        self._releasing.add(release)
+        release.add_done_callback(self._releasing.discard)
+
+    @staticmethod
+    async def _release(discard: Callable[[Any], Awaitable[Any]], result: Any):
+        try:
+            await discard(result)
+        except Exception as e:
+            logging.warning(f"[AI] Не удалось освободить лишний ответ: {e}")
+
+    async def within_deadline(self, source: AsyncIterator[Any], started: float) -> AsyncIterator[Any]:
+        """Куски потока, пока не истёк ``deadline`` с момента ``started``.
+
+        ``call`` ограничивает только открытие потока; здесь срок действует
+        на весь ответ, по истечении поднимается asyncio.TimeoutError.
+        """
+        deadline = started + self.deadline
+        iterator = source.__aiter__()
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                self.counters['timeouts'] += 1
+                raise
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[int]:
+            return None if value is None else int(value * 1000)
+
+        return {
+            **self.counters,
+            'breaker': self.breaker.state,
+            'p50_ms': ms(self.latency.percentile(50)),
+            'p95_ms': ms(self.latency.percentile(95)),
+            'p99_ms': ms(self.latency.percentile(99)),
+            'hedge_after_ms': {kind: ms(self.hedge_delay(kind)) for kind in self.upstream},
+        }
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _Broadcast:
+    """Один поток кусков, который читают несколько получателей.
+
+    Каждый получатель видит все куски с самого начала, даже если
+    присоединился, когда поток уже шёл.
+    """
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        # Задача, читающая источник; ссылка держит её до завершения,
+        # иначе сборщик мусора может уничтожить её посреди потока
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except Exception as e:
+            logging.error(f"[SINGLE-FLIGHT] Ошибка общего потока: {e}", exc_info=True)
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def listen(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.chunks) or self.done)
+                new = self.chunks[position:]
+                finished = self.done
+            position += len(new)
+            for chunk in new:
+                yield chunk
+            if finished and position >= len(self.chunks):
+                return
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов в один.
+
+    Пока запрос с ключом ``key`` выполняется, повторные вызовы с тем же
+    ключом не делают новый запрос, а ждут результата первого. Сам запрос
+    выполняется отдельной задачей, поэтому отмена одного из ожидающих
+    (например, пользователь ушёл) не прерывает его для остальных.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """То же для потоковых ответов: все получатели читают один поток"""
+        broadcast = self._streams.get(key)
+        if broadcast is not None:
+            self.shared += 1
+        else:
+            self.leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(broadcast.pump(fn()))
+            broadcast.task.add_done_callback(lambda _: self._streams.pop(key, None))
+        async for chunk in broadcast.listen():
+            yield chunk
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._streams)
+
+    def stats(self) -> Dict[str, int]:
+        # shared — число запросов к API, которые не пришлось делать
+        return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': self.in_flight()}
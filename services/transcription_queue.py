@@ -0,0 +1,208 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from services.usage_ledger import QuotaExceededError
+
+TranscribeFn = Callable[[], Awaitable[str]]
+DoneCallback = Callable[[Optional[str], Optional[BaseException]], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Очередь расшифровки переполнена — голосовое не принято"""
+
+
+class TranscriptCache:
+    """Расшифровки голосовых по ``file_unique_id`` Telegram.
+
+    Пересланное или повторно отправленное голосовое имеет тот же
+    ``file_unique_id``, поэтому расшифровывается один раз. Все записи
+    хранятся в таблице ``voice_transcripts``, последние ``max_cached``
+    дополнительно держатся в памяти.
+    """
+
+    def __init__(self, db, max_cached: int = 1000):
+        self._db = db
+        self.max_cached = max_cached
+        self._cached: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, file_unique_id: str) -> Optional[str]:
+        transcript = self._cached.get(file_unique_id)
+        if transcript is None:
+            transcript = await self._db.get_voice_transcript(file_unique_id)
+            if transcript is None:
+                self.misses += 1
+                return None
+            self._remember(file_unique_id, transcript)
+        else:
+            self._cached.move_to_end(file_unique_id)
+        self.hits += 1
+        return transcript
+
+    async def put(self, file_unique_id: str, transcript: str):
+        self._remember(file_unique_id, transcript)
+        await self._db.save_voice_transcript(file_unique_id, transcript)
+
+    def _remember(self, file_unique_id: str, transcript: str):
+        self._cached[file_unique_id] = transcript
+        self._cached.move_to_end(file_unique_id)
+        while len(self._cached) > self.max_cached:
+            self._cached.popitem(last=False)
+
+
+class _Job:
+    __slots__ = ('key', 'waiters')
+
+    def __init__(self, key: str, waiters: List[Tuple[int, TranscribeFn, DoneCallback]]):
+        self.key = key
+        # Все, кто ждёт это голосовое: (user_id, fn, on_done); расшифровывает первый
+        self.waiters = waiters
+
+    @property
+    def user_id(self) -> int:
+        return self.waiters[0][0]
+
+
+class TranscriptionQueue:
+    """Очередь расшифровки голосовых с пулом из ``workers`` обработчиков.
+
+    Хендлер ставит задачу и сразу отвечает «в очереди», результат приходит
+    в ``on_done``. Очередь ограничена: не больше ``max_pending`` задач
+    всего и ``max_per_user`` от одного пользователя, сверх того —
+    QueueFullError. Задачи выдаются по кругу между пользователями, так что
+    пачка голосовых от одного не задерживает остальных. Одно и то же
+    голосовое (по ``file_unique_id``), уже стоящее в очереди, повторно
+    не расшифровывается. Если у владельца задачи кончился дневной лимит,
+    ошибку получает только он, а задача переходит к следующему ждущему.
+    """
+
+    def __init__(self, cache: TranscriptCache, workers: int = 2, max_pending: int = 100, max_per_user: int = 3):
+        self.cache = cache
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self._by_user: Dict[int, Deque[_Job]] = {}
+        # Пользователи с задачами в порядке обхода по кругу
+        self._turns: Deque[int] = deque()
+        self._jobs: Dict[str, _Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def position(self, user_id: int) -> int:
+        """Примерное место последней задачи пользователя с учётом обхода по кругу"""
+        mine = len(self._by_user.get(user_id, ()))
+        if not mine:
+            return 0
+        return sum(min(len(jobs), mine) for jobs in self._by_user.values())
+
+    def submit(self, user_id: int, key: str, fn: TranscribeFn, on_done: DoneCallback) -> int:
+        """Постановка голосового в очередь; возвращает место в очереди"""
+        job = self._jobs.get(key)
+        if job is not None:
+            # То же голосовое уже в работе — ответ получат оба
+            self.coalesced += 1
+            job.waiters.append((user_id, fn, on_done))
+            return self.position(job.user_id)
+
+        jobs = self._by_user.get(user_id)
+        if self.pending >= self.max_pending or (jobs is not None and len(jobs) >= self.max_per_user):
+            raise QueueFullError(user_id)
+
+        self._enqueue(_Job(key, [(user_id, fn, on_done)]))
+        return self.position(user_id)
+
+    def _enqueue(self, job: _Job):
+        self._jobs[job.key] = job
+        jobs = self._by_user.get(job.user_id)
+        if jobs is None:
+            jobs = self._by_user[job.user_id] = deque()
+            self._turns.append(job.user_id)
+        jobs.append(job)
+        self.pending += 1
+        self._ensure_workers()
+
+    def _next_job(self) -> Optional[_Job]:
+        if not self._turns:
+            return None
+        user_id = self._turns.popleft()
+        jobs = self._by_user[user_id]
+        job = jobs.popleft()
+        if jobs:
+            self._turns.append(user_id)
+        else:
+            del self._by_user[user_id]
+        self.pending -= 1
+        return job
+
+    def _ensure_workers(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < min(self.workers, self.pending):
+            self._tasks.append(asyncio.create_task(self._work(), name="transcription-worker"))
+
+    async def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self.active += 1
+            try:
+                await self._run(job)
+            finally:
+                self.active -= 1
+
+    async def _run(self, job: _Job):
+        transcript, error = None, None
+        try:
+            transcript = await job.waiters[0][1]()
+            self.completed += 1
+        except Exception as e:
+            error = e
+            self.failed += 1
+        finally:
+            self._jobs.pop(job.key, None)
+
+        if isinstance(error, QuotaExceededError) and len(job.waiters) > 1:
+            # Лимит личный: остальные ждущие получат расшифровку по своему лимиту
+            owner, rest = job.waiters[0], job.waiters[1:]
+            self._enqueue(_Job(job.key, rest))
+            await self._notify(owner[2], None, error)
+            return
+
+        if transcript:
+            try:
+                await self.cache.put(job.key, transcript)
+            except Exception as e:
+                logging.error(f"[VOICE] Не удалось сохранить расшифровку в кэш: {e}", exc_info=True)
+        for _, _, on_done in job.waiters:
+            await self._notify(on_done, transcript, error)
+
+    @staticmethod
+    async def _notify(on_done: DoneCallback, transcript: Optional[str], error: Optional[BaseException]):
+        try:
+            await on_done(transcript, error)
+        except Exception as e:
+            logging.error(f"[VOICE] Ошибка отправки расшифровки: {e}", exc_info=True)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.pending,
+            'active': self.active,
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+        }
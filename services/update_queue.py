@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from aiogram.types import Update
+
+
+def update_chat_key(update: Update) -> Hashable:
+    """Ключ упорядочивания апдейта: id чата, а если его нет — id пользователя.
+
+    Апдейты без чата и пользователя получают уникальный ключ и
+    обрабатываются без ограничений на порядок.
+    """
+    try:
+        event = update.event
+    except Exception:
+        return ("update", update.update_id)
+
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        message = getattr(event, "message", None)
+        chat = getattr(message, "chat", None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    return ("update", update.update_id)
+
+
+class UpdateWorkerPool:
+    """Пул обработчиков апдейтов с порядком внутри чата.
+
+    Апдейты разных чатов обрабатываются параллельно (не больше ``workers``
+    одновременно), апдейты одного чата — строго по очереди. Общее число
+    принятых, но ещё не обработанных апдейтов ограничено ``max_pending``:
+    при переполнении ``submit`` ждёт, пока освободится место.
+    """
+
+    def __init__(self, process: Callable[[Update], Awaitable[Any]], workers: int = 16, max_pending: int = 1000):
+        self._process = process
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        # Чат находится в _pending, пока у него есть необработанные апдейты;
+        # такой чат либо стоит в _ready, либо его обрабатывает ровно один воркер
+        self._pending: Dict[Hashable, Deque[Update]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+                for i in range(self.workers)
+            ]
+
+    async def submit(self, update: Update):
+        await self._slots.acquire()
+        self.in_flight += 1
+        key = update_chat_key(update)
+        queue = self._pending.get(key)
+        if queue is None:
+            self._pending[key] = deque([update])
+            self._ready.put_nowait(key)
+        else:
+            queue.append(update)
+
+    def depth(self, key: Optional[Hashable] = None) -> int:
+        """Число необработанных апдейтов: всего или для одного чата"""
+        if key is None:
+            return self.in_flight
+        queue = self._pending.get(key)
+        return len(queue) if queue else 0
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._pending[key]
+            update = queue[0]
+            try:
+                await self._process(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"[UPDATES] Ошибка обработки апдейта {update.update_id}: {e}", exc_info=True)
+            finally:
+                queue.popleft()
+                self.in_flight -= 1
+                self._slots.release()
+            # Следующий апдейт этого чата — в конец очереди, чтобы не обделять другие чаты
+            if queue:
+                self._ready.put_nowait(key)
+            else:
+                del self._pending[key]
+
+    async def join(self):
+        """Ожидание обработки всех принятых апдейтов"""
+        while self.in_flight:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
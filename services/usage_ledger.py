@@ -0,0 +1,137 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database.write_behind import WriteBehind
+
+# Функции бота, обращающиеся к OpenAI
+FEATURES = ("legal", "memory", "transcription")
+
+
+class QuotaExceededError(Exception):
+    """Пользователь исчерпал дневной лимит обращений к OpenAI"""
+
+
+def today() -> str:
+    return date.today().isoformat()
+
+
+class _Usage:
+    __slots__ = ('requests', 'prompt_tokens', 'completion_tokens', 'cost')
+
+    def __init__(self, requests: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0, cost: float = 0.0):
+        self.requests = requests
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cost = cost
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, requests: int, prompt_tokens: int, completion_tokens: int, cost: float):
+        self.requests += requests
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+
+
+class UsageLedger:
+    """Учёт расхода OpenAI по пользователям и функциям с дневными лимитами.
+
+    Каждый запрос к API записывается в память (``record``); накопленные
+    суммы по ключу (пользователь, день, функция) сбрасываются в таблицу
+    ``ai_usage`` одной транзакцией раз в ``flush_interval`` секунд.
+    ``allowed`` проверяет дневной лимит запросов и токенов до постановки
+    запроса в очередь. Пользователи из ``exempt`` (админы) не ограничены.
+    """
+
+    def __init__(self, db, daily_requests: int = 0, daily_tokens: int = 0,
+                 flush_interval: float = 5.0, exempt: Iterable[int] = ()):
+        self._db = db
+        self.daily_requests = daily_requests
+        self.daily_tokens = daily_tokens
+        self.flush_interval = flush_interval
+        self.exempt = set(exempt)
+        self._day = today()
+        # Расход за текущий день по пользователям — для проверки лимитов
+        self._today: Dict[int, _Usage] = {}
+        self._pending: Dict[Tuple[int, str, str], _Usage] = {}
+        self._writer = WriteBehind(self._write_pending, lambda: bool(self._pending), flush_interval, "USAGE")
+        self.rejected = 0
+
+    def _rollover(self):
+        day = today()
+        if day != self._day:
+            self._day = day
+            self._today = {}
+
+    async def load(self):
+        """Восстановление расхода за сегодня после перезапуска"""
+        self._rollover()
+        rows = await self._db.get_ai_usage_by_user(self._day)
+        self._today = {row[0]: _Usage(*row[1:]) for row in rows}
+
+    # ===== Лимиты и учёт =====
+
+    def allowed(self, telegram_id: Optional[int]) -> bool:
+        """Можно ли пользователю сделать ещё один запрос сегодня"""
+        if telegram_id is None or telegram_id in self.exempt:
+            return True
+        self._rollover()
+        usage = self._today.get(telegram_id)
+        if usage is None:
+            return True
+        if (self.daily_requests and usage.requests >= self.daily_requests) or \
+                (self.daily_tokens and usage.tokens >= self.daily_tokens):
+            self.rejected += 1
+            return False
+        return True
+
+    def record(self, telegram_id: Optional[int], feature: str,
+               prompt_tokens: int = 0, completion_tokens: int = 0, cost: float = 0.0):
+        if telegram_id is None:
+            return
+        self._rollover()
+        self._today.setdefault(telegram_id, _Usage()).add(1, prompt_tokens, completion_tokens, cost)
+        key = (telegram_id, self._day, feature)
+        self._pending.setdefault(key, _Usage()).add(1, prompt_tokens, completion_tokens, cost)
+        self._writer.schedule()
+
+    def usage_today(self, telegram_id: int) -> Dict[str, float]:
+        self._rollover()
+        usage = self._today.get(telegram_id, _Usage())
+        return {'requests': usage.requests, 'tokens': usage.tokens, 'cost': usage.cost}
+
+    # ===== Запись в базу =====
+
+    async def _write_pending(self):
+        pending, self._pending = self._pending, {}
+        rows = [
+            (telegram_id, day, feature, u.requests, u.prompt_tokens, u.completion_tokens, u.cost)
+            for (telegram_id, day, feature), u in pending.items()
+        ]
+        try:
+            await self._db.add_ai_usage(rows)
+        except Exception:
+            # Вернём несохранённые суммы, чтобы не потерять расход
+            for key, usage in pending.items():
+                self._pending.setdefault(key, _Usage()).add(
+                    usage.requests, usage.prompt_tokens, usage.completion_tokens, usage.cost
+                )
+            raise
+
+    async def flush(self):
+        await self._writer.flush()
+
+    async def close(self):
+        await self._writer.close()
+
+    # ===== Отчёт =====
+
+    async def report(self, day: Optional[str] = None, limit: int = 10) -> Dict[str, List]:
+        """Расход за день: по функциям и топ пользователей по токенам"""
+        await self.flush()
+        day = day or today()
+        by_feature = await self._db.get_ai_usage_by_feature(day)
+        top_users = await self._db.get_ai_usage_top_users(day, limit)
+        return {'day': day, 'features': by_feature, 'users': top_users}
@@ -53,3 +53,8 @@ class RemoveProduct(StatesGroup):
     """Состояния для удаления товара"""
     waiting_for_category = State()
     waiting_for_product_id = State()
+
+
+class VoiceInput(StatesGroup):
+    """Исправление расшифровки голосового сообщения"""
+    editing = State()
@@ -0,0 +1,156 @@
+"""Общие фикстуры тестов: локальный мок-сервер OpenAI API, путь к базе и база.
+
+``MockOpenAIServer`` (его используют и бенчмарки) отвечает на POST /v1/chat/completions и /v1/audio/transcriptions
+фиксированным ответом с настраиваемой задержкой и считает
+TCP-соединения, чтобы было видно, переиспользует ли клиент пул.
+При ``stream=True`` ответ отдаётся по словам (SSE) с задержкой
+``token_delay`` между кусками. В ``script`` можно заранее положить
+пары (HTTP-статус, задержка) для следующих запросов к chat/completions —
+так имитируются 429, 5xx и медленные ответы.
+"""
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+
+from database.db import Database
+
+
+class MockOpenAIServer:
+    def __init__(self, latency: float = 0.0, answer: str = "Для оформления свидетельства о смерти обратитесь в ЗАГС.",
+                 token_delay: float = 0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer = answer
+        self.requests = 0
+        # Одновременно обрабатываемые запросы (для проверки ограничений клиента)
+        self.active = 0
+        self.max_active = 0
+        self.script = []
+        self._peers = set()
+        self._runner = None
+        self.port = None
+
+    @property
+    def connections(self) -> int:
+        """Число разных TCP-соединений, с которых приходили запросы"""
+        return len(self._peers)
+
+    def _count(self, request: web.Request):
+        self.requests += 1
+        self._peers.add(request.transport.get_extra_info("peername"))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            return await self._chat_response(request)
+        finally:
+            self.active -= 1
+
+    async def _chat_response(self, request: web.Request) -> web.Response:
+        self._count(request)
+        body = await request.json()
+        status, delay = self.script.pop(0) if self.script else (200, self.latency)
+        if delay:
+            await asyncio.sleep(delay)
+        if status != 200:
+            headers = {"retry-after": "0"} if status == 429 else None
+            return web.json_response(
+                {"error": {"message": f"mock error {status}", "type": "server_error"}},
+                status=status, headers=headers,
+            )
+        if body.get("stream"):
+            return await self._chat_stream(request, body)
+        if self.token_delay:
+            # Без потока клиент ждёт, пока «сгенерируется» весь ответ
+            await asyncio.sleep(self.token_delay * (len(self.answer.split(" ")) - 1))
+        return web.json_response({
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 30, "total_tokens": 80},
+        })
+
+    async def _chat_stream(self, request: web.Request, body: dict) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await self._write_stream(request, response, body)
+        except ConnectionResetError:
+            # Клиент закрыл поток (лишний дублирующий или прерванный ответ)
+            pass
+        return response
+
+    async def _write_stream(self, request: web.Request, response: web.StreamResponse, body: dict):
+        await response.prepare(request)
+        words = self.answer.split(" ")
+        for i, word in enumerate(words):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            chunk = {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None,
+                }],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+
+    async def _transcription(self, request: web.Request) -> web.Response:
+        self._count(request)
+        await request.read()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"text": "Как оформить свидетельство о смерти"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/audio/transcriptions", self._transcription)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+def openai_server():
+    """Запуск мок-сервера внутри сценария теста: ``server = await openai_server(answer=...)``"""
+    async def start(**kwargs) -> MockOpenAIServer:
+        return await MockOpenAIServer(**kwargs).start()
+    return start
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def db(db_path):
+    database = Database(db_path, readers=1)
+    yield database
+    database._shutdown()
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from services.ai_queue import AIJobQueue, TokenBucket
+from services.openai_service import OpenAIService
+
+
+def test_concurrency_cap_and_priority_order():
+    async def scenario():
+        queue = AIJobQueue(concurrency=1)
+        order = []
+
+        async def job(kind, name):
+            async with queue.slot(kind):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.create_task(job("memory", "memory-1"))
+        await asyncio.sleep(0)
+        # Пока выполняется первый запрос, в очередь встают фоновые и интерактивные
+        others = [
+            asyncio.create_task(job("memory", "memory-2")),
+            asyncio.create_task(job("transcription", "voice")),
+            asyncio.create_task(job("legal", "legal-1")),
+            asyncio.create_task(job("legal", "legal-2")),
+        ]
+        await asyncio.gather(first, *others)
+        return order, queue.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["memory-1", "legal-1", "legal-2", "voice", "memory-2"]
+    assert stats['active'] == 0 and stats['waiting'] == 0
+    assert stats['completed'] == {"legal": 2, "transcription": 1, "memory": 2}
+
+
+def test_token_bucket_paces_requests():
+    async def scenario():
+        # 600 запросов в минуту = 10 в секунду, ведро на 600 опустошим заранее
+        queue = AIJobQueue(concurrency=10, requests_per_minute=600)
+        queue.requests.consume(600)
+        started = time.monotonic()
+
+        async def job():
+            async with queue.slot("legal"):
+                pass
+
+        await asyncio.gather(*(job() for _ in range(3)))
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_token_bucket_refund_and_clamp():
+    bucket = TokenBucket(per_minute=1000)
+    bucket.consume(800)
+    assert bucket.delay(500) > 0
+    bucket.refund(600)
+    assert bucket.delay(500) == 0
+    # Запрос больше ёмкости ведра ждёт полного ведра, а не вечно
+    assert bucket.delay(10 ** 6) <= 60
+
+
+def test_position_feedback_and_cancellation():
+    async def scenario():
+        queue = AIJobQueue(concurrency=1, position_interval=0)
+        release = asyncio.Event()
+        positions = []
+
+        async def blocker():
+            async with queue.slot("legal"):
+                await release.wait()
+
+        async def report(position):
+            positions.append(position)
+
+        async def waiter(on_position=None):
+            async with queue.slot("legal", on_position=on_position):
+                pass
+
+        running = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(waiter())
+        tracked = asyncio.create_task(waiter(report))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(running, tracked)
+        return positions, queue.stats()
+
+    positions, stats = asyncio.run(scenario())
+    assert positions == [2, 1]
+    assert stats['active'] == 0 and stats['waiting'] == 0
+
+
+def test_service_respects_concurrency_against_fake_api(openai_server):
+    async def scenario():
+        server = await openai_server(latency=0.03)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url, queue=AIJobQueue(concurrency=2))
+        answers = await asyncio.gather(*(service.get_legal_advice(f"Вопрос номер {i}") for i in range(8)))
+
+        async def stream(i):
+            return "".join([c async for c in service.stream_legal_advice(f"Другой вопрос {i}")])
+
+        streamed = await asyncio.gather(*(stream(i) for i in range(4)))
+        await service.close()
+        await server.stop()
+        return answers, streamed, server
+
+    answers, streamed, server = asyncio.run(scenario())
+    assert len(set(answers)) == 1 and answers == [server.answer] * 8
+    assert streamed == [server.answer] * 4
+    assert server.requests == 12
+    assert server.max_active == 2
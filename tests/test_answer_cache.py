@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from database.db import Database
+from services.answer_cache import AnswerCache, normalize_question
+from services.openai_service import OpenAIService
+
+
+def test_normalize_question():
+    assert normalize_question("  Как оформить СВИДЕТЕЛЬСТВО о смерти?!  ") == "как оформить свидетельство о смерти"
+    assert normalize_question("Ещё вопрос") == "еще вопрос"
+
+
+def test_exact_and_near_duplicate_hits(db):
+    async def scenario():
+        cache = AnswerCache(db)
+        await cache.put("Как оформить свидетельство о смерти?", "В ЗАГСе")
+        results = [
+            await cache.get("как оформить свидетельство о смерти"),
+            await cache.get("как оформить свидетельсво о смерти"),
+            await cache.get("Какие документы нужны для кремации?"),
+        ]
+        return results, cache.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == ["В ЗАГСе", "В ЗАГСе", None]
+    assert stats['hits'] == 1 and stats['near_hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_ratio'] == pytest.approx(2 / 3)
+
+
+def test_ttl_lru_and_persistence(db_path):
+    async def first_run():
+        db = Database(db_path, readers=1)
+        cache = AnswerCache(db, max_entries=2)
+        await cache.put("Документы для кремации", "Справка о смерти")
+        await cache.put("Как получить пособие на погребение", "В СФР")
+        await cache.get("Документы для кремации")
+        # Самый давно использованный вопрос вытесняется
+        await cache.put("Где взять справку о смерти", "У врача")
+        await cache.close()
+        await db.close()
+
+    async def second_run():
+        db = Database(db_path, readers=1)
+        cache = AnswerCache(db, max_entries=2)
+        loaded = await cache.load()
+        results = [
+            await cache.get("Документы для кремации"),
+            await cache.get("Как получить пособие на погребение"),
+        ]
+        expiring = AnswerCache(db, ttl=0.05)
+        await expiring.load()
+        await asyncio.sleep(0.1)
+        stale = await expiring.get("Где взять справку о смерти")
+        await db.close()
+        return loaded, results, stale
+
+    asyncio.run(first_run())
+    loaded, results, stale = asyncio.run(second_run())
+    assert loaded == 2
+    assert results == ["Справка о смерти", None]
+    assert stale is None
+
+
+def test_admin_invalidation(db):
+    async def scenario():
+        cache = AnswerCache(db)
+        await cache.put("Документы для кремации", "Справка о смерти")
+        await cache.put("Как получить пособие на погребение", "В СФР")
+        removed_one = await cache.invalidate("документы для кремации?")
+        removed_all = await cache.invalidate()
+        reloaded = await AnswerCache(db).load()
+        return removed_one, removed_all, reloaded
+
+    assert asyncio.run(scenario()) == (1, 1, 0)
+
+
+def test_openai_service_uses_cache(openai_server, db):
+    async def scenario():
+        server = await openai_server(answer="Ответ юриста")
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url, answer_cache=AnswerCache(db))
+        answers = [await service.get_legal_advice("Как оформить свидетельство о смерти?") for _ in range(3)]
+        await service.close()
+        await server.stop()
+        return answers, server.requests
+
+    answers, requests = asyncio.run(scenario())
+    assert answers == ["Ответ юриста"] * 3
+    assert requests == 1
+
+
+def test_hits_are_written_behind_in_one_batch(db):
+    async def scenario():
+        cache = AnswerCache(db, flush_interval=60)
+        await cache.put("Документы для кремации", "Справка о смерти")
+        for _ in range(3):
+            await cache.get("Документы для кремации")
+        before = await db._fetchone("SELECT hits FROM ai_answer_cache")
+        await cache.close()
+        after = await db._fetchone("SELECT hits FROM ai_answer_cache")
+        return before[0], after[0]
+
+    assert asyncio.run(scenario()) == (0, 3)
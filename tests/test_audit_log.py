@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from database.audit_log import AuditLogWriter
+from database.db import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"), readers=1)
+    yield database
+    database._shutdown()
+
+
+def count(db, table):
+    return db._readers.submit(db._run_read, lambda conn: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]).result()
+
+
+def test_logs_are_flushed_in_batches(db):
+    async def scenario():
+        writer = AuditLogWriter(db, batch_size=50, flush_interval=0.05)
+        db._audit = writer
+        writer.start()
+        for i in range(120):
+            await db.log_chat_message(i, "text", "привет", "test", True)
+            await db.log_request(i, "ai_lawyer", "вопрос")
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert count(db, "chat_logs") == 120
+    assert count(db, "request_logs") == 120
+    assert writer.flushed_rows == 240
+    assert writer.flushed_batches <= 240 // 50 + 1
+
+
+def test_pending_rows_are_flushed_on_close(tmp_path):
+    db = Database(str(tmp_path / "test.db"), readers=1)
+
+    async def scenario():
+        await db.start_audit_log()
+        db._audit.flush_interval = 60
+        await db.log_request(1, "ai_lawyer", "вопрос", "ответ")
+        await db.close()
+
+    asyncio.run(scenario())
+    db = Database(str(tmp_path / "test.db"), readers=1)
+    assert count(db, "request_logs") == 1
+    db._shutdown()
+
+
+def test_full_queue_applies_backpressure(db):
+    async def scenario():
+        writer = AuditLogWriter(db, batch_size=10, flush_interval=0.01, queue_size=2)
+        await writer.put("chat_logs", (1, "text", "a", "test", True))
+        await writer.put("chat_logs", (1, "text", "b", "test", True))
+        blocked = asyncio.create_task(writer.put("chat_logs", (1, "text", "c", "test", True)))
+        await asyncio.sleep(0.05)
+        was_blocked = not blocked.done()
+        writer.start()
+        await asyncio.wait_for(blocked, 1)
+        await writer.stop()
+        return was_blocked
+
+    assert asyncio.run(scenario()) is True
+    assert count(db, "chat_logs") == 3
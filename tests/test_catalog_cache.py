@@ -0,0 +1,40 @@
+import asyncio
+
+
+def test_catalog_is_served_from_memory(db):
+    async def scenario():
+        await db.get_categories()
+        for _ in range(10):
+            await db.get_products_by_category("coffin")
+            await db.get_product(1)
+        return db.catalog.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["misses"] == 1
+    assert stats["hits"] == 20
+
+
+def test_admin_writes_invalidate_catalog(db):
+    async def scenario():
+        before = await db.get_products_by_category("urn")
+        await db.add_product("Урна", 5000, category="urn")
+        added = await db.get_products_by_category("urn")
+        categories = await db.get_categories()
+        await db.delete_product(added[0]["id"])
+        after = await db.get_products_by_category("urn")
+        return before, added, categories, after, db.catalog.version
+
+    before, added, categories, after, version = asyncio.run(scenario())
+    assert before == []
+    assert [p["name"] for p in added] == ["Урна"]
+    assert "urn" in categories
+    assert after == []
+    assert version == 2
+
+
+def test_concurrent_misses_load_catalog_once(db):
+    async def scenario():
+        await asyncio.gather(*(db.get_products_by_category("wreath") for _ in range(20)))
+        return db.catalog.misses
+
+    assert asyncio.run(scenario()) == 1
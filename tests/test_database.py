@@ -0,0 +1,130 @@
+import asyncio
+import threading
+
+import pytest
+
+from database.db import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"), readers=2)
+    yield database
+    database._shutdown()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_queries_run_off_the_event_loop_thread(db):
+    async def scenario():
+        loop_thread = threading.get_ident()
+        thread_ids = await db._read(lambda conn: threading.get_ident())
+        return loop_thread, thread_ids
+
+    loop_thread, worker_thread = run(scenario())
+    assert loop_thread != worker_thread
+
+
+def test_connections_are_reused(db):
+    async def scenario():
+        first = await db._write(lambda conn: id(conn))
+        second = await db._write(lambda conn: id(conn))
+        return first, second
+
+    first, second = run(scenario())
+    assert first == second
+
+
+def test_products_are_seeded(db):
+    products = run(db.get_products_by_category("coffin"))
+    assert len(products) == 4
+    assert "coffin" in run(db.get_categories())
+
+
+def test_memory_record_and_candle(db):
+    async def scenario():
+        record_id = await db.create_memory_record(1, "Иванов", "01.01.1950", "01.01.2020", "Текст", None, "")
+        first = await db.add_candle(record_id, 2)
+        second = await db.add_candle(record_id, 2)
+        records = await db.get_memory_records(1)
+        return first, second, records
+
+    first, second, records = run(scenario())
+    assert first is True
+    assert second is False
+    assert records[0]["candles_count"] == 1
+
+
+def test_client_roundtrip(db):
+    async def scenario():
+        await db.save_client_data(5, full_name="Петров Пётр", phone="+79990000000")
+        await db.verify_client(5)
+        return await db.get_client_data(5), await db.is_client_registered(6)
+
+    client, other = run(scenario())
+    assert client["full_name"] == "Петров Пётр"
+    assert client["is_verified"] is True
+    assert other is False
+
+
+def test_concurrent_candles_are_counted_once(db):
+    async def scenario():
+        record_id = await db.create_memory_record(1, "Иванов", "01.01.1950", "01.01.2020", "Текст", None, "")
+        results = await asyncio.gather(*(db.add_candle(record_id, 2) for _ in range(20)))
+        await db.add_candle(record_id, 3)
+        return results, await db.get_memory_records()
+
+    results, records = run(scenario())
+    assert results.count(True) == 1
+    assert records[0]["candles_count"] == 2
+
+
+def test_memory_listing_does_not_touch_candles(db):
+    plan = db._readers.submit(db._run_read, lambda conn: conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM memory_records WHERE telegram_id = ? ORDER BY id", (1,)
+    ).fetchall()).result()
+    assert "memory_candles" not in " ".join(row[-1] for row in plan)
+
+
+def test_memory_records_keyset_pagination(db):
+    async def scenario():
+        ids = []
+        for i in range(5):
+            owner = 1 if i % 2 == 0 else 2
+            ids.append(await db.create_memory_record(owner, f"Запись {i}", "", "", "Текст", None, ""))
+        first = await db.get_memory_records_page(limit=2)
+        after = await db.get_memory_records_page(after_id=first[-1]["id"], limit=2)
+        before = await db.get_memory_records_page(before_id=ids[4], limit=2)
+        mine = await db.get_memory_records_page(1, after_id=ids[0], limit=10)
+        last_mine = await db.get_last_memory_record(1)
+        counts = await db.count_memory_records(), await db.count_memory_records(2)
+        return ids, first, after, before, mine, last_mine, counts
+
+    ids, first, after, before, mine, last_mine, counts = run(scenario())
+    assert [r["id"] for r in first] == ids[:2]
+    assert [r["id"] for r in after] == ids[2:4]
+    assert [r["id"] for r in before] == ids[2:4]
+    assert [r["id"] for r in mine] == [ids[2], ids[4]]
+    assert last_mine["id"] == ids[4]
+    assert counts == (5, 2)
+
+
+def test_point_lookups(db):
+    async def scenario():
+        record_id = await db.create_memory_record(1, "Иванов", "", "", "Текст", None, "")
+        return (
+            await db.get_product(3),
+            await db.get_product(999),
+            await db.get_products([5, 999, 1]),
+            await db.get_memory_record(record_id),
+            await db.get_memory_record(record_id + 1),
+        )
+
+    product, missing, batch, record, missing_record = run(scenario())
+    assert product["id"] == 3
+    assert missing is None
+    assert [p["id"] for p in batch] == [5, 1]
+    assert record["name"] == "Иванов"
+    assert missing_record is None
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from services.faq_index import FAQIndex, tokenize
+
+ENTRIES = [
+    {
+        "question": "Как оформить свидетельство о смерти?",
+        "alternatives": ["Где получить свидетельство о смерти"],
+        "answer": "В ЗАГСе или МФЦ.",
+    },
+    {
+        "question": "Какие документы нужны для кремации?",
+        "alternatives": ["Как оформить кремацию"],
+        "answer": "Свидетельство о смерти и паспорт.",
+    },
+    {
+        "question": "Как получить пособие на погребение?",
+        "alternatives": ["Пособие на похороны"],
+        "answer": "В СФР в течение 6 месяцев.",
+    },
+]
+
+
+@pytest.fixture
+def faq_path(tmp_path):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps(ENTRIES, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def test_tokenize_drops_stop_words_and_stems():
+    assert tokenize("Какие документы нужны для кремации?") == ["докум", "крема"]
+    assert tokenize("Где взять свидетельство о смерти") == tokenize("Свидетельства о смерти")
+
+
+def test_confident_matches_and_rejections(faq_path):
+    faq = FAQIndex(str(faq_path))
+    assert faq.match("где взять свидетельство о смерти?").answer == "В ЗАГСе или МФЦ."
+    assert faq.match("Документы для кремации").answer == "Свидетельство о смерти и паспорт."
+    assert faq.match("как получить пособие на похороны").answer == "В СФР в течение 6 месяцев."
+    # Лишние значимые слова или слишком общий вопрос — в GPT-4
+    assert faq.match("документы для кремации собаки") is None
+    assert faq.match("пособие") is None
+    assert faq.match("сколько стоит гроб") is None
+    assert faq.stats() == {'answers': 3, 'lookups': 6, 'answered': 3, 'share': 0.5}
+
+
+def test_reloads_when_file_changes(faq_path):
+    faq = FAQIndex(str(faq_path), check_interval=0)
+    assert faq.match("Сколько хранится тело в морге?") is None
+
+    entries = ENTRIES + [{"question": "Сколько хранится тело в морге?", "answer": "Несколько дней."}]
+    faq_path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    stat = os.stat(faq_path)
+    os.utime(faq_path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert faq.match("Сколько хранится тело в морге?").answer == "Несколько дней."
+
+
+def test_broken_file_keeps_previous_index(faq_path):
+    faq = FAQIndex(str(faq_path), check_interval=0)
+    faq_path.write_text("{не json", encoding="utf-8")
+    stat = os.stat(faq_path)
+    os.utime(faq_path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert faq.match("Как оформить кремацию?").answer == "Свидетельство о смерти и паспорт."
+
+
+@pytest.mark.parametrize("broken", [
+    ENTRIES + [{"question": "Сколько хранится тело в морге?"}],
+    ENTRIES + [{"question": "Сколько хранится тело в морге?", "answer": "Несколько дней.", "alternatives": "морг"}],
+    ENTRIES + ["Сколько хранится тело в морге?"],
+    {"entries": ENTRIES},
+])
+def test_invalid_entries_keep_previous_index(faq_path, broken):
+    faq = FAQIndex(str(faq_path), check_interval=0)
+    faq_path.write_text(json.dumps(broken, ensure_ascii=False), encoding="utf-8")
+    stat = os.stat(faq_path)
+    os.utime(faq_path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert faq.reload() is False
+    assert faq.match("Как оформить кремацию?").answer == "Свидетельство о смерти и паспорт."
+    assert faq.stats()['answers'] == 3
+
+
+def test_shipped_faq_loads():
+    faq = FAQIndex(os.path.join(os.path.dirname(__file__), "..", "data", "faq.json"))
+    assert faq.stats()['answers'] >= 10
+    assert faq.match("Как оформить свидетельство о смерти?") is not None
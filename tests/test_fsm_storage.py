@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+from database.db import Database
+from database.fsm_storage import SQLiteStorage
+from states.states import MemoryRecord
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def test_state_survives_restart(db_path):
+    async def first_run():
+        db = Database(db_path, readers=1)
+        storage = SQLiteStorage(db, flush_interval=60)
+        await storage.set_state(KEY, MemoryRecord.waiting_for_name)
+        await storage.update_data(KEY, {"photo_path": "memory_photos/1.jpg"})
+        await storage.close()
+        await db.close()
+
+    async def second_run():
+        db = Database(db_path, readers=1)
+        storage = SQLiteStorage(db)
+        result = await storage.get_state(KEY), await storage.get_data(KEY)
+        await storage.close()
+        await db.close()
+        return result
+
+    asyncio.run(first_run())
+    state, data = asyncio.run(second_run())
+    assert state == MemoryRecord.waiting_for_name.state
+    assert data == {"photo_path": "memory_photos/1.jpg"}
+
+
+def test_writes_are_coalesced(db):
+    async def scenario():
+        storage = SQLiteStorage(db, flush_interval=60)
+        for i in range(50):
+            await storage.update_data(KEY, {"step": i})
+        statements = []
+        db._writer.submit(lambda: db._conn().set_trace_callback(statements.append)).result()
+        await storage.flush()
+        await storage.close()
+        return statements
+
+    statements = asyncio.run(scenario())
+    assert sum("INSERT INTO fsm_states" in s for s in statements) == 1
+
+
+def test_idle_states_expire(db):
+    async def scenario():
+        storage = SQLiteStorage(db, ttl=10, flush_interval=60)
+        await storage.set_state(KEY, MemoryRecord.waiting_for_photo)
+        storage._cache[storage._key(KEY)].touched = time.time() - 60
+        await storage.flush()
+        expired_state = await storage.get_state(KEY)
+
+        other = StorageKey(bot_id=1, chat_id=20, user_id=20)
+        await storage.set_state(other, MemoryRecord.waiting_for_photo)
+        await storage.flush()
+        await db._execute("UPDATE fsm_states SET updated_at = 0")
+        removed = await storage.evict_expired()
+        await storage.close()
+        return expired_state, removed
+
+    expired_state, removed = asyncio.run(scenario())
+    assert expired_state is None
+    assert removed == 1
+
+
+def test_cache_is_bounded(db):
+    async def scenario():
+        storage = SQLiteStorage(db, max_cached=5, flush_interval=60)
+        for user_id in range(20):
+            await storage.set_state(StorageKey(bot_id=1, chat_id=user_id, user_id=user_id), "s")
+        cached = len(storage._cache)
+        await storage.flush()
+        state = await storage.get_state(StorageKey(bot_id=1, chat_id=0, user_id=0))
+        await storage.close()
+        return cached, state
+
+    cached, state = asyncio.run(scenario())
+    assert cached == 5
+    assert state == "s"
@@ -0,0 +1,59 @@
+import asyncio
+
+from handlers.memory import add_candle, navigate_memory_records
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text, reply_markup=None):
+        self.edits.append((text, reply_markup))
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeCallback:
+    def __init__(self, data, user_id=1):
+        self.data = data
+        self.from_user = FakeUser(user_id)
+        self.message = FakeMessage()
+        self.alerts = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.alerts.append(text)
+
+
+def buttons(markup):
+    return [btn.callback_data for row in markup.inline_keyboard for btn in row]
+
+
+def test_legacy_nav_button_reopens_listing(db):
+    async def scenario():
+        for i in range(3):
+            await db.create_memory_record(1, f"Запись {i}", "", "", "Текст", None, "")
+        callback = FakeCallback("memory:nav:2")
+        await navigate_memory_records(callback, db)
+        return callback
+
+    callback = asyncio.run(scenario())
+    text, markup = callback.message.edits[-1]
+    assert "Запись 0" in text
+    assert "memory:nav:all:next:1:1:3" in buttons(markup)
+
+
+def test_candle_keeps_navigation_buttons(db):
+    async def scenario():
+        ids = [await db.create_memory_record(1, f"Запись {i}", "", "", "Текст", None, "") for i in range(3)]
+        callback = FakeCallback(f"memory:candle:{ids[1]}:all:2:3", user_id=7)
+        await add_candle(callback, db)
+        return ids, callback
+
+    ids, callback = asyncio.run(scenario())
+    _, markup = callback.message.edits[-1]
+    data = buttons(markup)
+    assert f"memory:nav:all:next:{ids[1]}:2:3" in data
+    assert not any(item.startswith("memory:candle:") for item in data)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import services.memory_service
+from services.memory_pages import MemoryPageQueue
+from services.openai_service import OpenAIService
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_document(self, chat_id, document, caption=None, reply_markup=None):
+        self.sent.append((chat_id, document.path, caption))
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append((chat_id, None, text))
+
+
+@pytest.fixture
+def pages_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(services.memory_service, "MEMORY_PAGES_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_page_is_built_in_background_and_path_saved(pages_dir, openai_server, db):
+    async def scenario():
+        server = await openai_server(answer="Светлая память о любящем отце")
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+        bot = FakeBot()
+        queue = MemoryPageQueue(db, service, retry_delay=0)
+        await queue.start(bot)
+        record_id = await db.create_memory_record(5, "Иванов <Иван>", "1940", "2024", "Был хорошим отцом", None, "")
+        await queue.submit(record_id, 5)
+        pending = queue.pending()
+        await asyncio.gather(*queue._tasks)
+
+        record = await db.get_memory_record(record_id)
+        jobs = await db.get_memory_page_jobs()
+        await service.close()
+        await server.stop()
+        return pending, record, jobs, bot.sent
+
+    pending, record, jobs, sent = asyncio.run(scenario())
+    assert pending == 1
+    assert jobs == []
+    assert record['html_path'].startswith(str(pages_dir))
+    with open(record['html_path'], encoding="utf-8") as f:
+        html = f.read()
+    assert "Светлая память о любящем отце" in html and "Иванов &lt;Иван&gt;" in html
+    assert sent == [(5, record['html_path'], "🕯️ Страница памяти «Иванов &lt;Иван&gt;» готова.")]
+
+
+def test_pending_jobs_resume_after_restart(pages_dir, openai_server, db):
+    async def scenario():
+        server = await openai_server(answer="Текст страницы")
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+        # Запись и задача сохраняются вместе; бот остановился, не успев запустить задачу
+        record_id = await db.create_memory_record_with_page_job(5, 5, "Петров", "1950", "2024", "Был добрым", None)
+        assert await db.get_memory_page_jobs() == [(record_id, 5, 0)]
+
+        bot = FakeBot()
+        queue = MemoryPageQueue(db, service, retry_delay=0)
+        await queue.start(bot)
+        await asyncio.gather(*queue._tasks)
+        record = await db.get_memory_record(record_id)
+        jobs = await db.get_memory_page_jobs()
+        await service.close()
+        await server.stop()
+        return record, jobs, bot.sent
+
+    record, jobs, sent = asyncio.run(scenario())
+    assert record['html_path'] and jobs == []
+    assert len(sent) == 1
+
+
+def test_failed_job_is_retried_then_dropped(pages_dir, monkeypatch, db):
+    attempts = []
+
+    async def broken(self, **kwargs):
+        attempts.append(kwargs['record_id'])
+        raise OSError("диск заполнен")
+
+    monkeypatch.setattr(services.memory_service.MemoryService, "create_memory_page", broken)
+
+    async def scenario():
+        service = OpenAIService(api_key="sk-test", base_url="http://127.0.0.1:1/v1")
+        bot = FakeBot()
+        queue = MemoryPageQueue(db, service, max_attempts=2, retry_delay=0)
+        await queue.start(bot)
+        record_id = await db.create_memory_record(5, "Сидоров", "1950", "2024", "Был честным", None, "")
+        await queue.submit(record_id, 5)
+        await asyncio.gather(*queue._tasks)
+        jobs = await db.get_memory_page_jobs()
+        await service.close()
+        return jobs, bot.sent, queue.failed
+
+    jobs, sent, failed = asyncio.run(scenario())
+    assert len(attempts) == 2 and jobs == [] and failed == 1
+    assert sent[0][1] is None and "Не удалось" in sent[0][2]
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+from database.db import Database
+from database.migrations import LATEST_VERSION, apply_migrations, get_schema_version
+
+# Горячие запросы из database/db.py и индекс, который должен их обслуживать
+HOT_QUERIES = [
+    (
+        "SELECT id FROM memory_candles WHERE memory_record_id = ? AND telegram_id = ?",
+        (1, 1),
+        "idx_memory_candles_record_user",
+    ),
+    (
+        "SELECT * FROM products WHERE category = ?",
+        ("coffin",),
+        "idx_products_category",
+    ),
+    (
+        """
+        SELECT cl.*, u.username, u.first_name
+        FROM chat_logs cl
+        LEFT JOIN users u ON cl.telegram_id = u.telegram_id
+        WHERE cl.telegram_id = ?
+        ORDER BY cl.created_at DESC
+        LIMIT ?
+        """,
+        (1, 100),
+        "idx_chat_logs_user_created",
+    ),
+    (
+        """
+        SELECT cl.*, u.username, u.first_name
+        FROM chat_logs cl
+        LEFT JOIN users u ON cl.telegram_id = u.telegram_id
+        ORDER BY cl.created_at DESC
+        LIMIT ?
+        """,
+        (100,),
+        "idx_chat_logs_created",
+    ),
+    (
+        "SELECT * FROM memory_records WHERE telegram_id = ?",
+        (1,),
+        "idx_memory_records_user",
+    ),
+    (
+        """
+        SELECT c.*, u.username, u.first_name, u.last_name
+        FROM clients c
+        LEFT JOIN users u ON c.telegram_id = u.telegram_id
+        ORDER BY c.created_at DESC
+        """,
+        (),
+        "idx_clients_created",
+    ),
+    (
+        "SELECT COUNT(*) FROM users WHERE last_activity > datetime('now', '-7 days')",
+        (),
+        "idx_users_last_activity",
+    ),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = Database(path, readers=1)
+    db._shutdown()
+    return path
+
+
+@pytest.mark.parametrize("query,params,index", HOT_QUERIES)
+def test_hot_queries_use_index(db_path, query, params, index):
+    conn = sqlite3.connect(db_path)
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    conn.close()
+    details = " | ".join(row[-1] for row in plan)
+    assert index in details, details
+
+
+def test_schema_version_is_recorded(db_path):
+    conn = sqlite3.connect(db_path)
+    assert get_schema_version(conn) == LATEST_VERSION
+    conn.close()
+
+
+def test_no_ddl_when_schema_is_current(db_path):
+    conn = sqlite3.connect(db_path)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert apply_migrations(conn) == LATEST_VERSION
+    conn.close()
+    assert not any("CREATE" in s.upper() for s in statements)
+
+
+def test_migrates_legacy_database_with_duplicate_candles(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE memory_candles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            memory_record_id INTEGER,
+            telegram_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO memory_candles (memory_record_id, telegram_id) VALUES (?, ?)",
+        [(1, 7), (1, 7), (2, 7)]
+    )
+    conn.commit()
+    conn.close()
+
+    db = Database(path, readers=1)
+    db._shutdown()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM memory_candles").fetchone()[0] == 2
+    assert get_schema_version(conn) == LATEST_VERSION
+    conn.close()
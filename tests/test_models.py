@@ -0,0 +1,25 @@
+from database.models import ChatLog, Client, Product
+
+
+def test_row_supports_mapping_access():
+    product = Product(1, "Венок", "Описание", 3000.0, "wreath", "photos/wreath1.jpg")
+    assert product.name == "Венок"
+    assert product["price"] == 3000.0
+    assert product.get("missing", "default") == "default"
+    assert dict(product) == product.to_dict()
+    assert product == product.to_dict()
+
+
+def test_row_converts_booleans_and_fills_joined_fields():
+    client = Client(1, 10, "Иванов", "+7999", None, None, None, None, None, None, None, None, None, 1, "c", "u")
+    assert client.is_verified is True
+    assert client.username is None
+    log = ChatLog(1, 10, "text", "привет", "handler", 0, "c")
+    assert log.is_user_message is False
+
+
+def test_columns_follow_slots():
+    assert Product.columns() == "id, name, description, price, category, photo_path"
+    assert "username" not in Client.columns("c")
+    assert Client.columns("c").startswith("c.id, c.telegram_id")
+    assert not hasattr(Product(1), "__dict__")
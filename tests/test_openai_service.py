@@ -0,0 +1,121 @@
+import asyncio
+import io
+
+import pytest
+
+from services.openai_service import LEGAL_ADVICE_UNAVAILABLE, AIUnavailableError, OpenAIService
+from services.resilience import CircuitBreaker, ResilientCaller
+
+
+def test_shared_client_reuses_connections(openai_server):
+    async def scenario():
+        server = await openai_server(answer="  Ответ юриста  ")
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url, max_connections=2)
+        try:
+            answers = await asyncio.gather(*(service.get_legal_advice(f"Вопрос {i}") for i in range(20)))
+        finally:
+            await service.close()
+            await server.stop()
+        return answers, server
+
+    answers, server = asyncio.run(scenario())
+    assert answers == ["Ответ юриста"] * 20
+    assert server.requests == 20
+    assert server.connections <= 2
+
+
+def test_close_releases_http_client():
+    async def scenario():
+        service = OpenAIService(api_key="sk-test", base_url="http://127.0.0.1:1/v1")
+        await service.close()
+        return service
+
+    service = asyncio.run(scenario())
+    assert service._http_client.is_closed
+
+
+def test_transcribe_voice_from_memory_buffer(openai_server):
+    async def scenario():
+        server = await openai_server()
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+        try:
+            return await service.transcribe_voice(io.BytesIO(b"OggS fake voice"), duration=3)
+        finally:
+            await service.close()
+            await server.stop()
+
+    assert asyncio.run(scenario()) == "Как оформить свидетельство о смерти"
+
+
+def test_memory_pages_do_not_hedge_or_trip_the_legal_breaker(openai_server):
+    async def scenario():
+        server = await openai_server(answer="Светлая память")
+        service = OpenAIService(
+            api_key="sk-test", base_url=server.base_url,
+            resilience=ResilientCaller(hedge_percentile=0, breaker=CircuitBreaker(1, 60)),
+            memory_resilience=ResilientCaller(retries=0, hedge_min_samples=1, breaker=CircuitBreaker(1, 60)),
+        )
+        try:
+            # Быстрые ответы не включают дублирование медленных страниц памяти
+            await service.generate_memory_page_content("Иван", "1940", "2024", "Был добрым")
+            server.script = [(503, 0), (200, 0.1)]
+            failed = await service.generate_memory_page_content("Иван", "1940", "2024", "Был добрым")
+            service.memory_resilience.breaker.record_success()
+            slow = await service.generate_memory_page_content("Иван", "1940", "2024", "Был добрым")
+            legal = await service.get_legal_advice("Пособие на погребение")
+            return failed, slow, legal, server.requests, service.resilience.stats(), \
+                service.memory_resilience.stats()
+        finally:
+            await service.close()
+            await server.stop()
+
+    failed, slow, legal, requests, legal_stats, memory_stats = asyncio.run(scenario())
+    assert failed == "Был добрым" and slow == legal == "Светлая память"
+    assert requests == 4
+    assert memory_stats['hedges'] == 0 and memory_stats['failures'] == 1
+    assert legal_stats['breaker'] == "closed" and legal_stats['failures'] == 0
+
+
+def test_stream_open_is_hedged_and_bounded_by_deadline(openai_server):
+    async def scenario():
+        server = await openai_server(answer="Обратитесь в ЗАГС")
+        resilience = ResilientCaller(hedge_min_samples=3)
+        for _ in range(3):
+            resilience.upstream["legal-stream"].add(0.02)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url, resilience=resilience)
+        try:
+            # Первый поток не открывается, дублирующий открывается сразу
+            server.script = [(200, 1.0), (200, 0)]
+            hedged = "".join([c async for c in service.stream_legal_advice("Куда идти за свидетельством")])
+            hedge_stats = resilience.stats()
+
+            # Поток открылся, но застрял: ответ обрывается по общему сроку
+            resilience.deadline = 0.2
+            server.token_delay = 1.0
+            stalled = "".join([c async for c in service.stream_legal_advice("Документы для кремации")])
+            return hedged, hedge_stats, stalled
+        finally:
+            await service.close()
+            await server.stop()
+
+    hedged, hedge_stats, stalled = asyncio.run(scenario())
+    assert hedged == "Обратитесь в ЗАГС"
+    assert hedge_stats['hedges'] == 1 and hedge_stats['hedge_wins'] == 1
+    assert stalled.startswith("Обратитесь") and stalled.endswith("Ответ прерван, попробуйте спросить ещё раз.")
+
+
+def test_missing_api_key_disables_ai_features_only():
+    async def scenario():
+        service = OpenAIService(api_key=None, base_url="http://127.0.0.1:1/v1")
+        advice = await service.get_legal_advice("Документы для кремации")
+        streamed = "".join([c async for c in service.stream_legal_advice("Пособие на погребение")])
+        page = await service.generate_memory_page_content("Иван", "1940", "2024", "Был добрым")
+        with pytest.raises(AIUnavailableError):
+            await service.transcribe_voice(io.BytesIO(b"OggS"), duration=3)
+        await service.close()
+        return service.enabled, advice, streamed, page
+
+    enabled, advice, streamed, page = asyncio.run(scenario())
+    assert not enabled
+    assert advice == streamed == LEGAL_ADVICE_UNAVAILABLE
+    assert page == "Был добрым"
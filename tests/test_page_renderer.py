@@ -0,0 +1,45 @@
+import os
+
+from services.memory_service import DEFAULT_TEMPLATE
+from services.page_renderer import TemplateRenderer
+
+
+def _renderer(tmp_path, text: str = DEFAULT_TEMPLATE, check_interval: float = 0) -> TemplateRenderer:
+    (tmp_path / "memory_template.html").write_text(text, encoding="utf-8")
+    return TemplateRenderer(str(tmp_path), "memory_template.html", bytecode_dir=str(tmp_path),
+                            check_interval=check_interval)
+
+
+def test_user_text_is_escaped_and_conditions_rendered(tmp_path):
+    renderer = _renderer(tmp_path)
+    html = renderer.render(name="<script>alert(1)</script>", birth_date="1940", death_date="2024",
+                           memory_text="Отец & дед", photo_path=None, candles_count=3, created_at="сегодня")
+    assert "<script>alert(1)" not in html
+    assert "&lt;script&gt;" in html and "Отец &amp; дед" in html
+    assert "{%" not in html and "photo-section\"" not in html
+
+    html = renderer.render(name="Иван", photo_path="memory_photos/1.jpg")
+    assert 'src="memory_photos/1.jpg"' in html
+
+
+def test_template_is_reloaded_only_when_file_changes(tmp_path):
+    renderer = _renderer(tmp_path, "Памяти {{ name }}")
+    assert renderer.render(name="Ивана") == "Памяти Ивана"
+    assert renderer.render(name="Петра") == "Памяти Петра"
+    assert renderer.loads == 1
+
+    path = tmp_path / "memory_template.html"
+    path.write_text("Светлая память: {{ name }}", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert renderer.render(name="Ивана") == "Светлая память: Ивана"
+    assert renderer.loads == 2
+
+
+def test_file_is_not_checked_more_often_than_interval(tmp_path):
+    renderer = _renderer(tmp_path, "Памяти {{ name }}", check_interval=60)
+    renderer.render(name="Ивана")
+    path = tmp_path / "memory_template.html"
+    path.write_text("Другой шаблон", encoding="utf-8")
+    os.utime(path, (0, 0))
+    assert renderer.render(name="Ивана") == "Памяти Ивана"
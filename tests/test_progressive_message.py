@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText
+
+from services.openai_service import OpenAIService
+from services.progressive_message import CURSOR, ProgressiveMessage
+
+
+class FakeMessage:
+    def __init__(self, retry_after_first: int = 0):
+        self.edits = []
+        self._retry_after = retry_after_first
+
+    async def edit_text(self, text, reply_markup=None):
+        if self._retry_after:
+            retry_after, self._retry_after = self._retry_after, 0
+            raise TelegramRetryAfter(EditMessageText(text=text), "Flood control", retry_after)
+        self.edits.append((text, reply_markup))
+
+
+def test_edits_are_coalesced_and_final_text_is_complete():
+    async def scenario():
+        message = FakeMessage()
+        progressive = ProgressiveMessage(message, header="Ответ: ", min_interval=0.05)
+        for i in range(40):
+            await progressive.feed(f"слово{i} ")
+            await asyncio.sleep(0.005)
+        await progressive.finish(footer="\nКонец", reply_markup="kb")
+        return message.edits
+
+    edits = asyncio.run(scenario())
+    # 40 кусков за ~0.2 с при интервале 0.05 с — несколько правок, а не 40
+    assert 2 <= len(edits) <= 8
+    assert edits[0][0].startswith("Ответ: слово0") and edits[0][0].endswith(CURSOR)
+    assert edits[-1] == ("Ответ: " + "".join(f"слово{i} " for i in range(40)) + "\nКонец", "kb")
+
+
+def test_no_op_edits_are_skipped():
+    async def scenario():
+        message = FakeMessage()
+        progressive = ProgressiveMessage(message, min_interval=0)
+        await progressive.feed("")
+        await progressive.feed("текст")
+        await progressive.feed("")
+        await progressive.finish()
+        await progressive.finish()
+        return message.edits
+
+    assert [text for text, _ in asyncio.run(scenario())] == ["текст" + CURSOR, "текст"]
+
+
+def test_retry_after_pauses_intermediate_edits():
+    async def scenario():
+        message = FakeMessage(retry_after_first=1)
+        progressive = ProgressiveMessage(message, min_interval=0)
+        started = time.monotonic()
+        await progressive.feed("раз")
+        await progressive.feed(" два")
+        await progressive.finish()
+        return message.edits, time.monotonic() - started
+
+    edits, elapsed = asyncio.run(scenario())
+    assert edits == [("раз два", None)]
+    assert elapsed >= 0.9
+
+
+def test_stream_shows_first_tokens_before_completion(openai_server):
+    async def scenario():
+        answer = " ".join(f"слово{i}" for i in range(20))
+        server = await openai_server(answer=answer, token_delay=0.02)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+        started = time.monotonic()
+        first_chunk_at = None
+        parts = []
+        async for chunk in service.stream_legal_advice("Как оформить свидетельство о смерти?"):
+            if first_chunk_at is None:
+                first_chunk_at = time.monotonic() - started
+            parts.append(chunk)
+        total = time.monotonic() - started
+        await service.close()
+        await server.stop()
+        return answer, "".join(parts), first_chunk_at, total
+
+    answer, streamed, first_chunk_at, total = asyncio.run(scenario())
+    assert streamed == answer
+    assert first_chunk_at < total / 2
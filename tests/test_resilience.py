@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+import pytest
+
+from services.openai_service import LEGAL_ADVICE_UNAVAILABLE, OpenAIService
+from services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+def make_service(server, **kwargs):
+    resilience = ResilientCaller(base_delay=0.01, **kwargs)
+    return OpenAIService(api_key="sk-test", base_url=server.base_url, resilience=resilience)
+
+
+def test_retries_on_429_and_5xx(openai_server):
+    async def scenario():
+        server = await openai_server(answer="Ответ")
+        server.script = [(429, 0), (503, 0)]
+        service = make_service(server)
+        answer = await service.get_legal_advice("Как оформить свидетельство о смерти?")
+        await service.close()
+        await server.stop()
+        return answer, server.requests, service.resilience.stats()
+
+    answer, requests, stats = asyncio.run(scenario())
+    assert answer == "Ответ"
+    assert requests == 3
+    assert stats['retries'] == 2 and stats['failures'] == 0
+
+
+def test_deadline_bounds_slow_calls(openai_server):
+    async def scenario():
+        server = await openai_server(latency=2)
+        service = make_service(server, deadline=0.3, retries=5)
+        started = time.monotonic()
+        answer = await service.get_legal_advice("Медленный вопрос")
+        elapsed = time.monotonic() - started
+        await service.close()
+        await server.stop()
+        return answer, elapsed, service.resilience.stats()
+
+    answer, elapsed, stats = asyncio.run(scenario())
+    assert answer.startswith("Извините")
+    assert elapsed < 0.6
+    assert stats['timeouts'] == 1
+
+
+def test_hedged_request_beats_slow_primary():
+    async def scenario():
+        caller = ResilientCaller(hedge_min_samples=5)
+        for _ in range(5):
+            caller.upstream["default"].add(0.02)
+        delays = [1.0, 0.01]
+
+        async def request():
+            await asyncio.sleep(delays.pop(0))
+            return "ok"
+
+        started = time.monotonic()
+        result = await caller.call(request)
+        return result, time.monotonic() - started, caller.stats()
+
+    result, elapsed, stats = asyncio.run(scenario())
+    assert result == "ok"
+    assert elapsed < 0.2
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+
+def test_losing_hedge_result_is_discarded():
+    async def scenario():
+        caller = ResilientCaller(hedge_min_samples=5)
+        for _ in range(5):
+            caller.upstream["default"].add(0.02)
+        discarded = []
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                try:
+                    await asyncio.sleep(1.0)
+                except asyncio.CancelledError:
+                    # Ответ успел прийти одновременно с отменой
+                    return "лишний поток"
+            return "поток"
+
+        async def close(result):
+            discarded.append(result)
+
+        result = await caller.call(request, discard=close)
+        await asyncio.sleep(0.01)
+        return result, discarded
+
+    assert asyncio.run(scenario()) == ("поток", ["лишний поток"])
+
+
+def test_stream_deadline_covers_whole_response():
+    async def scenario():
+        caller = ResilientCaller(deadline=0.1)
+
+        async def stalled():
+            yield "начало"
+            await asyncio.sleep(1.0)
+            yield "конец"
+
+        chunks = []
+        started = time.monotonic()
+        try:
+            async for chunk in caller.within_deadline(stalled(), started):
+                chunks.append(chunk)
+        except asyncio.TimeoutError:
+            chunks.append("срок")
+        return chunks, time.monotonic() - started, caller.stats()['timeouts']
+
+    chunks, elapsed, timeouts = asyncio.run(scenario())
+    assert chunks == ["начало", "срок"]
+    assert elapsed < 0.5 and timeouts == 1
+
+
+def test_hedge_threshold_is_kept_per_call_kind():
+    async def scenario():
+        caller = ResilientCaller(hedge_min_samples=3)
+
+        async def fast():
+            await asyncio.sleep(0.005)
+            return "поток"
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "ответ"
+
+        # Быстрые начала потоков не должны занижать порог для полных ответов
+        for _ in range(5):
+            await caller.call(fast, hedge=False, kind="legal-stream")
+        for _ in range(3):
+            await caller.call(slow, kind="legal")
+        return caller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['hedges'] == 0
+    assert stats['hedge_after_ms']['legal-stream'] < 40
+    assert stats['hedge_after_ms']['legal'] >= 40
+
+
+def test_circuit_breaker_fails_fast_and_recovers(openai_server):
+    async def scenario():
+        server = await openai_server(answer="Ответ")
+        server.script = [(500, 0)] * 4
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        service = make_service(server, retries=1, breaker=breaker)
+        first = [await service.get_legal_advice(f"Вопрос {i}") for i in range(2)]
+        requests_before = server.requests
+        started = time.monotonic()
+        degraded = await service.get_legal_advice("Вопрос 3")
+        fast = time.monotonic() - started
+        requests_during = server.requests - requests_before
+        await asyncio.sleep(0.25)
+        recovered = await service.get_legal_advice("Вопрос 4")
+        await service.close()
+        await server.stop()
+        return first, degraded, fast, requests_during, recovered, breaker.state
+
+    first, degraded, fast, requests_during, recovered, state = asyncio.run(scenario())
+    assert all(answer.startswith("Извините") for answer in first)
+    assert degraded == LEGAL_ADVICE_UNAVAILABLE
+    assert fast < 0.05 and requests_during == 0
+    assert recovered == "Ответ"
+    assert state == "closed"
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.allow() is True
+
+
+def test_non_retryable_errors_are_not_retried():
+    async def scenario():
+        caller = ResilientCaller()
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            await caller.call(request)
+        return calls, caller.breaker.state
+
+    assert asyncio.run(scenario()) == (1, "closed")
+
+
+def test_open_breaker_raises():
+    async def scenario():
+        caller = ResilientCaller(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        caller.breaker.record_failure()
+
+        async def request():
+            return "ok"
+
+        with pytest.raises(CircuitOpenError):
+            await caller.call(request)
+        return caller.stats()['short_circuits']
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,67 @@
+import asyncio
+import random
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from middleware.scheduler import ChatSchedulerMiddleware
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+            "text": "🕯️ Уголок памяти",
+        },
+    })
+
+
+def test_scheduler_serializes_chats_and_bounds_parallelism():
+    seen = {}
+    running = 0
+    max_running = 0
+    depths = []
+
+    async def scenario():
+        scheduler = ChatSchedulerMiddleware(max_concurrency=5)
+        router = Router()
+
+        @router.message()
+        async def handler(message: Message):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            depths.append(scheduler.depth())
+            await asyncio.sleep(random.uniform(0, 0.005))
+            seen.setdefault(message.chat.id, []).append(message.message_id)
+            running -= 1
+
+        dp = Dispatcher()
+        dp.update.outer_middleware(scheduler)
+        dp.include_router(router)
+        bot = Bot(token="42:TEST")
+
+        # Генератор нагрузки: 200 апдейтов из 20 чатов, как при polling с handle_as_tasks
+        tasks = [
+            asyncio.create_task(dp.feed_update(bot, make_update(i, i % 20)))
+            for i in range(200)
+        ]
+        await asyncio.sleep(0)
+        peak_chat_depth = scheduler.depth(0)
+        await asyncio.gather(*tasks)
+        await bot.session.close()
+        return scheduler, peak_chat_depth
+
+    scheduler, peak_chat_depth = asyncio.run(scenario())
+    assert scheduler.processed == 200
+    assert max_running == 5
+    assert peak_chat_depth == 10
+    assert max(depths) > 100
+    assert scheduler.stats()["chats"] == 0
+    assert not scheduler._locks
+    for ids in seen.values():
+        assert ids == sorted(ids)
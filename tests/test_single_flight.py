@@ -0,0 +1,127 @@
+import asyncio
+import gc
+
+from services.openai_service import OpenAIService
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "ответ"
+
+        results = await asyncio.gather(*(flight.do("q", fetch) for _ in range(10)))
+        # После завершения следующий вызов снова идёт к источнику
+        results.append(await flight.do("q", fetch))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["ответ"] * 11
+    assert calls == 2
+    assert stats == {'leaders': 2, 'shared': 9, 'in_flight': 0}
+
+
+def test_errors_reach_every_waiter_and_leader_cancel_does_not_abort():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("нет связи")
+
+        outcomes = await asyncio.gather(*(flight.do("bad", failing) for _ in range(3)), return_exceptions=True)
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "готово"
+
+        leader = asyncio.create_task(flight.do("slow", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("slow", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return outcomes, await follower
+
+    outcomes, follower_result = asyncio.run(scenario())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert follower_result == "готово"
+
+
+def test_stream_is_fanned_out_from_the_start():
+    async def scenario():
+        flight = SingleFlight()
+        upstream_calls = 0
+
+        async def source():
+            nonlocal upstream_calls
+            upstream_calls += 1
+            for word in ("раз", "два", "три"):
+                await asyncio.sleep(0.02)
+                yield word
+
+        async def read(delay):
+            await asyncio.sleep(delay)
+            return [chunk async for chunk in flight.stream("q", source)]
+
+        # Второй получатель присоединяется, когда часть потока уже прочитана
+        results = await asyncio.gather(read(0), read(0.03))
+        return results, upstream_calls, flight.stats()
+
+    results, upstream_calls, stats = asyncio.run(scenario())
+    assert results == [["раз", "два", "три"]] * 2
+    assert upstream_calls == 1
+    assert stats['shared'] == 1
+
+
+def test_stream_pump_is_kept_alive_after_readers_leave():
+    async def scenario():
+        flight = SingleFlight()
+        finished = asyncio.Event()
+
+        async def source():
+            for word in ("раз", "два"):
+                await asyncio.sleep(0.02)
+                yield word
+            finished.set()
+
+        async def read():
+            return [chunk async for chunk in flight.stream("q", source)]
+
+        reader = asyncio.create_task(read())
+        await asyncio.sleep(0.01)
+        pump = flight._streams["q"].task
+        reader.cancel()
+        gc.collect()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        return pump, flight.in_flight()
+
+    pump, in_flight = asyncio.run(scenario())
+    assert pump.done() and in_flight == 0
+
+
+def test_identical_questions_make_one_api_call(openai_server):
+    async def scenario():
+        server = await openai_server(answer="Ответ юриста", latency=0.05)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url)
+        questions = ["Как оформить свидетельство о смерти?", "как оформить свидетельство о смерти"] * 5
+        answers = await asyncio.gather(*(service.get_legal_advice(q) for q in questions))
+
+        async def stream(q):
+            return "".join([chunk async for chunk in service.stream_legal_advice(q)])
+
+        streamed = await asyncio.gather(*(stream(q) for q in questions))
+        await service.close()
+        await server.stop()
+        return answers, streamed, server.requests, service.inflight.stats()
+
+    answers, streamed, requests, stats = asyncio.run(scenario())
+    assert answers == streamed == ["Ответ юриста"] * 10
+    assert requests == 2
+    assert stats['shared'] == 18
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, User
+
+import handlers.ai_lawyer
+import handlers.funeral
+import handlers.memory
+import handlers.registration
+from handlers.text_input import MessageProxy, _handlers, dispatch_text, text_input
+from handlers.voice import handle_voice_edit_text
+from states.states import AIHelper, ClientRegistration, MemoryRecord, VoiceInput
+
+
+class _Probe(StatesGroup):
+    waiting = State()
+
+
+@pytest.fixture
+def received():
+    """Временный хендлер состояния ``_Probe.waiting``; после теста удаляется из реестра"""
+    calls = []
+
+    async def probe_handler(message, state, db):
+        calls.append((message.text, message.from_user.id, state, db))
+
+    text_input(_Probe.waiting)(probe_handler)
+    yield calls
+    _handlers.pop(_Probe.waiting.state, None)
+
+
+def _message(text: str, user_id: int) -> Message:
+    return Message(
+        message_id=1, date=0, text=text,
+        chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=user_id == 0, first_name="u"),
+    )
+
+
+def test_input_states_are_registered_once_at_import():
+    expected = (
+        [AIHelper.waiting_for_question]
+        + [state for state in ClientRegistration.__states__ if state.state != ClientRegistration.waiting_for_confirm.state]
+        + list(MemoryRecord.__states__)
+        + [handlers.funeral.FuneralForm.waiting_for_address, handlers.funeral.FuneralForm.waiting_for_wreaths]
+    )
+    assert all(state.state in _handlers for state in expected)
+    assert _Probe.waiting.state not in _handlers
+    assert _handlers[handlers.funeral.FuneralForm.waiting_for_address.state].callback is handlers.funeral.handle_address
+    assert _handlers[AIHelper.waiting_for_question.state].callback is handlers.ai_lawyer.process_ai_question
+
+
+def test_dispatch_passes_only_needed_dependencies_to_proxy(received):
+    bot_message = _message("Подтвердите текст", 0)
+    proxy = MessageProxy(bot_message, "Иванов Иван", from_user=User(id=42, is_bot=False, first_name="u"))
+
+    async def scenario():
+        handled = await dispatch_text(_Probe.waiting.state, proxy, state="fsm", db="db", openai_service="ai", bot=None)
+        unknown = await dispatch_text("Unknown:state", proxy, state="fsm")
+        return handled, unknown
+
+    handled, unknown = asyncio.run(scenario())
+    assert (handled, unknown) == (True, False)
+    assert received == [("Иванов Иван", 42, "fsm", "db")]
+    # Остальные атрибуты берутся у исходного сообщения
+    assert proxy.chat.id == 0 and proxy.message_id == 1
+
+
+def test_voice_edit_restores_original_state_before_dispatch(received):
+    async def scenario():
+        state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=7, user_id=7))
+        await state.set_state(VoiceInput.editing)
+        await state.update_data(voice_edit_state=_Probe.waiting.state)
+        await handle_voice_edit_text(_message("Петров Пётр", 7), state, db="db", bot=None)
+        return await state.get_state(), await state.get_data()
+
+    current, data = asyncio.run(scenario())
+    assert current == _Probe.waiting.state
+    assert data["voice_edit_state"] is None
+    assert [(text, user) for text, user, *_ in received] == [("Петров Пётр", 7)]
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from services.transcription_queue import QueueFullError, TranscriptCache, TranscriptionQueue
+from services.usage_ledger import QuotaExceededError
+
+
+def test_users_are_served_in_turn_and_repeats_coalesced(db):
+    async def scenario():
+        queue = TranscriptionQueue(TranscriptCache(db), workers=1, max_per_user=5)
+        order, results, calls = [], {}, []
+        finished = asyncio.Event()
+
+        def job(key):
+            async def fn():
+                calls.append(key)
+                await asyncio.sleep(0.01)
+                return f"текст {key}"
+            return fn
+
+        def done(name):
+            async def on_done(transcript, error):
+                order.append(name)
+                results[name] = transcript
+                if len(order) == 5:
+                    finished.set()
+            return on_done
+
+        for i in range(3):
+            queue.submit(1, f"a{i}", job(f"a{i}"), done(f"a{i}"))
+        queue.submit(2, "b0", job("b0"), done("b0"))
+        # Другой пользователь переслал то же голосовое
+        queue.submit(3, "a1", job("a1"), done("a1-forward"))
+        await asyncio.wait_for(finished.wait(), 5)
+
+        cached = await TranscriptCache(db).get("a2")
+        stats = queue.stats()
+        await queue.close()
+        return order, results, calls, cached, stats
+
+    order, results, calls, cached, stats = asyncio.run(scenario())
+    # Голосовое второго пользователя не ждёт всю пачку первого
+    assert calls == ["a0", "b0", "a1", "a2"]
+    assert order == ["a0", "b0", "a1", "a1-forward", "a2"]
+    assert results["a1-forward"] == "текст a1"
+    assert cached == "текст a2"
+    assert stats['coalesced'] == 1 and stats['completed'] == 4
+
+
+def test_queue_is_bounded_per_user_and_in_total(db):
+    async def scenario():
+        queue = TranscriptionQueue(TranscriptCache(db), workers=1, max_pending=3, max_per_user=2)
+        gate = asyncio.Event()
+
+        async def fn():
+            await gate.wait()
+            return "текст"
+
+        async def on_done(transcript, error):
+            pass
+
+        queue.submit(1, "a0", fn, on_done)
+        queue.submit(1, "a1", fn, on_done)
+        with pytest.raises(QueueFullError):
+            queue.submit(1, "a2", fn, on_done)
+        queue.submit(2, "b0", fn, on_done)
+        with pytest.raises(QueueFullError):
+            queue.submit(3, "c0", fn, on_done)
+        gate.set()
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_transcription_is_reported_and_not_cached(db):
+    async def scenario():
+        cache = TranscriptCache(db)
+        queue = TranscriptionQueue(cache)
+        outcome = asyncio.get_running_loop().create_future()
+
+        async def fn():
+            raise RuntimeError("API недоступен")
+
+        async def on_done(transcript, error):
+            outcome.set_result((transcript, error))
+
+        queue.submit(1, "x", fn, on_done)
+        transcript, error = await asyncio.wait_for(outcome, 5)
+        cached = await cache.get("x")
+        await queue.close()
+        return transcript, error, cached
+
+    transcript, error, cached = asyncio.run(scenario())
+    assert transcript is None and isinstance(error, RuntimeError)
+    assert cached is None
+
+
+def test_quota_error_reaches_only_the_job_owner(db):
+    async def scenario():
+        queue = TranscriptionQueue(TranscriptCache(db), workers=1)
+        results = {}
+        finished = asyncio.Event()
+
+        async def over_quota():
+            raise QuotaExceededError(1)
+
+        async def transcribe():
+            return "текст"
+
+        def done(user_id):
+            async def on_done(transcript, error):
+                results[user_id] = (transcript, type(error).__name__ if error else None)
+                if len(results) == 2:
+                    finished.set()
+            return on_done
+
+        queue.submit(1, "voice", over_quota, done(1))
+        # Второй пользователь переслал то же голосовое, его лимит не исчерпан
+        queue.submit(2, "voice", transcribe, done(2))
+        await asyncio.wait_for(finished.wait(), 5)
+        await queue.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results == {1: (None, "QuotaExceededError"), 2: ("текст", None)}
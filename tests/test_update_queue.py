@@ -0,0 +1,87 @@
+import asyncio
+
+from aiogram.types import Update
+
+from services.update_queue import UpdateWorkerPool, update_chat_key
+
+
+def make_update(update_id: int, chat_id: int, text: str = "привет") -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+            "text": text,
+        },
+    })
+
+
+def test_update_chat_key():
+    assert update_chat_key(make_update(1, 42)) == 42
+    callback = Update.model_validate({
+        "update_id": 2,
+        "callback_query": {
+            "id": "1", "chat_instance": "1", "data": "memory:back",
+            "from": {"id": 7, "is_bot": False, "first_name": "Тест"},
+        },
+    })
+    assert update_chat_key(callback) == 7
+
+
+def test_updates_are_ordered_per_chat_and_parallel_across_chats():
+    seen = {}
+    running = 0
+    max_running = 0
+
+    async def process(update):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        seen.setdefault(update.message.chat.id, []).append(update.update_id)
+        running -= 1
+
+    async def scenario():
+        pool = UpdateWorkerPool(process, workers=4, max_pending=100)
+        pool.start()
+        update_id = 0
+        for _ in range(5):
+            for chat_id in range(8):
+                update_id += 1
+                await pool.submit(make_update(update_id, chat_id))
+        await pool.stop()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.processed == 40
+    assert max_running == 4
+    for ids in seen.values():
+        assert ids == sorted(ids)
+    assert max(len(ids) for ids in seen.values()) == 5
+
+
+def test_submit_waits_when_queue_is_full():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def process(update):
+            await gate.wait()
+
+        pool = UpdateWorkerPool(process, workers=1, max_pending=2)
+        pool.start()
+        await pool.submit(make_update(1, 1))
+        await pool.submit(make_update(2, 2))
+        blocked = asyncio.create_task(pool.submit(make_update(3, 3)))
+        await asyncio.sleep(0.02)
+        was_blocked = not blocked.done()
+        depth = pool.depth(), pool.depth(1)
+        gate.set()
+        await blocked
+        await pool.stop()
+        return was_blocked, depth
+
+    was_blocked, depth = asyncio.run(scenario())
+    assert was_blocked is True
+    assert depth == (2, 1)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from database.db import Database
+from services.answer_cache import AnswerCache
+from services.openai_service import LEGAL_ADVICE_QUOTA, OpenAIService
+from services.usage_ledger import UsageLedger, today
+
+
+def test_usage_is_aggregated_and_flushed_in_batches(db):
+    async def scenario():
+        ledger = UsageLedger(db, flush_interval=60)
+        for _ in range(3):
+            ledger.record(1, "legal", 100, 50, 0.006)
+        ledger.record(1, "memory", 200, 300, 0.024)
+        ledger.record(2, "legal", 10, 10, 0.001)
+        before = await db._fetchall("SELECT COUNT(*) FROM ai_usage")
+        await ledger.flush()
+        ledger.record(1, "legal", 100, 50, 0.006)
+        report = await ledger.report()
+        await ledger.close()
+        return before, report
+
+    before, report = asyncio.run(scenario())
+    assert before == [(0,)]
+    assert report['day'] == today()
+    assert report['features'] == [("legal", 5, 410, 210, pytest.approx(0.025)), ("memory", 1, 200, 300, 0.024)]
+    assert [row[0] for row in report['users']] == [1, 2]
+    assert report['users'][0][2:4] == (5, 1100)
+
+
+def test_daily_quotas_survive_restart(db_path):
+    async def first_run():
+        db = Database(db_path, readers=1)
+        ledger = UsageLedger(db, daily_requests=2, exempt=[99])
+        results = [ledger.allowed(1)]
+        ledger.record(1, "legal", 10, 10)
+        ledger.record(1, "legal", 10, 10)
+        ledger.record(99, "legal", 10, 10)
+        ledger.record(99, "legal", 10, 10)
+        results += [ledger.allowed(1), ledger.allowed(2), ledger.allowed(99)]
+        await ledger.close()
+        await db.close()
+        return results
+
+    async def second_run():
+        db = Database(db_path, readers=1)
+        ledger = UsageLedger(db, daily_tokens=30)
+        await ledger.load()
+        results = [ledger.allowed(1), ledger.usage_today(1)]
+        await db.close()
+        return results
+
+    assert asyncio.run(first_run()) == [True, False, True, True]
+    assert asyncio.run(second_run()) == [False, {'requests': 2, 'tokens': 40, 'cost': 0.0}]
+
+
+def test_quota_is_enforced_before_calling_api(openai_server, db):
+    async def scenario():
+        server = await openai_server(answer="Ответ")
+        ledger = UsageLedger(db, daily_requests=1)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url, usage=ledger)
+        first = await service.get_legal_advice("Первый вопрос", user_id=7)
+        second = await service.get_legal_advice("Второй вопрос", user_id=7)
+        streamed = "".join([c async for c in service.stream_legal_advice("Третий вопрос", user_id=7)])
+        other = await service.get_legal_advice("Вопрос другого", user_id=8)
+        usage = ledger.usage_today(7)
+        await service.close()
+        rows = await db._fetchall("SELECT telegram_id, requests, prompt_tokens, completion_tokens FROM ai_usage")
+        await server.stop()
+        return first, second, streamed, other, usage, server.requests, rows
+
+    first, second, streamed, other, usage, requests, rows = asyncio.run(scenario())
+    assert first == other == "Ответ"
+    assert second == streamed == LEGAL_ADVICE_QUOTA
+    assert requests == 2
+    # Мок сообщает usage: 50 токенов запроса и 30 ответа
+    assert usage == {'requests': 1, 'tokens': 80, 'cost': pytest.approx((50 * 0.03 + 30 * 0.06) / 1000)}
+    assert sorted(rows) == [(7, 1, 50, 30), (8, 1, 50, 30)]
+
+
+def test_cached_answers_are_served_after_quota_is_spent(openai_server, db):
+    async def scenario():
+        server = await openai_server(answer="Ответ")
+        ledger = UsageLedger(db, daily_requests=1)
+        service = OpenAIService(api_key="sk-test", base_url=server.base_url,
+                                answer_cache=AnswerCache(db), usage=ledger)
+        first = await service.get_legal_advice("Документы для кремации", user_id=7)
+        again = await service.get_legal_advice("Документы для кремации", user_id=7)
+        streamed = "".join([c async for c in service.stream_legal_advice("Документы для кремации", user_id=7)])
+        other = await service.get_legal_advice("Другой вопрос", user_id=7)
+        usage = ledger.usage_today(7)
+        await service.close()
+        await server.stop()
+        return first, again, streamed, other, usage['requests'], server.requests
+
+    first, again, streamed, other, requests_used, upstream = asyncio.run(scenario())
+    assert first == again == streamed == "Ответ"
+    assert other == LEGAL_ADVICE_QUOTA
+    assert requests_used == 1 and upstream == 1
@@ -0,0 +1,97 @@
+import asyncio
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from handlers.voice import process_voice_message
+from services.openai_service import TRANSCRIPTION_QUOTA
+from services.transcription_queue import TranscriptCache, TranscriptionQueue
+from states.states import AIHelper
+
+
+class FakeVoice:
+    duration = 3
+    file_size = 1000
+    file_unique_id = "voice-1"
+
+
+class FakeUser:
+    id = 7
+
+
+class FakeBot:
+    async def download(self, voice):
+        return b"OggS"
+
+
+class FakeMessage:
+    def __init__(self):
+        self.voice = FakeVoice()
+        self.from_user = FakeUser()
+        self.bot = FakeBot()
+        self.sent = []
+
+    async def answer(self, text, **kwargs):
+        self.sent.append(text)
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        self.sent.append(text)
+
+
+class FakeUsage:
+    def __init__(self, allowed):
+        self._allowed = allowed
+
+    def allowed(self, user_id):
+        return self._allowed
+
+
+class FakeOpenAI:
+    def __init__(self, allowed=True):
+        self.enabled = True
+        self.usage = FakeUsage(allowed)
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def transcribe_voice(self, audio, duration=0, user_id=None):
+        self.calls += 1
+        await self.release.wait()
+        return "Как оформить свидетельство о смерти"
+
+
+def test_quota_is_checked_before_queueing(db):
+    async def scenario():
+        transcriptions = TranscriptionQueue(TranscriptCache(db))
+        state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=7, user_id=7))
+        message = FakeMessage()
+        await process_voice_message(message, db, state, FakeOpenAI(allowed=False), transcriptions)
+        stats = transcriptions.stats()
+        return message.sent, stats
+
+    sent, stats = asyncio.run(scenario())
+    assert sent == [TRANSCRIPTION_QUOTA]
+    assert stats['pending'] == 0 and stats['active'] == 0
+
+
+def test_transcript_is_dropped_when_user_left_the_step(db):
+    async def scenario():
+        transcriptions = TranscriptionQueue(TranscriptCache(db))
+        state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=7, user_id=7))
+        await state.set_state(AIHelper.waiting_for_question)
+        openai_service = FakeOpenAI()
+        message = FakeMessage()
+        await asyncio.wait_for(process_voice_message(message, db, state, openai_service, transcriptions), 5)
+        # Пока голосовое в очереди, пользователь отменил шаг
+        await state.clear()
+        openai_service.release.set()
+        while len(message.sent) < 2:
+            await asyncio.sleep(0.01)
+        data = await state.get_data()
+        await transcriptions.close()
+        return message.sent, data
+
+    sent, data = asyncio.run(scenario())
+    assert "уже перешли к другому шагу" in sent[-1]
+    assert "voice_transcript" not in data
@@ -0,0 +1,35 @@
+import asyncio
+
+from database.write_behind import WriteBehind
+
+
+def test_pending_changes_are_written_in_background_and_on_close():
+    async def scenario():
+        pending, written = [], []
+        failures = [RuntimeError("база занята")]
+
+        async def write():
+            batch = pending[:]
+            pending.clear()
+            if failures:
+                # Как у владельцев: несохранённое возвращается обратно
+                pending[:0] = batch
+                raise failures.pop()
+            written.append(batch)
+
+        writer = WriteBehind(write, lambda: bool(pending), interval=0.01, name="TEST")
+        pending.extend([1, 2])
+        writer.schedule()
+        writer.schedule()
+        await asyncio.sleep(0.05)
+        background = list(written)
+
+        pending.append(3)
+        writer.schedule()
+        await writer.close()
+        return background, written
+
+    background, written = asyncio.run(scenario())
+    # Первая попытка не удалась, вторая записала всё одной пачкой
+    assert background == [[1, 2]]
+    assert written == [[1, 2], [3]]
@@ -0,0 +1,103 @@
+"""Запуск бота в режиме webhook (aiohttp) вместо long polling.
+
+Апдейты принимаются HTTP-обработчиком и передаются в UpdateWorkerPool:
+ответ Telegram отправляется сразу, а медленные хендлеры (OpenAI, загрузка
+файлов) одного пользователя не задерживают апдейты других.
+"""
+import logging
+import secrets
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.types import Update
+
+from config import (
+    BOT_TOKEN,
+    DATABASE_PATH,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    UPDATE_WORKERS,
+    UPDATE_QUEUE_SIZE,
+)
+from database.db import Database
+from main import setup_logging, create_dispatcher, create_openai_service, load_openai_state, set_commands
+from services.update_queue import UpdateWorkerPool
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher, pool: UpdateWorkerPool,
+                       path: str = WEBHOOK_PATH, secret: str = None) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты Telegram"""
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            return web.Response(status=401)
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        # При заполненной очереди ответ задерживается — Telegram сам снизит темп отправки
+        await pool.submit(update)
+        return web.Response()
+
+    async def on_startup(app: web.Application):
+        pool.start()
+
+    async def on_shutdown(app: web.Application):
+        await pool.stop()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    app["bot"] = bot
+    app["dp"] = dp
+    app["pool"] = pool
+    return app
+
+
+def main():
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    logger.info('=== Запуск Telegram-бота (webhook) ===')
+
+    db = Database(DATABASE_PATH)
+    openai_service = create_openai_service(db)
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
+    dp = create_dispatcher(db, openai_service)
+    pool = UpdateWorkerPool(
+        lambda update: dp.feed_update(bot, update),
+        workers=UPDATE_WORKERS,
+        max_pending=UPDATE_QUEUE_SIZE,
+    )
+    app = create_webhook_app(bot, dp, pool, secret=WEBHOOK_SECRET)
+
+    async def on_startup(app: web.Application):
+        await db.start_audit_log()
+        await load_openai_state(openai_service)
+        await set_commands(bot)
+        await bot.set_webhook(
+            f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(UPDATE_WORKERS, 100),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        await dp.emit_startup(bot=bot)
+        logger.info('=== Webhook установлен, бот ожидает апдейтов ===')
+
+    async def on_cleanup(app: web.Application):
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        await openai_service.close()
+        await db.close()
+        logger.info('Соединения с базой данных закрыты')
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    web.run_app(app, host=WEBAPP_HOST, port=WEBAPP_PORT)
+
+
+if __name__ == "__main__":
+    main()